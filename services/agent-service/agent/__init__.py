@@ -0,0 +1,5 @@
+from dotenv import load_dotenv
+
+# Every module reads its settings from the environment when imported, so
+# load .env once, before any of them.
+load_dotenv()
@@ -0,0 +1,177 @@
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from agent import metrics
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.85"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "21600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+
+# Tools whose results depend on who is asking, or on text they supplied.
+# A turn that called any of them is never cached.
+USER_SCOPED_TOOLS = {
+    "get_medical_profile", "get_reminders", "schedule_medicine", "analyze_medicine", "check_medicine_overlaps",
+}
+# The tools a cacheable turn must have used: general knowledge about a named medicine.
+GENERIC_TOOLS = {"get_medicine_details", "find_substitutes"}
+
+# Candidates scored in full per lookup, picked by the number of shared features.
+MAX_CANDIDATES = 20
+
+# Words that change how a question is phrased but not what it asks.
+STOPWORDS = {
+    "a", "about", "an", "and", "any", "are", "can", "could", "do", "does", "for", "give", "i", "is", "it",
+    "know", "me", "my", "of", "on", "please", "should", "tell", "the", "to", "what", "whats", "which",
+    "would", "you",
+}
+
+answer_cache_total = metrics.Counter(
+    "agent_answer_cache_total", "Answer cache lookups and stores by result.", ("result",)
+)
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def embed(text: str) -> Dict[str, float]:
+    """Sparse unit vector of a normalized question: its content words plus their character trigrams.
+
+    Trigrams make "side efects" land next to "side effects"; whole words
+    weigh more, so "uses" and "side effects" stay apart.
+    """
+    words = [word for word in text.split() if word not in STOPWORDS]
+    features = Counter(f"w:{word}" for word in words)
+    for word in words:
+        padded = f" {word} "
+        features.update(f"t:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    # Words carry more meaning than any one trigram
+    for feature in features:
+        if feature.startswith("w:"):
+            features[feature] *= 3
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {feature: value / norm for feature, value in features.items()}
+
+
+def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(feature, 0.0) for feature, value in a.items())
+
+
+def mentions(question: str, medicine: str) -> bool:
+    """Whether the question names `medicine` as whole words ("dolo 650" is not in "dolo 6500")."""
+    return f" {medicine} " in f" {normalize_question(question)} "
+
+
+def cached_medicines(question: str, tool_calls: Iterable[dict]) -> Optional[Tuple[str, ...]]:
+    """The medicines a turn's answer is about, if that answer can be given to anyone asking the same.
+
+    The turn must have looked up medicines by names the question itself
+    contains, so the answer does not lean on earlier turns, and called no
+    user-scoped tool. Returns None for turns that must not be cached.
+    """
+    tool_calls = list(tool_calls)
+    names = {call["name"] for call in tool_calls}
+    if not names or names & USER_SCOPED_TOOLS or not names <= GENERIC_TOOLS:
+        return None
+    medicines = tuple(sorted({normalize_question(str(call["args"].get("medicine_name", ""))) for call in tool_calls}))
+    if not all(medicine and mentions(question, medicine) for medicine in medicines):
+        return None
+    return medicines
+
+
+class AnswerCache:
+    """LRU answer cache keyed by question similarity, with entries expiring after `ttl` seconds.
+
+    Questions are embedded with `embed()` and held in an inverted index
+    from feature to entries, so a lookup scores only entries sharing
+    features with the question rather than the whole cache. Similarity
+    alone would let "dolo 6500" match "dolo 650", so an entry is only a
+    match for questions naming every medicine its answer is about.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._index: Dict[str, set] = {}
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, entry_id):
+        vector, _, _, _ = self._entries.pop(entry_id)
+        for feature in vector:
+            ids = self._index[feature]
+            ids.discard(entry_id)
+            if not ids:
+                del self._index[feature]
+
+    def lookup(self, question: str) -> Optional[Tuple[str, float]]:
+        """(answer, similarity) of the closest cached question at or above the threshold."""
+        vector = embed(normalize_question(question))
+        shared = Counter()
+        for feature in vector:
+            shared.update(self._index.get(feature, ()))
+
+        best, best_score = None, self.threshold
+        now = self.clock()
+        for entry_id, _ in shared.most_common(MAX_CANDIDATES):
+            entry_vector, medicines, _, expires_at = self._entries[entry_id]
+            if expires_at <= now:
+                self._remove(entry_id)
+                continue
+            if not all(mentions(question, medicine) for medicine in medicines):
+                continue
+            score = cosine(vector, entry_vector)
+            if score >= best_score:
+                best, best_score = entry_id, score
+        if best is None:
+            answer_cache_total.inc(result="miss")
+            return None
+        self._entries.move_to_end(best)
+        answer_cache_total.inc(result="hit")
+        return self._entries[best][2], best_score
+
+    def store(self, question: str, answer: str, medicines: Tuple[str, ...] = ()):
+        vector = embed(normalize_question(question))
+        if not vector:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (vector, medicines, answer, self.clock() + self.ttl)
+        for feature in vector:
+            self._index.setdefault(feature, set()).add(entry_id)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+        answer_cache_total.inc(result="stored")
+
+    def remember(self, question: str, answer: str, tool_calls: Iterable[dict]):
+        """Store the answer of a finished turn, unless the turn was personal."""
+        medicines = cached_medicines(question, tool_calls)
+        if answer and medicines is not None:
+            self.store(question, answer, medicines)
+        else:
+            answer_cache_total.inc(result="bypass")
+
+    def clear(self):
+        self._entries.clear()
+        self._index.clear()
+
+
+answers = AnswerCache()
+
+
+@metrics.collector
+def answer_cache_metrics():
+    yield "agent_answer_cache_entries", "gauge", "Answers held by the answer cache.", {(): len(answers)}
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from agent import metrics
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+MEDICINE_CACHE_TTL = float(os.getenv("MEDICINE_CACHE_TTL", "3600"))
+MEDICINE_CACHE_SIZE = int(os.getenv("MEDICINE_CACHE_SIZE", "2000"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire `ttl` seconds after they are stored.
+
+    `get_or_load()` coalesces concurrent loads: while a key is being loaded,
+    other callers await the same task instead of starting their own. The
+    load runs shielded, so a caller that is cancelled does not cancel it for
+    the others. `invalidate()` also detaches an in-flight load, so a result
+    fetched before the invalidation is never stored after it.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, clock=time.monotonic):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default=None):
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (self.clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[Any]],
+                          cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Cached value for `key`, or the result of `load()`, stored if `cacheable(result)`."""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(load())
+        self._inflight[key] = task
+
+        def store(done):
+            failed = done.cancelled() or done.exception() is not None
+            if self._inflight.get(key) is not done:
+                return
+            del self._inflight[key]
+            if not failed and (cacheable is None or cacheable(done.result())):
+                self.set(key, done.result())
+
+        task.add_done_callback(store)
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "size": len(self)}
+
+
+# Per-user data (profile, reminders) changes often and is short-lived;
+# medicine details are global and stable.
+user_cache = TTLCache("user", USER_CACHE_SIZE, USER_CACHE_TTL)
+medicine_cache = TTLCache("medicine", MEDICINE_CACHE_SIZE, MEDICINE_CACHE_TTL)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {cache.name: cache.stats() for cache in (user_cache, medicine_cache)}
+
+
+@metrics.collector
+def cache_metrics():
+    stats = cache_stats()
+    yield "agent_cache_requests_total", "counter", "Tool cache lookups by result.", {
+        (("cache", name), ("result", result)): values[key]
+        for name, values in stats.items()
+        for result, key in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced"))
+    }
+    yield "agent_cache_entries", "gauge", "Entries held by each tool cache.", {
+        (("cache", name),): values["size"] for name, values in stats.items()
+    }
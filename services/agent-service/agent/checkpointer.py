@@ -0,0 +1,328 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoints.sqlite")
+CHECKPOINT_CACHE_SIZE = int(os.getenv("CHECKPOINT_CACHE_SIZE", "10000"))
+CHECKPOINT_IDLE_SECONDS = float(os.getenv("CHECKPOINT_IDLE_SECONDS", "1800"))
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "2"))
+
+# Serialized values at least this large are zlib-compressed.
+COMPRESS_MIN_BYTES = 1024
+
+
+class SQLiteLRUSaver(BaseCheckpointSaver):
+    """Checkpointer that writes through to SQLite and keeps hot threads in memory.
+
+    Every checkpoint is written to `path` and only the newest `keep`
+    checkpoints of each thread are retained, so disk use grows with the
+    number of threads rather than with turns. The latest checkpoint of up
+    to `cache_size` threads is also kept in memory, serialized, and a
+    thread idle for `idle_seconds` is dropped from memory. Memory therefore
+    stays flat however many threads exist, and conversations survive
+    restarts.
+
+    Several worker processes can share one database. A cached checkpoint
+    is only used while it is still the thread's newest in SQLite, which
+    costs one index lookup instead of reading and decompressing the blob.
+    """
+
+    def __init__(self, path=CHECKPOINT_DB, cache_size=CHECKPOINT_CACHE_SIZE,
+                 idle_seconds=CHECKPOINT_IDLE_SECONDS, keep=CHECKPOINT_KEEP, clock=time.monotonic, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.cache_size = cache_size
+        self.idle_seconds = idle_seconds
+        self.keep = max(1, keep)
+        self.clock = clock
+        self.lock = threading.Lock()
+        # (thread_id, checkpoint_ns) -> (last_used, checkpoint_id, n_writes, row)
+        self.hot = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_id TEXT,
+                type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT NOT NULL,
+                value BLOB NOT NULL,
+                task_path TEXT NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            ) WITHOUT ROWID;
+        """)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # ---- serialization ----
+
+    def _dump(self, value) -> Tuple[str, bytes]:
+        kind, data = self.serde.dumps_typed(value)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return f"{kind}+zlib", zlib.compress(data, 1)
+        return kind, data
+
+    def _load(self, kind: str, data: bytes):
+        if kind.endswith("+zlib"):
+            kind, data = kind[:-len("+zlib")], zlib.decompress(data)
+        return self.serde.loads_typed((kind, data))
+
+    # ---- hot cache ----
+
+    def _evict_idle(self, now):
+        while self.hot:
+            key, (last_used, *_) = next(iter(self.hot.items()))
+            if now - last_used < self.idle_seconds and len(self.hot) <= self.cache_size:
+                break
+            del self.hot[key]
+
+    def _remember(self, key, checkpoint_id, n_writes, row):
+        now = self.clock()
+        self.hot[key] = (now, checkpoint_id, n_writes, row)
+        self.hot.move_to_end(key)
+        self._evict_idle(now)
+
+    def _cached_latest(self, key):
+        entry = self.hot.get(key)
+        if entry is None:
+            return None
+        _, checkpoint_id, n_writes, row = entry
+        latest = self.conn.execute(
+            "SELECT checkpoint_id, (SELECT COUNT(*) FROM writes w WHERE w.thread_id = c.thread_id "
+            "AND w.checkpoint_ns = c.checkpoint_ns AND w.checkpoint_id = c.checkpoint_id) "
+            "FROM checkpoints c WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+            key
+        ).fetchone()
+        if latest != (checkpoint_id, n_writes):
+            del self.hot[key]
+            return None
+        self._remember(key, checkpoint_id, n_writes, row)
+        return row
+
+    # ---- reads ----
+
+    def _writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        rows = self.conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        rows.sort(key=lambda r: writes_sort_key(r[5], r[0], r[1]))
+        return [(task_id, channel, kind, value) for task_id, _, channel, kind, value, _ in rows]
+
+    def _row(self, thread_id, checkpoint_ns, checkpoint_id=None):
+        if checkpoint_id:
+            found = self.conn.execute(
+                "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchone()
+        else:
+            found = self.conn.execute(
+                "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns)
+            ).fetchone()
+        if found is None:
+            return None
+        return (*found, self._writes(thread_id, checkpoint_ns, found[0]))
+
+    def _tuple(self, thread_id, checkpoint_ns, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, kind, checkpoint, metadata_kind, metadata, writes = row
+
+        def config_for(cid):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            config=config_for(checkpoint_id),
+            checkpoint=self._load(kind, checkpoint),
+            metadata=self._load(metadata_kind, metadata),
+            parent_config=config_for(parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self._load(k, v)) for task_id, channel, k, v in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        key = (thread_id, checkpoint_ns)
+
+        with self.lock:
+            row = None if checkpoint_id else self._cached_latest(key)
+            if row is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                row = self._row(thread_id, checkpoint_ns, checkpoint_id)
+                if row is None:
+                    return None
+                if not checkpoint_id:
+                    self._remember(key, row[0], len(row[6]), row)
+        return self._tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints WHERE 1 = 1"
+        params = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self.lock:
+            keys = self.conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, checkpoint_id in keys:
+            if limit is not None and limit <= 0:
+                break
+            with self.lock:
+                row = self._row(thread_id, checkpoint_ns, checkpoint_id)
+            if row is None:
+                continue
+            item = self._tuple(thread_id, checkpoint_ns, row)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    # ---- writes ----
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        kind, data = self._dump(checkpoint)
+        metadata_kind, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+        row = (checkpoint["id"], config["configurable"].get("checkpoint_id"), kind, data, metadata_kind, metadata_data)
+
+        with self.lock:
+            with self._transaction():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, *row)
+                )
+                stale = self.conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.keep)
+                ).fetchall()
+                for (checkpoint_id,) in stale:
+                    for table in ("checkpoints", "writes"):
+                        self.conn.execute(
+                            f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                            (thread_id, checkpoint_ns, checkpoint_id)
+                        )
+            self._remember((thread_id, checkpoint_ns), checkpoint["id"], 0, (*row, []))
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            rows.append((idx >= 0, (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel,
+                                    *self._dump(value), task_path)))
+
+        with self.lock:
+            with self._transaction():
+                for keep_first, row in rows:
+                    # Regular writes are idempotent per (task, idx); special channels overwrite.
+                    verb = "INSERT OR IGNORE" if keep_first else "INSERT OR REPLACE"
+                    self.conn.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            # The cached row no longer has every pending write; reload it on next read.
+            self.hot.pop((thread_id, checkpoint_ns), None)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            with self._transaction():
+                self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            for key in [key for key in self.hot if key[0] == thread_id]:
+                del self.hot[key]
+
+    # ---- async: SQLite work runs in a thread so the event loop never waits on disk ----
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "hot_threads": len(self.hot)}
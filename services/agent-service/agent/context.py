@@ -0,0 +1,98 @@
+import json
+import os
+from typing import Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+
+# Prompt budget for the conversation, excluding the system prompt. Once the
+# history exceeds it, the oldest turns are summarized until the rest fits in
+# CONTEXT_KEEP_RATIO of it, so the summary is redone every few turns, not every turn.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_KEEP_RATIO = float(os.getenv("CONTEXT_KEEP_RATIO", "0.5"))
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "4000"))
+
+SUMMARY_PROMPT = """Summarize the conversation between a user and the AushadX medical assistant below.
+Keep every medicine, dosage, schedule, allergy, condition and decision mentioned, and anything still unresolved.
+Write at most 200 words of plain prose. If a previous summary is given, fold it in."""
+
+
+def message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Rough token count (about 4 characters per token) including tool-call arguments."""
+    total = 0
+    for message in messages:
+        chars = len(message_text(message))
+        for call in getattr(message, "tool_calls", None) or []:
+            chars += len(call["name"]) + len(json.dumps(call["args"]))
+        total += chars // 4 + 4
+    return total
+
+
+def cap_tool_content(content, limit: int = None):
+    """Truncate a tool result that would not fit in the prompt, saying how much was cut."""
+    limit = TOOL_RESULT_MAX_CHARS if limit is None else limit
+    if not isinstance(content, str) or len(content) <= limit:
+        return content
+    return f"{content[:limit]}... [truncated {len(content) - limit} characters]"
+
+
+def window_start(messages: Sequence[BaseMessage], budget: int, keep_ratio: float = None) -> int:
+    """Index of the first message to send verbatim; everything before it gets summarized.
+
+    Returns 0 while the history fits in `budget`. Otherwise the window starts
+    at the oldest user turn whose suffix fits in `keep_ratio * budget`, and
+    never after the current turn. Cutting only at a HumanMessage keeps every
+    AIMessage with tool calls next to its ToolMessages.
+    """
+    keep_ratio = CONTEXT_KEEP_RATIO if keep_ratio is None else keep_ratio
+    if estimate_tokens(messages) <= budget:
+        return 0
+
+    turns = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not turns:
+        return 0
+    start = turns[-1]
+    for i in reversed(turns[:-1]):
+        if estimate_tokens(messages[i:]) > keep_ratio * budget:
+            break
+        start = i
+    return start
+
+
+def transcript(messages: Sequence[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {message_text(message)}")
+        elif isinstance(message, AIMessage):
+            if message_text(message):
+                lines.append(f"Assistant: {message_text(message)}")
+            for call in message.tool_calls:
+                lines.append(f"Assistant called {call['name']}({json.dumps(call['args'])})")
+        else:
+            lines.append(f"Tool result: {cap_tool_content(message_text(message), 500)}")
+    return "\n".join(lines)
+
+
+async def summarize(llm, summary: str, messages: Sequence[BaseMessage]) -> str:
+    """Fold `messages` into the rolling `summary` with one LLM call."""
+    previous = f"Previous summary:\n{summary}\n\n" if summary else ""
+    response = await llm.ainvoke(
+        [
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"{previous}Conversation:\n{transcript(messages)}"),
+        ],
+        # Keep the summary out of streamed chat tokens
+        config={"tags": [TAG_NOSTREAM]},
+    )
+    return message_text(response)
+
+
+def system_message(base: str, summary: Optional[str]) -> SystemMessage:
+    if summary:
+        base = f"{base}\n\nSummary of the earlier conversation:\n{summary}"
+    return SystemMessage(content=base)
@@ -1,28 +1,61 @@
 from typing import TypedDict, Annotated, Sequence, Union
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage, RemoveMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
+from langgraph.graph.message import add_messages
+import asyncio
+import json
 import os
+import threading
+import weakref
 from agent.tools import tools
-from dotenv import load_dotenv
-
-load_dotenv()
+from agent import context, metrics
+from agent.http_client import HTTP_DEADLINE
+from utils.logger import logger
 
 # Define Agent State
 class AgentState(TypedDict):
-    messages: Sequence[BaseMessage]
+    # add_messages appends each node's output instead of replacing the history
+    messages: Annotated[Sequence[BaseMessage], add_messages]
+    # Rolling summary of the turns that have been trimmed from `messages`
+    summary: str
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(
-    model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0
-)
+# The LLM is built on first use, or by the warm-up: importing
+# langchain_google_genai alone takes most of a second.
+llm = None
+llm_with_tools = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    global llm
+    with _llm_lock:
+        if llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            llm = ChatGoogleGenerativeAI(
+                model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+                google_api_key=os.getenv("GOOGLE_API_KEY"),
+                temperature=0
+            )
+    return llm
+
+def get_llm_with_tools():
+    """The LLM with the tools bound."""
+    global llm_with_tools
+    if llm_with_tools is None:
+        llm_with_tools = get_llm().bind_tools(tools)
+    return llm_with_tools
 
-# Bind tools to LLM
-llm_with_tools = llm.bind_tools(tools)
+# Cap on Gemini calls in flight per worker process; excess turns wait their turn.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+# asyncio primitives belong to one event loop, so keep one semaphore per loop.
+_llm_semaphores = weakref.WeakKeyDictionary()
+
+def llm_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _llm_semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
 
 # System Prompt
 SYSTEM_PROMPT = """You are AushadX, an intelligent medical assistant. 
@@ -33,17 +66,74 @@ Be helpful, empathetic, and concise. Always prioritize patient safety and advise
 from langchain_core.runnables import RunnableConfig
 
 # Define Nodes
-def call_model(state: AgentState, config: RunnableConfig):
-    messages = state["messages"]
+@metrics.traced("node", "agent")
+async def call_model(state: AgentState, config: RunnableConfig):
+    messages = list(state["messages"])
+    summary = state.get("summary", "")
     user_id = config["configurable"].get("thread_id", "unknown")
-    
+
+    # Fold turns that no longer fit the token budget into the rolling summary,
+    # and drop them from the state so checkpoints stop growing too.
+    update = {"messages": []}
+    budget = context.CONTEXT_TOKEN_BUDGET - context.estimate_tokens([SystemMessage(content=summary)])
+    start = context.window_start(messages, budget)
+    if start:
+        async with llm_semaphore():
+            with metrics.span("llm", "summarize"):
+                summary = await context.summarize(get_llm(), summary, messages[:start])
+        update = {"summary": summary, "messages": [RemoveMessage(id=m.id) for m in messages[:start]]}
+        messages = messages[start:]
+
     # Prepend system message to the current interaction
-    system_message = f"{SYSTEM_PROMPT}\nCurrent User ID: {user_id}"
-    prompt = [SystemMessage(content=system_message)] + messages
-    response = llm_with_tools.invoke(prompt)
-    return {"messages": [response]}
+    system_message = context.system_message(f"{SYSTEM_PROMPT}\nCurrent User ID: {user_id}", summary)
+    prompt = [system_message] + messages
+    async with llm_semaphore():
+        with metrics.span("llm", "chat"):
+            response = await get_llm_with_tools().ainvoke(prompt)
+    metrics.record_usage("chat", response)
+    update["messages"].append(response)
+    return update
+
+tools_by_name = {t.name: t for t in tools}
+
+# Tool calls from one model turn run concurrently, at most TOOL_MAX_CONCURRENCY
+# at a time, and each one is abandoned after TOOL_TIMEOUT seconds.
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "15"))
+if TOOL_TIMEOUT <= HTTP_DEADLINE:
+    logger.warning("TOOL_TIMEOUT (%gs) is not above HTTP_DEADLINE (%gs), so downstream retries may never run", TOOL_TIMEOUT, HTTP_DEADLINE)
+
+def tool_error(tool_call, error: str) -> ToolMessage:
+    return ToolMessage(
+        content=json.dumps({"error": error, "message": f"Tool {tool_call['name']} did not complete."}),
+        name=tool_call["name"],
+        tool_call_id=tool_call["id"],
+        status="error",
+    )
 
-tool_node = ToolNode(tools)
+async def run_tool_call(tool_call, semaphore: asyncio.Semaphore, config: RunnableConfig) -> ToolMessage:
+    tool = tools_by_name.get(tool_call["name"])
+    if tool is None:
+        return tool_error(tool_call, f"Unknown tool: {tool_call['name']}")
+    async with semaphore:
+        try:
+            # Passing the whole tool call makes the tool return a ToolMessage
+            with metrics.span("tool", tool.name):
+                message = await asyncio.wait_for(tool.ainvoke({**tool_call, "type": "tool_call"}, config), TOOL_TIMEOUT)
+            message.content = context.cap_tool_content(message.content)
+            return message
+        except asyncio.TimeoutError:
+            return tool_error(tool_call, f"Timed out after {TOOL_TIMEOUT:g}s")
+        except Exception as e:
+            return tool_error(tool_call, str(e) or repr(e))
+
+@metrics.traced("node", "tools")
+async def call_tools(state: AgentState, config: RunnableConfig):
+    """Run every tool call of the last model turn concurrently, keeping their order."""
+    tool_calls = state["messages"][-1].tool_calls
+    semaphore = asyncio.Semaphore(TOOL_MAX_CONCURRENCY)
+    results = await asyncio.gather(*(run_tool_call(call, semaphore, config) for call in tool_calls))
+    return {"messages": list(results)}
 
 def should_continue(state: AgentState):
     last_message = state["messages"][-1]
@@ -55,7 +145,7 @@ def should_continue(state: AgentState):
 workflow = StateGraph(AgentState)
 
 workflow.add_node("agent", call_model)
-workflow.add_node("tools", tool_node)
+workflow.add_node("tools", call_tools)
 
 workflow.set_entry_point("agent")
 workflow.add_conditional_edges(
@@ -68,8 +158,17 @@ workflow.add_conditional_edges(
 )
 workflow.add_edge("tools", "agent")
 
-from langgraph.checkpoint.memory import MemorySaver
+from agent.checkpointer import SQLiteLRUSaver
 
-# Compile Graph with Persistence
-memory = MemorySaver()
+# Compile Graph with Persistence: SQLite on disk, recently active threads in memory
+memory = SQLiteLRUSaver()
 graph = workflow.compile(checkpointer=memory)
+
+@metrics.collector
+def checkpoint_metrics():
+    stats = memory.stats()
+    yield "agent_checkpoint_cache_total", "counter", "Checkpoint reads served from memory or SQLite.", {
+        (("result", "hit"),): stats["hits"],
+        (("result", "miss"),): stats["misses"],
+    }
+    yield "agent_checkpoint_hot_threads", "gauge", "Threads whose latest checkpoint is held in memory.", {(): stats["hot_threads"]}
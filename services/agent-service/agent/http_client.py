@@ -0,0 +1,187 @@
+import asyncio
+import os
+import random
+import time
+import weakref
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import httpx
+from agent import metrics
+from utils.logger import logger
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+# Kept under the graph's TOOL_TIMEOUT (15s), so a call's retries and its own
+# timeout error happen before the tool call around it is abandoned.
+HTTP_DEADLINE = float(os.getenv("HTTP_DEADLINE", "12"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Failures where the request never reached the server, so even a POST is safe to resend.
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a downstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    fail fast. Once `reset_timeout` seconds have passed a single trial call
+    is let through (half-open): success closes the circuit, failure opens
+    it again for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self.trial_in_flight = False
+
+
+class ServiceClient:
+    """Async client for one downstream service.
+
+    Owns a keep-alive connection pool and a circuit breaker. Each attempt
+    has `timeout` seconds and the whole call, retries included, has
+    `deadline` seconds. GETs are retried on transport errors and on
+    429/502/503/504. POSTs are retried only when the request never left,
+    since resending one could schedule a reminder twice.
+    """
+
+    def __init__(self, name, timeout=HTTP_TIMEOUT, deadline=HTTP_DEADLINE, retries=HTTP_RETRIES,
+                 backoff=0.2, max_connections=HTTP_MAX_CONNECTIONS, breaker=None, transport=None):
+        self.name = name
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _retryable(self, method, exc=None, response=None):
+        if response is not None:
+            return method == "GET" and response.status_code in RETRYABLE_STATUS
+        if method == "GET":
+            return isinstance(exc, httpx.TransportError)
+        return isinstance(exc, NOT_SENT_ERRORS)
+
+    async def _attempt(self, method, url, json):
+        if not self.breaker.allow():
+            metrics.downstream_requests_total.inc(service=self.name, outcome="circuit_open")
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        try:
+            response = await self.client.request(method, url, json=json)
+        except BaseException as e:
+            # Anything, not just transport errors: a cancellation or a body that
+            # fails to decode must end a half-open trial too, or the breaker
+            # would wait on it forever.
+            self.breaker.record_failure()
+            metrics.downstream_requests_total.inc(service=self.name, outcome=type(e).__name__)
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        metrics.downstream_requests_total.inc(service=self.name, outcome=f"{response.status_code // 100}xx")
+        return response
+
+    async def _request(self, method, url, json):
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._attempt(method, url, json)
+            except httpx.TransportError as e:
+                if attempt == self.retries or not self._retryable(method, exc=e):
+                    raise
+                logger.warning(f"{self.name} {method} {url} failed ({e!r}), retrying")
+            else:
+                if attempt == self.retries or not self._retryable(method, response=response):
+                    response.raise_for_status()
+                    return response.json()
+                logger.warning(f"{self.name} {method} {url} returned {response.status_code}, retrying")
+            await asyncio.sleep(random.random() * self.backoff * 2 ** attempt)
+
+    async def request(self, method: str, url: str, json: Optional[Dict[str, Any]] = None) -> Any:
+        """Send a request and return the decoded JSON body.
+
+        Raises `httpx.HTTPError` for failed requests, `CircuitOpenError`
+        when the breaker is open and `asyncio.TimeoutError` past the deadline.
+        """
+        with metrics.span("http", self.name):
+            return await asyncio.wait_for(self._request(method, url, json), self.deadline)
+
+    async def get(self, url: str) -> Any:
+        return await self.request("GET", url)
+
+    async def post(self, url: str, json: Dict[str, Any]) -> Any:
+        return await self.request("POST", url, json=json)
+
+
+# Pools are bound to the event loop they were created on, so keep one set per loop.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client(name: str) -> ServiceClient:
+    """Shared client for the downstream `name` (analyzer, scheduler, profile)."""
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(name)
+    if client is None:
+        client = clients[name] = ServiceClient(name)
+    return client
+
+
+async def close_clients():
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+@metrics.collector
+def breaker_metrics():
+    # One client per service per event loop, normally a single loop
+    states = Counter(
+        (("service", name), ("state", client.breaker.state))
+        for clients in list(_clients.values()) for name, client in clients.items()
+    )
+    yield "agent_circuit_breakers", "gauge", "Downstream circuit breakers by state.", dict(states)
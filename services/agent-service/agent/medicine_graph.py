@@ -0,0 +1,202 @@
+import bisect
+import itertools
+import json
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from agent.medicine_index import Blob, MappedFiles, normalize_name
+from utils.logger import logger
+
+MEDICINE_GRAPH_PATH = os.getenv("MEDICINE_GRAPH_PATH", "medicine_graph")
+
+FORMAT = "aushadx-medicine-graph"
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+# Names scanned past an exact match when resolving "dolo 650" to "dolo 650 tablet".
+PREFIX_SCAN_LIMIT = 200
+
+
+def ingredient_name(composition: str) -> str:
+    """"Amoxycillin  (500mg)" -> "amoxycillin"."""
+    return normalize_name(re.sub(r"\([^)]*\)", " ", composition))
+
+
+class _AdjacencyList:
+    def __init__(self, offsets, ids):
+        self.offsets = offsets
+        self.ids = ids
+
+    def row(self, i: int, limit: Optional[int] = None) -> List[int]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.ids[start:end].tolist()
+
+
+class MedicineGraph(MappedFiles):
+    """Read-only composition and substitute graph of the medicine dataset, built by vectordbScript.
+
+    `python script.py --medicine-graph` writes the graph directory: sorted
+    medicine, ingredient, class and composition names, per-medicine price,
+    class and composition ids, and adjacency lists between them. All of it
+    is memory-mapped, so a query is a bisect and a few list slices.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT or meta.get("version") != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} medicine graph")
+
+        super().__init__(path)
+        self.count = meta["medicines"]
+        self.medicines = self._blob("medicines")
+        self.ingredients = self._blob("ingredients")
+        self.classes = self._blob("classes")
+        self.compositions = self._blob("compositions")
+        self.prices = self._map("medicine_prices.f4", "f")
+        self.medicine_classes = self._map("medicine_classes.u4", "I")
+        self.medicine_composition = self._map("medicine_composition.u4", "I")
+        self.medicine_ingredients = self._adjacency("medicine_ingredients")
+        self.ingredient_medicines = self._adjacency("ingredient_medicines")
+        self.class_medicines = self._adjacency("class_medicines")
+        self.composition_medicines = self._adjacency("composition_medicines")
+        self.medicine_substitutes = self._adjacency("medicine_substitutes")
+
+    def _blob(self, stem):
+        return Blob(self._map(f"{stem}.bin"), self._map(f"{stem}.off", "Q"))
+
+    def _adjacency(self, stem):
+        return _AdjacencyList(self._map(f"{stem}.off", "Q"), self._map(f"{stem}.ids", "I"))
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _exact(blob: Blob, key: bytes) -> Optional[int]:
+        i = bisect.bisect_left(blob, key)
+        if i < len(blob) and blob[i] == key:
+            return i
+        return None
+
+    def find_medicine(self, name: str) -> Optional[int]:
+        """Id of the medicine called `name`, or else of the shortest one it is a whole-word prefix of."""
+        key = normalize_name(name).encode("utf-8")
+        if not key:
+            return None
+        best = None
+        i = bisect.bisect_left(self.medicines, key)
+        for i in range(i, min(i + PREFIX_SCAN_LIMIT, self.count)):
+            candidate = self.medicines[i]
+            if not candidate.startswith(key):
+                break
+            if len(candidate) == len(key):
+                return i
+            if candidate[len(key):len(key) + 1] == b" " and (best is None or len(candidate) < len(self.medicines[best])):
+                best = i
+        return best
+
+    def find_ingredient(self, name: str) -> Optional[int]:
+        return self._exact(self.ingredients, ingredient_name(name).encode("utf-8"))
+
+    def price(self, i: int) -> Optional[float]:
+        price = self.prices[i]
+        return None if math.isnan(price) else round(price, 2)
+
+    def _class(self, i: int, slot: int) -> Optional[str]:
+        class_id = self.medicine_classes[i * 2 + slot]
+        return None if class_id == NONE else self.classes[class_id].decode("utf-8")
+
+    def therapeutic_class(self, i: int) -> Optional[str]:
+        return self._class(i, 0)
+
+    def action_class(self, i: int) -> Optional[str]:
+        return self._class(i, 1)
+
+    def medicine(self, i: int) -> Dict[str, Any]:
+        composition = self.medicine_composition[i]
+        medicine = {
+            "name": self.medicines[i].decode("utf-8"),
+            "price": self.price(i),
+            "composition": None if composition == NONE else self.compositions[composition].decode("utf-8"),
+            "therapeutic_class": self.therapeutic_class(i),
+            "action_class": self.action_class(i),
+        }
+        return {key: value for key, value in medicine.items() if value is not None}
+
+    def substitutes(self, i: int, limit: int = 5) -> List[int]:
+        """Medicines with the same composition as `i`, or listed as its substitutes, cheapest first."""
+        # Both lists are stored cheapest first, so their heads hold the answer
+        composition = self.medicine_composition[i]
+        same = self.composition_medicines.row(composition, limit + 1) if composition != NONE else []
+        candidates = set(same) | set(self.medicine_substitutes.row(i, limit))
+        candidates.discard(i)
+        return sorted(candidates, key=lambda j: (self.price(j) is None, self.price(j) or 0, j))[:limit]
+
+    def resolve(self, name: str) -> Optional[Dict[str, Any]]:
+        """What `name` refers to: a medicine, or failing that an ingredient ("Paracetamol")."""
+        i = self.find_medicine(name)
+        if i is not None:
+            return {
+                "query": name,
+                "matched": self.medicines[i].decode("utf-8"),
+                "ingredients": set(self.medicine_ingredients.row(i)),
+                "therapeutic_class": self.therapeutic_class(i),
+                "action_class": self.action_class(i),
+            }
+        ingredient = self.find_ingredient(name)
+        if ingredient is not None:
+            return {"query": name, "matched": self.ingredients[ingredient].decode("utf-8"), "ingredients": {ingredient}}
+        return None
+
+    def overlaps(self, names: Sequence[str]) -> Dict[str, Any]:
+        """Pairs of `names` sharing an ingredient or a therapeutic or action class.
+
+        Two brands of one ingredient add up to a double dose, and two
+        medicines of one action class are usually a duplicated therapy.
+        """
+        resolved, unresolved = [], []
+        for name in names:
+            found = self.resolve(name)
+            if found is None:
+                unresolved.append(name)
+            else:
+                resolved.append(found)
+
+        pairs = []
+        for a, b in itertools.combinations(resolved, 2):
+            overlap = {}
+            shared = sorted(a["ingredients"] & b["ingredients"])
+            if shared:
+                overlap["shared_ingredients"] = [self.ingredients[k].decode("utf-8") for k in shared]
+            for key in ("action_class", "therapeutic_class"):
+                if a.get(key) and a.get(key) == b.get(key):
+                    overlap[f"same_{key}"] = a[key]
+            if overlap:
+                pairs.append({"medicines": [a["query"], b["query"]], **overlap})
+        return {
+            "checked": [{"query": r["query"], "matched": r["matched"]} for r in resolved],
+            "unresolved": unresolved,
+            "overlaps": pairs,
+        }
+
+
+_graph = None
+_graph_loaded = False
+
+
+def get_medicine_graph() -> Optional[MedicineGraph]:
+    """The graph at MEDICINE_GRAPH_PATH, opened on first use, or None if there is none."""
+    global _graph, _graph_loaded
+    if not _graph_loaded:
+        _graph_loaded = True
+        if os.path.exists(os.path.join(MEDICINE_GRAPH_PATH, "meta.json")):
+            try:
+                _graph = MedicineGraph(MEDICINE_GRAPH_PATH)
+                logger.info(f"Opened medicine graph of {len(_graph)} medicines")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not open medicine graph at {MEDICINE_GRAPH_PATH}: {e}")
+    return _graph
@@ -0,0 +1,203 @@
+import bisect
+import json
+import mmap
+import os
+import zlib
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logger import logger
+
+MEDICINE_INDEX_PATH = os.getenv("MEDICINE_INDEX_PATH", "medicine_index")
+
+FORMAT = "aushadx-medicine-lookup"
+VERSION = 1
+
+# Trigrams shared by more names than this are too common to narrow a fuzzy search.
+MAX_POSTINGS = 5000
+FUZZY_CANDIDATES = 50
+FUZZY_MIN_SCORE = 0.8
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def trigram_keys(name: str):
+    padded = f"  {name} "
+    return {zlib.crc32(padded[i:i + 3].encode("utf-8")) for i in range(len(padded) - 2)}
+
+
+class Blob:
+    """The byte strings of a mmapped blob, as a sequence indexed through its offset table.
+
+    Sorted blobs can be searched with bisect.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+
+class MappedFiles:
+    """Base for read-only indexes whose files are memory-mapped from one directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._maps = []
+        self._views = []
+
+    def _map(self, name, fmt=None):
+        with open(os.path.join(self.path, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"").cast(fmt) if fmt else memoryview(b"")
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(data)
+        view = memoryview(data)
+        view = view.cast(fmt) if fmt else view
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        for data in self._maps:
+            data.close()
+
+
+class MedicineIndex(MappedFiles):
+    """Read-only lookup over the medicine dataset, built by vectordbScript.
+
+    `python script.py --lookup-index` writes the index directory. Every file
+    is memory-mapped, so opening it costs a few syscalls however large it is.
+    Exact and prefix search bisect the sorted name table; fuzzy search
+    gathers candidates from a trigram inverted index and ranks them by
+    similarity ratio.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT or meta.get("version") != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} medicine lookup index")
+
+        super().__init__(path)
+        self.count = meta["count"]
+        self.names = self._map("names.bin")
+        self.name_offsets = self._map("names.off", "Q")
+        self.records = self._map("records.bin")
+        self.record_offsets = self._map("records.off", "Q")
+        self.trigram_keys = self._map("trigrams.keys", "I")
+        self.trigram_offsets = self._map("trigrams.off", "Q")
+        self.postings = self._map("trigrams.post", "I")
+        self._sorted = Blob(self.names, self.name_offsets)
+
+    def __len__(self):
+        return self.count
+
+    def name_bytes(self, i: int) -> bytes:
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]])
+
+    def name(self, i: int) -> str:
+        return self.name_bytes(i).decode("utf-8")
+
+    def record(self, i: int) -> Dict[str, Any]:
+        return json.loads(bytes(self.records[self.record_offsets[i]:self.record_offsets[i + 1]]))
+
+    def exact(self, name: str) -> Optional[int]:
+        key = normalize_name(name).encode("utf-8")
+        i = bisect.bisect_left(self._sorted, key)
+        if i < self.count and self.name_bytes(i) == key:
+            return i
+        return None
+
+    def prefix(self, prefix: str, limit: int = 10, whole_words: bool = False) -> List[int]:
+        """Ids of names starting with `prefix`, shortest first.
+
+        With `whole_words`, "dolo 650" matches "dolo 650 tablet" but not "dolo 6500".
+        """
+        key = normalize_name(prefix).encode("utf-8")
+        if not key:
+            return []
+        found = []
+        i = bisect.bisect_left(self._sorted, key)
+        while i < self.count and len(found) < limit * 4:
+            name = self.name_bytes(i)
+            if not name.startswith(key):
+                break
+            if not whole_words or len(name) == len(key) or name[len(key):len(key) + 1] == b" ":
+                found.append(i)
+            i += 1
+        return sorted(found, key=lambda j: (self.name_offsets[j + 1] - self.name_offsets[j], j))[:limit]
+
+    def _posting(self, key: int):
+        i = bisect.bisect_left(self.trigram_keys, key)
+        if i == len(self.trigram_keys) or self.trigram_keys[i] != key:
+            return None
+        return self.postings[self.trigram_offsets[i]:self.trigram_offsets[i + 1]]
+
+    def fuzzy(self, name: str, limit: int = 5, min_score: float = FUZZY_MIN_SCORE) -> List[Tuple[int, float]]:
+        """(id, score) of names similar to `name`, best first, with score >= `min_score`."""
+        query = normalize_name(name)
+        postings = [p for p in (self._posting(key) for key in trigram_keys(query)) if p is not None]
+        if not postings:
+            return []
+        selective = [p for p in postings if len(p) <= MAX_POSTINGS] or [min(postings, key=len)]
+
+        counts = Counter()
+        for posting in selective:
+            counts.update(posting)
+        scored = []
+        for i, _ in counts.most_common(FUZZY_CANDIDATES):
+            score = SequenceMatcher(None, query, self.name(i)).ratio()
+            if score >= min_score:
+                scored.append((i, score))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def lookup(self, name: str, candidates: int = 5) -> Optional[Dict[str, Any]]:
+        """Record for `name` when it names exactly one medicine.
+
+        Returns `{"match": "exact" | "prefix", "medicine": record}` for an exact
+        name or the whole-word prefix of a single name. Anything looser comes
+        back as `{"match": "ambiguous" | "fuzzy", "candidates": [name, ...]}`
+        without a record: "dolo 500 tablet" is one edit from "dolo 650 tablet"
+        but a different dose, so only the caller may pick between them.
+        """
+        i = self.exact(name)
+        if i is not None:
+            return {"match": "exact", "medicine": self.record(i)}
+        found = self.prefix(name, limit=candidates, whole_words=True)
+        if len(found) == 1:
+            return {"match": "prefix", "medicine": self.record(found[0])}
+        if found:
+            return {"match": "ambiguous", "candidates": [self.name(j) for j in found]}
+        found = self.fuzzy(name, limit=candidates)
+        if found:
+            return {"match": "fuzzy", "candidates": [self.name(j) for j, _ in found]}
+        return None
+
+
+_index = None
+_index_loaded = False
+
+
+def get_index() -> Optional[MedicineIndex]:
+    """The index at MEDICINE_INDEX_PATH, opened on first use, or None if there is none."""
+    global _index, _index_loaded
+    if not _index_loaded:
+        _index_loaded = True
+        if os.path.exists(os.path.join(MEDICINE_INDEX_PATH, "meta.json")):
+            try:
+                _index = MedicineIndex(MEDICINE_INDEX_PATH)
+                logger.info(f"Opened medicine lookup index with {len(_index)} names")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not open medicine lookup index at {MEDICINE_INDEX_PATH}: {e}")
+    return _index
@@ -0,0 +1,222 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; Gemini turns take seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+_collectors = []
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def value(self, **labels):
+        """(count, sum) of the observations with these labels."""
+        entry = self._values.get(self._key(labels))
+        return (entry[2], entry[1]) if entry else (0, 0.0)
+
+    def _samples(self, key, entry):
+        counts, total, count = entry
+        names = self.label_names + ("le",)
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            yield f"{self.name}_bucket{_labels(names, key + (le,))} {cumulative}"
+        yield f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}"
+        yield f"{self.name}_count{_labels(self.label_names, key)} {count}"
+
+
+def collector(func: Callable[[], Iterable[Tuple[str, str, str, Dict[Tuple, float]]]]):
+    """Register `func`, called at scrape time, yielding `(name, type, help, {label pairs: value})`.
+
+    For numbers that already live elsewhere, like cache hit counts, so the
+    hot path does not have to update two places.
+    """
+    _collectors.append(func)
+    return func
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for func in _collectors:
+        for name, type, help, samples in func():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            for pairs, value in samples.items():
+                labels = _labels([k for k, _ in pairs], [v for _, v in pairs])
+                lines.append(f"{name}{labels} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+requests_total = Counter("agent_requests_total", "HTTP requests handled.", ("endpoint", "status"))
+request_seconds = Histogram("agent_request_seconds", "HTTP request latency, until the last body byte.", ("endpoint",))
+requests_in_flight = Gauge("agent_requests_in_flight", "HTTP requests being handled.", ("endpoint",))
+span_seconds = Histogram("agent_span_seconds", "Latency of graph nodes, LLM calls and tool calls.", ("kind", "name"))
+spans_in_flight = Gauge("agent_spans_in_flight", "Graph nodes, LLM calls and tool calls running.", ("kind", "name"))
+span_errors_total = Counter("agent_span_errors_total", "Spans that raised or timed out.", ("kind", "name", "error"))
+llm_tokens_total = Counter("agent_llm_tokens_total", "Gemini tokens reported in usage metadata.", ("call", "type"))
+downstream_requests_total = Counter(
+    "agent_downstream_requests_total", "Downstream HTTP attempts by outcome.", ("service", "outcome")
+)
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def server_timing(self) -> str:
+        """Total time per span as a `Server-Timing` header value, e.g. `llm.chat;dur=812.3`."""
+        totals = {}
+        for kind, name, _, duration in self.spans:
+            key = f"{kind}.{name}"
+            totals[key] = totals.get(key, 0.0) + duration
+        return ", ".join(f"{key};dur={seconds * 1000:.1f}" for key, seconds in totals.items())
+
+
+_trace = contextvars.ContextVar("agent_trace", default=None)
+
+
+def start_trace(trace_id: Optional[str] = None) -> Trace:
+    """Start collecting spans for the current request.
+
+    Tasks spawned afterwards (graph nodes, parallel tool calls) copy the
+    context and so append to the same trace.
+    """
+    trace = Trace(trace_id)
+    _trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Time a block into `agent_span_seconds` and the current trace, if any."""
+    spans_in_flight.inc(kind=kind, name=name)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        span_errors_total.inc(kind=kind, name=name, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        spans_in_flight.dec(kind=kind, name=name)
+        span_seconds.observe(elapsed, kind=kind, name=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.spans.append((kind, name, start - trace.started, elapsed))
+
+
+def traced(kind: str, name: str):
+    """Decorator form of `span` for coroutine functions such as graph nodes."""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(kind, name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_usage(call: str, message):
+    """Count the tokens of an LLM response that reports `usage_metadata`."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    for type in ("input_tokens", "output_tokens"):
+        if usage.get(type):
+            llm_tokens_total.inc(usage[type], call=call, type=type.split("_")[0])
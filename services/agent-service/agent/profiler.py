@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# Off by default: a profiled request costs a sampling thread for its duration.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+
+class SamplingProfiler:
+    """Samples the Python stack of one thread every `interval` seconds.
+
+    Sampling happens from a background thread through `sys._current_frames()`,
+    so the profiled code runs unmodified. Samples are kept as folded stacks
+    (`outer;inner;leaf count`), the input format of flamegraph.pl and
+    speedscope. Profiling the event loop thread also catches whatever other
+    requests ran on it meanwhile, and time spent waiting shows up as the
+    loop's `select` call.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+
+
+def profile_path(trace_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{trace_id}.folded")
@@ -1,18 +1,63 @@
+import asyncio
 import os
+import httpx
 import requests
 import json
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from utils.logger import logger
-from dotenv import load_dotenv
-
-load_dotenv()
+from agent.http_client import CircuitOpenError, HTTP_TIMEOUT, get_client
+from agent.cache import medicine_cache, user_cache
+from agent import medicine_graph, medicine_index
 
 MEDICINE_ANALYZER_URL = os.getenv("MEDICINE_ANALYZER_URL", "http://localhost:3002")
 MEDICINE_SCHEDULER_URL = os.getenv("MEDICINE_SCHEDULER_URL", "http://localhost:3001")
 PROFILE_MANAGER_URL = os.getenv("PROFILE_MANAGER_URL", "http://localhost:3003")
 
+# Errors the async tool implementations turn into an error payload for the agent.
+ASYNC_ERRORS = (httpx.HTTPError, CircuitOpenError, asyncio.TimeoutError)
+
+# Keep-alive pool for the sync tool path.
+session = requests.Session()
+
+def succeeded(result) -> bool:
+    """Whether a tool result is real data rather than an error payload, and so cacheable."""
+    return not (isinstance(result, dict) and "error" in result)
+
+def medicine_key(medicine_name: str) -> str:
+    return " ".join(medicine_name.lower().split())
+
+def async_impl(sync_tool):
+    """Register the decorated coroutine as `sync_tool`'s async implementation, used by `ainvoke`."""
+    def register(coroutine):
+        sync_tool.coroutine = coroutine
+        return coroutine
+    return register
+
+def analysis_payload(text: str, user_id: Optional[str]) -> Dict[str, Any]:
+    payload = {"medicine_data": {"text": text}}
+    if user_id:
+        payload["userId"] = user_id
+    return payload
+
+def request_analysis(text: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        url = f"{MEDICINE_ANALYZER_URL}/analyze"
+        response = session.post(url, json=analysis_payload(text, user_id), timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        logger.error(f"Error calling analyze_medicine: {e}")
+        return {"error": str(e), "message": "Failed to analyze medicine text."}
+
+async def request_analysis_async(text: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        return await get_client("analyzer").post(f"{MEDICINE_ANALYZER_URL}/analyze", json=analysis_payload(text, user_id))
+    except ASYNC_ERRORS as e:
+        logger.error(f"Error calling analyze_medicine: {e!r}")
+        return {"error": str(e) or repr(e), "message": "Failed to analyze medicine text."}
+
 class MedicineAnalysisInput(BaseModel):
     text: str = Field(description="The text content or OCR result to be analyzed for medicine details.")
     user_id: str = Field(description="The unique identifier of the user.")
@@ -30,15 +75,32 @@ def analyze_medicine(text: str, user_id: str) -> Dict[str, Any]:
     
     Returns a JSON object with the extracted details.
     """
-    try:
-        url = f"{MEDICINE_ANALYZER_URL}/analyze"
-        payload = {"medicine_data": {"text": text}, "userId": user_id}
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        logger.error(f"Error calling analyze_medicine: {e}")
-        return {"error": str(e), "message": "Failed to analyze medicine text."}
+    return request_analysis(text, user_id)
+
+@async_impl(analyze_medicine)
+async def analyze_medicine_async(text: str, user_id: str) -> Dict[str, Any]:
+    return await request_analysis_async(text, user_id)
+
+def lookup_local(medicine_name: str) -> Optional[Dict[str, Any]]:
+    """The local medicine index's match for the name, if there is an index and it has one.
+
+    Only exact and unambiguous prefix matches carry a "medicine" record to answer
+    from; near misses carry just "candidates", since a name one digit off is
+    another strength of the drug.
+    """
+    index = medicine_index.get_index()
+    if index is None:
+        return None
+    found = index.lookup(medicine_name)
+    if found is None:
+        return None
+    return {"source": "local_index", **found}
+
+def with_candidates(result, local: Optional[Dict[str, Any]]):
+    """`result`, plus the local index's near misses as "did_you_mean" when the analyzer failed too."""
+    if succeeded(result) or not local or not local.get("candidates"):
+        return result
+    return {**result, "did_you_mean": local["candidates"]}
 
 class GetMedicineDetailsInput(BaseModel):
     medicine_name: str = Field(description="The name of the medicine to retrieve details for.")
@@ -52,10 +114,125 @@ def get_medicine_details(medicine_name: str, user_id: str) -> Dict[str, Any]:
     Use this tool when the user asks about a specific drug (e.g., 'Tell me about Paracetamol') 
     without providing raw text/OCR data.
     """
+    local = lookup_local(medicine_name)
+    if local is not None and "medicine" in local:
+        return local
     # Note: Assuming medicine-analyzer has a search or detail endpoint. 
     # If not, we might reuse `analyze` with synthesized text or query a different endpoint.
     # For now, let's assume we send it to analyze to get general knowledge or RAG info.
-    return analyze_medicine.invoke({"text": f"Information about {medicine_name}", "user_id": user_id})
+    # The request carries no user: given one, the analyzer tailors the analysis
+    # to their medical history, and medicine_cache shares answers between users.
+    key = medicine_key(medicine_name)
+    cached = medicine_cache.get(key)
+    if cached is not None:
+        return cached
+    result = request_analysis(f"Information about {medicine_name}")
+    if succeeded(result):
+        medicine_cache.set(key, result)
+    return with_candidates(result, local)
+
+@async_impl(get_medicine_details)
+async def get_medicine_details_async(medicine_name: str, user_id: str) -> Dict[str, Any]:
+    local = lookup_local(medicine_name)
+    if local is not None and "medicine" in local:
+        return local
+    # Without a user, like the sync path, since the result is shared through medicine_cache
+    result = await medicine_cache.get_or_load(
+        medicine_key(medicine_name),
+        lambda: request_analysis_async(f"Information about {medicine_name}"),
+        cacheable=succeeded
+    )
+    return with_candidates(result, local)
+
+# Medicines of one analyze_medicines call looked up at a time, and the most it takes.
+BULK_ANALYZE_CONCURRENCY = int(os.getenv("BULK_ANALYZE_CONCURRENCY", "8"))
+BULK_ANALYZE_MAX_ITEMS = int(os.getenv("BULK_ANALYZE_MAX_ITEMS", "12"))
+
+# Fields left out of each medicine in analyze_medicines' combined result.
+BULK_DROPPED_FIELDS = {
+    "id", "status", "success", "references", "substitutes", "manufacturer", "pack_size", "price", "chemical_class", "risks_of_wrong_dosage",
+}
+
+def bulk_items(medicines: List[str]):
+    """Distinct non-empty entries of `medicines` in order, and those past BULK_ANALYZE_MAX_ITEMS."""
+    seen, unique = set(), []
+    for medicine in medicines:
+        key = medicine_key(medicine)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(medicine.strip())
+    return unique[:BULK_ANALYZE_MAX_ITEMS], unique[BULK_ANALYZE_MAX_ITEMS:]
+
+def compact_label(item):
+    if not isinstance(item, dict):
+        return item
+    label = item.get("name") or item.get("substance") or json.dumps(item)
+    return f"{label} ({item['severity']})" if item.get("severity") else label
+
+def compact_details(query: str, result) -> Dict[str, Any]:
+    """One medicine's entry in analyze_medicines' result: the get_medicine_details fields worth a prompt's space."""
+    if not succeeded(result):
+        if not isinstance(result, dict):
+            return {"query": query, "error": str(result)}
+        return {"query": query, **{key: result[key] for key in ("error", "did_you_mean") if key in result}}
+    if result.get("source") == "local_index":
+        details, source = {"match": result["match"], **result["medicine"]}, "local_index"
+    else:
+        # The analyzer wraps the analysis in "analysis" (or "data"); keep the bare result otherwise
+        details = next((result[key] for key in ("analysis", "data") if isinstance(result.get(key), dict)), result)
+        source = "analyzer"
+    compact = {"query": query, "source": source}
+    for key, value in details.items():
+        if key in BULK_DROPPED_FIELDS or value in (None, "", [], {}):
+            continue
+        if isinstance(value, list):
+            value = [compact_label(item) for item in value]
+        elif key == "confidence" and isinstance(value, dict):
+            value = value.get("level")
+        compact[key] = value
+    return compact
+
+def bulk_result(found: List[Dict[str, Any]], skipped: List[str]) -> Dict[str, Any]:
+    result = {"medicines": found}
+    if skipped:
+        result["skipped"] = skipped
+        result["message"] = f"Only the first {BULK_ANALYZE_MAX_ITEMS} medicines were looked up."
+    return result
+
+class AnalyzeMedicinesInput(BaseModel):
+    medicines: List[str] = Field(description="Medicine names or text snippets, one per medicine (e.g. each line of a prescription).")
+    user_id: str = Field(description="The unique identifier of the user.")
+
+@tool("analyze_medicines", args_schema=AnalyzeMedicinesInput)
+def analyze_medicines(medicines: List[str], user_id: str) -> Dict[str, Any]:
+    """
+    Retrieves details about several medicines at once, e.g. every medicine on a prescription.
+
+    Use this tool instead of calling get_medicine_details or analyze_medicine once per medicine
+    whenever the user asks about two or more medicines.
+
+    Returns a compact summary per medicine: composition, uses, side effects, interactions and warnings.
+    """
+    items, skipped = bulk_items(medicines)
+    found = [
+        compact_details(item, get_medicine_details.invoke({"medicine_name": item, "user_id": user_id}))
+        for item in items
+    ]
+    return bulk_result(found, skipped)
+
+@async_impl(analyze_medicines)
+async def analyze_medicines_async(medicines: List[str], user_id: str) -> Dict[str, Any]:
+    # Known names come from the local index or the medicine cache; the rest
+    # share the analyzer's connection pool, a few at a time.
+    items, skipped = bulk_items(medicines)
+    semaphore = asyncio.Semaphore(BULK_ANALYZE_CONCURRENCY)
+
+    async def lookup(item):
+        async with semaphore:
+            return compact_details(item, await get_medicine_details_async(item, user_id))
+
+    found = await asyncio.gather(*(lookup(item) for item in items))
+    return bulk_result(list(found), skipped)
 
 class ScheduleMedicineInput(BaseModel):
     user_id: str = Field(description="The unique identifier of the user.")
@@ -66,6 +243,24 @@ class ScheduleMedicineInput(BaseModel):
     start_date: Optional[str] = Field(description="Start date in YYYY-MM-DD format.", default=None)
     end_date: Optional[str] = Field(description="End date in YYYY-MM-DD format.", default=None)
 
+def reminder_payload(user_id, medicine_name, dosage, frequency, time, start_date=None, end_date=None):
+    payload = {
+        "userId": user_id,
+        "medicineName": medicine_name,
+        "dosage": dosage,
+        "schedule": {
+            "frequency": frequency,
+            "time": time,
+            "startDate": start_date,
+            "endDate": end_date
+        }
+    }
+    # Clean up None values
+    payload = {k: v for k, v in payload.items() if v is not None}
+    if "schedule" in payload:
+         payload["schedule"] = {k: v for k, v in payload["schedule"].items() if v is not None}
+    return payload
+
 @tool("schedule_medicine", args_schema=ScheduleMedicineInput)
 def schedule_medicine(user_id: str, medicine_name: str, dosage: str, frequency: str, time: str, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
     """
@@ -76,29 +271,26 @@ def schedule_medicine(user_id: str, medicine_name: str, dosage: str, frequency:
     """
     try:
         url = f"{MEDICINE_SCHEDULER_URL}/reminders"
-        payload = {
-            "userId": user_id,
-            "medicineName": medicine_name,
-            "dosage": dosage,
-            "schedule": {
-                "frequency": frequency,
-                "time": time,
-                "startDate": start_date,
-                "endDate": end_date
-            }
-        }
-        # Clean up None values
-        payload = {k: v for k, v in payload.items() if v is not None}
-        if "schedule" in payload:
-             payload["schedule"] = {k: v for k, v in payload["schedule"].items() if v is not None}
-
-        response = requests.post(url, json=payload)
+        payload = reminder_payload(user_id, medicine_name, dosage, frequency, time, start_date, end_date)
+        response = session.post(url, json=payload, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
+        user_cache.invalidate(("reminders", user_id))
         return response.json()
     except requests.RequestException as e:
         logger.error(f"Error calling schedule_medicine: {e}")
         return {"error": str(e), "message": "Failed to schedule medicine."}
 
+@async_impl(schedule_medicine)
+async def schedule_medicine_async(user_id: str, medicine_name: str, dosage: str, frequency: str, time: str, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
+    try:
+        payload = reminder_payload(user_id, medicine_name, dosage, frequency, time, start_date, end_date)
+        result = await get_client("scheduler").post(f"{MEDICINE_SCHEDULER_URL}/reminders", json=payload)
+        user_cache.invalidate(("reminders", user_id))
+        return result
+    except ASYNC_ERRORS as e:
+        logger.error(f"Error calling schedule_medicine: {e!r}")
+        return {"error": str(e) or repr(e), "message": "Failed to schedule medicine."}
+
 class GetRemindersInput(BaseModel):
     user_id: str = Field(description="The unique identifier of the user.")
 
@@ -109,15 +301,105 @@ def get_reminders(user_id: str) -> Dict[str, Any]:
     
     Use this tool when a user asks 'What are my medicines?' or 'What reminders do I have?'.
     """
+    cached = user_cache.get(("reminders", user_id))
+    if cached is not None:
+        return cached
     try:
         url = f"{MEDICINE_SCHEDULER_URL}/reminders/user/{user_id}"
-        response = requests.get(url)
+        response = session.get(url, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
-        return response.json()
+        result = response.json()
+        user_cache.set(("reminders", user_id), result)
+        return result
     except requests.RequestException as e:
         logger.error(f"Error calling get_reminders: {e}")
         return {"error": str(e), "message": "Failed to fetch reminders."}
 
+@async_impl(get_reminders)
+async def get_reminders_async(user_id: str) -> Dict[str, Any]:
+    async def fetch():
+        try:
+            return await get_client("scheduler").get(f"{MEDICINE_SCHEDULER_URL}/reminders/user/{user_id}")
+        except ASYNC_ERRORS as e:
+            logger.error(f"Error calling get_reminders: {e!r}")
+            return {"error": str(e) or repr(e), "message": "Failed to fetch reminders."}
+    return await user_cache.get_or_load(("reminders", user_id), fetch, cacheable=succeeded)
+
+def reminder_names(result) -> List[str]:
+    """Distinct medicine names of a get_reminders result, in order."""
+    reminders = result.get("reminders", []) if isinstance(result, dict) else result
+    names = {}
+    for reminder in reminders:
+        if isinstance(reminder, dict) and reminder.get("medicineName"):
+            names.setdefault(medicine_key(reminder["medicineName"]), reminder["medicineName"])
+    return list(names.values())
+
+def graph_unavailable() -> Dict[str, Any]:
+    return {"error": "Medicine graph not available", "message": "Use get_medicine_details instead."}
+
+def substitutes_for(medicine_name: str, limit: int) -> Dict[str, Any]:
+    graph = medicine_graph.get_medicine_graph()
+    if graph is None:
+        return graph_unavailable()
+    i = graph.find_medicine(medicine_name)
+    if i is None:
+        return {"error": f"{medicine_name} not found", "message": "Use get_medicine_details instead."}
+    medicine = graph.medicine(i)
+    substitutes = []
+    for j in graph.substitutes(i, limit):
+        substitute = graph.medicine(j)
+        if "price" in medicine and "price" in substitute:
+            substitute["cheaper_by"] = round(medicine["price"] - substitute["price"], 2)
+        substitutes.append(substitute)
+    return {"medicine": medicine, "substitutes": substitutes}
+
+def overlaps_for(reminders, medicine_name: Optional[str]) -> Dict[str, Any]:
+    if not succeeded(reminders):
+        return {"error": reminders["error"], "message": "Failed to fetch reminders."}
+    graph = medicine_graph.get_medicine_graph()
+    if graph is None:
+        return graph_unavailable()
+    names = reminder_names(reminders)
+    if medicine_name and medicine_key(medicine_name) not in {medicine_key(name) for name in names}:
+        names.append(medicine_name)
+    return graph.overlaps(names)
+
+class FindSubstitutesInput(BaseModel):
+    medicine_name: str = Field(description="The name of the medicine to find substitutes for.")
+    limit: int = Field(description="How many substitutes to return.", default=5)
+
+@tool("find_substitutes", args_schema=FindSubstitutesInput)
+def find_substitutes(medicine_name: str, limit: int = 5) -> Dict[str, Any]:
+    """
+    Finds substitutes for a medicine: brands with the same composition, cheapest first, with their prices.
+
+    Use this tool when the user asks for a cheaper alternative, a generic or a substitute for a medicine.
+    """
+    return substitutes_for(medicine_name, limit)
+
+@async_impl(find_substitutes)
+async def find_substitutes_async(medicine_name: str, limit: int = 5) -> Dict[str, Any]:
+    return substitutes_for(medicine_name, limit)
+
+class CheckMedicineOverlapsInput(BaseModel):
+    user_id: str = Field(description="The unique identifier of the user.")
+    medicine_name: Optional[str] = Field(description="A medicine the user is about to add, checked against the ones they take.", default=None)
+
+@tool("check_medicine_overlaps", args_schema=CheckMedicineOverlapsInput)
+def check_medicine_overlaps(user_id: str, medicine_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Checks the medicines a user has reminders for (plus an optional new one) for shared ingredients
+    and duplicate therapeutic or action classes.
+
+    Use this tool before scheduling a new medicine, or when the user asks whether their medicines
+    overlap or can be taken together. Shared ingredients risk a double dose.
+    """
+    return overlaps_for(get_reminders.invoke({"user_id": user_id}), medicine_name)
+
+@async_impl(check_medicine_overlaps)
+async def check_medicine_overlaps_async(user_id: str, medicine_name: Optional[str] = None) -> Dict[str, Any]:
+    return overlaps_for(await get_reminders_async(user_id), medicine_name)
+
 class GetMedicalProfileInput(BaseModel):
     user_id: str = Field(description="The unique identifier of the user.")
 
@@ -129,20 +411,38 @@ def get_medical_profile(user_id: str) -> Dict[str, Any]:
     Use this tool to contextually understand the user's health background, 
     especially when analyzing symptoms or checking for contraindications.
     """
+    cached = user_cache.get(("profile", user_id))
+    if cached is not None:
+        return cached
     try:
         url = f"{PROFILE_MANAGER_URL}/profile/{user_id}/medical-info"
-        response = requests.get(url)
+        response = session.get(url, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
-        return response.json()
+        result = response.json()
+        user_cache.set(("profile", user_id), result)
+        return result
     except requests.RequestException as e:
         logger.error(f"Error calling get_medical_profile: {e}")
         return {"error": str(e), "message": "Failed to fetch medical profile."}
 
+@async_impl(get_medical_profile)
+async def get_medical_profile_async(user_id: str) -> Dict[str, Any]:
+    async def fetch():
+        try:
+            return await get_client("profile").get(f"{PROFILE_MANAGER_URL}/profile/{user_id}/medical-info")
+        except ASYNC_ERRORS as e:
+            logger.error(f"Error calling get_medical_profile: {e!r}")
+            return {"error": str(e) or repr(e), "message": "Failed to fetch medical profile."}
+    return await user_cache.get_or_load(("profile", user_id), fetch, cacheable=succeeded)
+
 # List of tools to be bound to the agent
 tools = [
     analyze_medicine,
     get_medicine_details,
+    analyze_medicines,
     schedule_medicine,
     get_reminders,
-    get_medical_profile
+    get_medical_profile,
+    find_substitutes,
+    check_medicine_overlaps
 ]
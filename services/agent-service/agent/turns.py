@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from agent import metrics
+
+# Turns a user may have waiting behind the running one before new ones get a 429.
+TURN_QUEUE_SIZE = int(os.getenv("TURN_QUEUE_SIZE", "4"))
+# A repeat of an in-flight message within this many seconds joins it instead of running again.
+TURN_COALESCE_WINDOW = float(os.getenv("TURN_COALESCE_WINDOW", "10"))
+
+turns_total = metrics.Counter("agent_turns_total", "Chat turns by how the scheduler handled them.", ("outcome",))
+turns_queued = metrics.Gauge("agent_turns_queued", "Chat turns running or waiting for their conversation thread.")
+
+
+class TurnQueueFull(Exception):
+    """Raised when a conversation thread already has TURN_QUEUE_SIZE turns waiting."""
+
+
+def message_key(message: str) -> str:
+    return " ".join(message.split())
+
+
+class _Thread:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        # message key -> (task, started_at) of turns submitted and not finished
+        self.inflight: Dict[str, Any] = {}
+
+
+class TurnScheduler:
+    """Runs the turns of each conversation thread one at a time, in arrival order.
+
+    Two turns on one thread would both read the same checkpoint and the
+    later write would drop the other's messages, so each thread gets a FIFO
+    lock. `submit()` also collapses a repeat of a turn that is still running
+    (a double-tapped send, a client retry) into the original run: every
+    caller gets its result, and Gemini is called once. A thread with
+    `queue_size` turns waiting rejects more with `TurnQueueFull`.
+
+    State lives in this process only; with several workers, the same user's
+    requests need sticky routing to be serialized.
+    """
+
+    def __init__(self, queue_size: int = TURN_QUEUE_SIZE, coalesce_window: float = TURN_COALESCE_WINDOW,
+                 clock=time.monotonic):
+        self.queue_size = queue_size
+        self.coalesce_window = coalesce_window
+        self.clock = clock
+        self._threads: Dict[Hashable, _Thread] = {}
+
+    def __len__(self):
+        return len(self._threads)
+
+    def full(self, thread_id: Hashable) -> bool:
+        """Whether a new turn for `thread_id` would be rejected right now."""
+        thread = self._threads.get(thread_id)
+        return thread is not None and thread.pending > self.queue_size
+
+    def _admit(self, thread_id) -> _Thread:
+        thread = self._threads.get(thread_id)
+        if thread is None:
+            thread = self._threads[thread_id] = _Thread()
+        # One turn runs, `queue_size` wait
+        if self.full(thread_id):
+            turns_total.inc(outcome="rejected")
+            raise TurnQueueFull(f"Too many turns in progress for {thread_id}")
+        thread.pending += 1
+        turns_queued.inc()
+        return thread
+
+    def _release(self, thread_id, thread: _Thread):
+        thread.pending -= 1
+        turns_queued.dec()
+        if thread.pending == 0 and self._threads.get(thread_id) is thread:
+            del self._threads[thread_id]
+
+    @asynccontextmanager
+    async def slot(self, thread_id: Hashable):
+        """Hold `thread_id`'s turn for the duration of the block, queueing behind earlier turns."""
+        thread = self._admit(thread_id)
+        try:
+            async with thread.lock:
+                turns_total.inc(outcome="run")
+                yield
+        finally:
+            self._release(thread_id, thread)
+
+    async def submit(self, thread_id: Hashable, message: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of `run()` for this turn, or of the identical turn already in flight.
+
+        The run is a task of its own, shielded from callers, so a client
+        that disconnects neither cancels it for the others nor leaves the
+        thread's checkpoint half-written.
+        """
+        key = message_key(message)
+        thread = self._threads.get(thread_id)
+        if thread is not None and key in thread.inflight:
+            task, started_at = thread.inflight[key]
+            if self.clock() - started_at <= self.coalesce_window:
+                turns_total.inc(outcome="coalesced")
+                return await asyncio.shield(task)
+
+        thread = self._admit(thread_id)
+
+        async def run_in_turn():
+            try:
+                async with thread.lock:
+                    turns_total.inc(outcome="run")
+                    return await run()
+            finally:
+                if thread.inflight.get(key, (None,))[0] is task:
+                    del thread.inflight[key]
+                self._release(thread_id, thread)
+
+        task = asyncio.ensure_future(run_in_turn())
+        # Mark a failure as seen even if every caller has gone away
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        thread.inflight[key] = (task, self.clock())
+        return await asyncio.shield(task)
+
+
+turns = TurnScheduler()
@@ -0,0 +1,108 @@
+import asyncio
+import importlib
+import time
+import weakref
+from typing import Dict, Set
+
+from agent import medicine_graph, medicine_index, metrics
+from agent.http_client import get_client
+from utils.logger import logger
+
+# Downstream pools opened by the warm-up, by ServiceClient name.
+SERVICES = ("analyzer", "scheduler", "profile")
+
+# Parts of the warm-up. Each loads on its own, so one failing (say, the LLM
+# client without GOOGLE_API_KEY) leaves what does not need it usable.
+PARTS = ("agent", "llm", "clients", "medicine_data")
+
+
+class Warmup:
+    """Loads the agent graph and opens its clients in the background.
+
+    Importing langgraph and the Gemini client takes over a second, so
+    `main` does not import `agent.graph` at all; the lifespan starts the
+    warm-up instead, in parts: "agent" imports the graph and its
+    checkpointer in a worker thread, "llm" builds the LLM client,
+    "clients" opens the downstream pools on the serving loop and
+    "medicine_data" opens the medicine index and graph. Requests wait for
+    the parts they use in `wait()`, and a failed part is retried by the
+    next request that waits for it.
+    """
+
+    def __init__(self):
+        self.done: Set[str] = set()
+        self.errors: Dict[str, str] = {}
+        self.seconds: Dict[str, float] = {}
+        # The pools belong to the loop they were opened on, so warm each loop once.
+        self._tasks = weakref.WeakKeyDictionary()
+
+    @property
+    def ready(self) -> bool:
+        return self.done.issuperset(PARTS)
+
+    def status(self) -> Dict[str, str]:
+        return {part: "ready" if part in self.done else "failed" if part in self.errors else "starting" for part in PARTS}
+
+    def start(self, *parts: str):
+        """This loop's tasks for `parts` (all by default), started or restarted after a failure."""
+        loop = asyncio.get_running_loop()
+        tasks = self._tasks.setdefault(loop, {})
+        started = []
+        for part in parts or PARTS:
+            task = tasks.get(part)
+            if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+                task = tasks[part] = loop.create_task(self._run(part))
+                # Failures are logged and re-raised to whoever waits; nobody may
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            started.append(task)
+        return started
+
+    async def wait(self, *parts: str):
+        """Wait for `parts` of the warm-up (all by default), raising the first that failed."""
+        await asyncio.shield(asyncio.gather(*self.start(*parts)))
+
+    async def _run(self, part: str):
+        start = time.perf_counter()
+        try:
+            await getattr(self, f"_load_{part}")()
+        except Exception as e:
+            self.errors[part] = str(e) or repr(e)
+            logger.error("Warm-up of %s failed: %s", part, self.errors[part], exc_info=True)
+            raise
+        self.seconds[part] = time.perf_counter() - start
+        self.done.add(part)
+        self.errors.pop(part, None)
+        logger.info("Warm-up of %s finished in %.2fs", part, self.seconds[part])
+
+    async def _load_agent(self):
+        await asyncio.to_thread(importlib.import_module, "agent.graph")
+
+    async def _load_llm(self):
+        # Concurrent imports of one module wait for each other, so this shares the "agent" part's import
+        graph_module = await asyncio.to_thread(importlib.import_module, "agent.graph")
+        await asyncio.to_thread(graph_module.get_llm_with_tools)
+
+    async def _load_clients(self):
+        for name in SERVICES:
+            get_client(name)
+
+    async def _load_medicine_data(self):
+        await asyncio.to_thread(medicine_index.get_index)
+        await asyncio.to_thread(medicine_graph.get_medicine_graph)
+
+    async def graph(self):
+        """The compiled agent graph, once it and the LLM client are loaded."""
+        await self.wait("agent", "llm")
+        return importlib.import_module("agent.graph").graph
+
+
+warmup = Warmup()
+
+
+@metrics.collector
+def warmup_metrics():
+    yield "agent_ready", "gauge", "Whether the graph, LLM client, downstream pools and medicine data are warm.", {(): int(warmup.ready)}
+    if warmup.seconds:
+        yield "agent_warmup_seconds", "gauge", "Time each part of the warm-up took.", {
+            (("part", part),): seconds for part, seconds in warmup.seconds.items()
+        }
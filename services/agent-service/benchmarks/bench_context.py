@@ -0,0 +1,81 @@
+"""Prompt tokens per turn over a long synthetic conversation, untrimmed vs budgeted.
+
+Every third turn makes a tool call with a sizeable JSON result. "untrimmed"
+is the old behaviour (whole history every hop); "budgeted" uses the
+context builder with CONTEXT_TOKEN_BUDGET.
+
+    python benchmarks/bench_context.py --turns 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import StructuredTool
+
+from agent import context, graph
+from fake_llm import ScriptedChatModel, tool_call
+
+
+async def reminders(user_id: str):
+    return {"reminders": [{"medicineName": f"Medicine {i}", "dosage": "500mg", "time": "09:00 AM"} for i in range(40)]}
+
+
+def script(turns):
+    replies = []
+    for i in range(turns):
+        if i % 3 == 0:
+            replies.append(tool_call("get_reminders", call_id=f"call-{i}", user_id="bench"))
+        replies.append(f"Answer {i}: " + "Take it after food with water. " * 8)
+    return replies
+
+
+async def run(turns, budget):
+    context.CONTEXT_TOKEN_BUDGET = budget
+    chat = ScriptedChatModel(script=script(turns))
+    graph.llm_with_tools = chat
+    graph.llm = ScriptedChatModel(script=["Summary: " + "medicines and schedules discussed so far. " * 10])
+    config = {"configurable": {"thread_id": f"bench-{budget}"}}
+
+    per_turn = []
+    for i in range(turns):
+        seen = len(chat.prompts)
+        await graph.graph.ainvoke({"messages": [HumanMessage(content=f"Question {i} about my medicines?")]}, config=config)
+        per_turn.append(sum(context.estimate_tokens(prompt) for prompt in chat.prompts[seen:]))
+    summary_tokens = sum(context.estimate_tokens(prompt) for prompt in graph.llm.prompts)
+    return per_turn, graph.llm.calls, summary_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=context.CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--json", help="Also write the per-turn numbers to this file")
+    args = parser.parse_args()
+
+    graph.tools_by_name = {"get_reminders": StructuredTool.from_function(
+        coroutine=reminders, name="get_reminders", description="x")}
+
+    results = {}
+    print(f"{args.turns} turns")
+    print(f"{'mode':>10} {'mean':>8} {'p95':>8} {'last':>8} {'total':>10} {'summaries':>10} {'summary tok':>12}")
+    for mode, budget in (("untrimmed", 10 ** 9), ("budgeted", args.budget)):
+        per_turn, summaries, summary_tokens = asyncio.run(run(args.turns, budget))
+        ordered = sorted(per_turn)
+        results[mode] = per_turn
+        print(f"{mode:>10} {sum(per_turn) / len(per_turn):>8.0f} {ordered[int(0.95 * len(ordered))]:>8} "
+              f"{per_turn[-1]:>8} {sum(per_turn):>10} {summaries:>10} {summary_tokens:>12}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Open-loop load test of /api/agent/chat, or of the graph directly, with a scripted LLM and stub downstreams.
+
+Requests start on a fixed schedule at --rps whether or not earlier ones
+have finished, and latency is measured from the scheduled start, so a
+server that stalls shows up as latency rather than as fewer requests.
+Each chat makes the tool hops given by --hops (e.g. "get_medical_profile,
+get_reminders;get_medicine_details": two parallel calls, then one) against
+stub services answering after --downstream-latency, with --llm-latency per
+model call. Chats are spread over --users conversation threads.
+
+Reports throughput, p50/p95/p99 latency, event-loop lag and resident memory
+growth per conversation thread, and writes them as JSON to --output;
+--compare prints the change from an earlier result file.
+
+    python benchmarks/bench_load.py --rps 50 --duration 30 --output results/before.json
+    python benchmarks/bench_load.py --rps 50 --duration 30 --compare results/before.json
+    python benchmarks/bench_load.py --target graph --rps 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICE = os.path.dirname(HERE)
+sys.path.insert(0, SERVICE)
+sys.path.insert(0, HERE)
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+
+from fake_llm import ScriptedChatModel
+
+TOOL_ARGS = {
+    "get_medical_profile": lambda user: {"user_id": user},
+    "get_reminders": lambda user: {"user_id": user},
+    "get_medicine_details": lambda user: {"medicine_name": "Paracetamol", "user_id": user},
+    "analyze_medicine": lambda user: {"text": "Paracetamol 500mg tablets", "user_id": user},
+    "schedule_medicine": lambda user: {
+        "user_id": user, "medicine_name": "Paracetamol", "dosage": "500mg", "frequency": "daily", "time": "09:00 AM",
+    },
+}
+
+
+class ScenarioChatModel(ScriptedChatModel):
+    """Answers every chat with the same tool hops, then a final answer, whatever else is in flight.
+
+    The hop is worked out from the prompt (tool rounds since the last user
+    message), so concurrent chats each get the whole scenario.
+    """
+
+    hops: list = []
+    answer: str = ""
+
+    def _next_reply(self, messages):
+        self.calls += 1
+        last_user = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        if last_user == 1 and messages[0].content.startswith("Summarize"):
+            return AIMessage(content="Earlier the user asked about their medicines.")
+        hop = sum(1 for m in messages[last_user:] if isinstance(m, AIMessage) and m.tool_calls)
+        if hop >= len(self.hops):
+            return AIMessage(content=self.answer)
+        user = "bench"
+        calls = [
+            {"name": name, "args": TOOL_ARGS[name](user), "id": f"call-{hop}-{i}"}
+            for i, name in enumerate(self.hops[hop])
+        ]
+        return AIMessage(content="", tool_calls=calls)
+
+
+def parse_hops(text):
+    return [[name.strip() for name in hop.split(",") if name.strip()] for hop in text.split(";") if hop.strip()]
+
+
+def install_model(args):
+    """Swap Gemini for the scenario model in this process."""
+    from agent import graph
+    model = ScenarioChatModel(
+        script=[""], hops=parse_hops(args.hops), answer=" ".join(["word"] * args.answer_words),
+        latency=args.llm_latency, token_latency=args.token_latency,
+    )
+    graph.llm = graph.llm_with_tools = model
+    return model
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that sleeps `interval` seconds."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - start - self.interval))
+
+    def reset(self):
+        self.lags = []
+
+    def stats(self):
+        return summarize_ms(self.lags)
+
+
+def rss_bytes(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def summarize_ms(seconds):
+    values = sorted(seconds)
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 3),
+        "p95": round(percentile(values, 0.95) * 1000, 3),
+        "p99": round(percentile(values, 0.99) * 1000, 3),
+        "max": round(values[-1] * 1000, 3),
+        "mean": round(sum(values) / len(values) * 1000, 3),
+    }
+
+
+async def open_loop(send, rps, duration, users):
+    """Start `send(user)` every 1/rps seconds for `duration` seconds; return (latencies, errors, elapsed)."""
+    loop = asyncio.get_running_loop()
+    latencies, errors, tasks = [], [], []
+    total = int(rps * duration)
+    start = loop.time()
+
+    async def one(i, scheduled):
+        try:
+            await send(f"bench-user-{i % users}")
+            latencies.append(loop.time() - scheduled)
+        except Exception as e:
+            errors.append(repr(e))
+
+    for i in range(total):
+        scheduled = start + i / rps
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i, scheduled)))
+    await asyncio.gather(*tasks)
+    return latencies, errors, loop.time() - start
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+def service_env(stub_url, checkpoint_db):
+    return {
+        **os.environ,
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "bench"),
+        "MEDICINE_ANALYZER_URL": stub_url,
+        "MEDICINE_SCHEDULER_URL": stub_url,
+        "PROFILE_MANAGER_URL": stub_url,
+        "CHECKPOINT_DB": checkpoint_db,
+    }
+
+
+def serve(args):
+    """Run the agent service with the scenario model and a /bench/stats route (a subprocess of the benchmark)."""
+    import uvicorn
+    from main import app
+
+    install_model(args)
+    monitor = LoopLagMonitor()
+
+    @app.get("/bench/stats")
+    async def bench_stats(reset: bool = False):
+        if monitor._task is None:
+            monitor.start()
+        stats = {"loop_lag_ms": monitor.stats(), "rss_bytes": rss_bytes()}
+        if reset:
+            monitor.reset()
+        return stats
+
+    uvicorn.run(app, host="127.0.0.1", port=args.serve, log_level="warning")
+
+
+async def run_http(args, stub_url, checkpoint_db):
+    port = free_port()
+    command = [sys.executable, __file__, "--serve", str(port)] + sys.argv[1:]
+    server = subprocess.Popen(command, cwd=SERVICE, env=service_env(stub_url, checkpoint_db), stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=1000)
+    try:
+        await wait_until_up(f"{url}/health")
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+            async def send(user):
+                response = await client.post("/api/agent/chat", json={"message": "What should I take today?", "user_id": user})
+                response.raise_for_status()
+
+            for i in range(args.warmup):
+                await send(f"warmup-{i}")
+            before = (await client.get("/bench/stats", params={"reset": True})).json()
+            latencies, errors, elapsed = await open_loop(send, args.rps, args.duration, args.users)
+            after = (await client.get("/bench/stats")).json()
+        return latencies, errors, elapsed, after["loop_lag_ms"], before["rss_bytes"], after["rss_bytes"]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def run_graph(args, stub_url, checkpoint_db):
+    os.environ.update(service_env(stub_url, checkpoint_db))
+    from agent.graph import graph
+    install_model(args)
+    monitor = LoopLagMonitor()
+    monitor.start()
+
+    async def send(user):
+        await graph.ainvoke(
+            {"messages": [HumanMessage(content="What should I take today?")]},
+            config={"configurable": {"thread_id": user}},
+        )
+
+    for i in range(args.warmup):
+        await send(f"warmup-{i}")
+    monitor.reset()
+    rss_before = rss_bytes()
+    latencies, errors, elapsed = await open_loop(send, args.rps, args.duration, args.users)
+    return latencies, errors, elapsed, monitor.stats(), rss_before, rss_bytes()
+
+
+async def run(args):
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "stub_services.py"), "--port", str(stub_port),
+         "--latency", str(args.downstream_latency), "--jitter", str(args.downstream_jitter)],
+        stdout=subprocess.DEVNULL,
+    )
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            await wait_until_up(stub_url)
+            target = run_http if args.target == "http" else run_graph
+            latencies, errors, elapsed, loop_lag, rss_before, rss_after = await target(
+                args, stub_url, os.path.join(tmp, "checkpoints.sqlite")
+            )
+        finally:
+            stub.terminate()
+            stub.wait()
+
+    growth = rss_after - rss_before if rss_before and rss_after else None
+    return {
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": summarize_ms(latencies),
+        "loop_lag_ms": loop_lag,
+        "rss_mb_before": round(rss_before / 2**20, 1) if rss_before else None,
+        "rss_mb_after": round(rss_after / 2**20, 1) if rss_after else None,
+        "rss_kb_per_thread": round(growth / 1024 / min(args.users, len(latencies) or 1), 2) if growth is not None else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(previous, current):
+    old = dict(flatten(previous["results"]))
+    print(f"\n{'metric':<24} {'previous':>10} {'current':>10} {'change':>8}")
+    for key, value in flatten(current["results"]):
+        if key in old:
+            change = f"{(value - old[key]) / old[key] * 100:+.1f}%" if old[key] else ""
+            print(f"{key:<24} {old[key]:>10} {value:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["http", "graph"], default="http")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--users", type=int, default=100, help="Conversation threads the chats are spread over")
+    parser.add_argument("--hops", default="get_medical_profile,get_reminders;get_medicine_details",
+                        help="Tool calls per model turn: comma-separated calls, hops separated by ';'")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--downstream-latency", type=float, default=0.05)
+    parser.add_argument("--downstream-jitter", type=float, default=0.02)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier --output file to compare against")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    results = asyncio.run(run(args))
+    report = {
+        "benchmark": "load",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "serve")},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
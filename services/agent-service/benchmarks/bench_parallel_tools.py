@@ -0,0 +1,56 @@
+"""Latency of one tools step with stub tools of known latency, sequential vs concurrent.
+
+Sequential (--concurrency 1) is the sum of the tool latencies; concurrent
+should be close to the slowest one.
+
+    python benchmarks/bench_parallel_tools.py --latencies 0.3 0.2 0.15 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from agent import graph
+
+
+def stub_tool(name, delay):
+    async def run(user_id: str):
+        await asyncio.sleep(delay)
+        return {"tool": name}
+    return StructuredTool.from_function(coroutine=run, name=name, description=name)
+
+
+async def run_turn(calls, repeats):
+    state = {"messages": [AIMessage(content="", tool_calls=calls)]}
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await graph.call_tools(state, config={})
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0.3, 0.2, 0.15, 0.05])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    names = [f"tool_{i}" for i in range(len(args.latencies))]
+    graph.tools_by_name = {name: stub_tool(name, delay) for name, delay in zip(names, args.latencies)}
+    calls = [{"name": name, "args": {"user_id": "u1"}, "id": f"call-{i}"} for i, name in enumerate(names)]
+
+    print(f"tool latencies {args.latencies}: sum {sum(args.latencies):.2f}s, max {max(args.latencies):.2f}s")
+    print(f"{'conc':>5} {'turn (s)':>9}")
+    for concurrency in args.concurrency:
+        graph.TOOL_MAX_CONCURRENCY = concurrency
+        print(f"{concurrency:>5} {asyncio.run(run_turn(calls, args.repeats)):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Cold-start time of the service: `import main`, then the warm-up, each in a fresh interpreter.
+
+Every run starts a new Python process, so nothing is cached in memory;
+the OS file cache is warm after the first run, as it is when an
+autoscaler starts another replica on the same node. Prints the median
+import and warm-up times and the modules that took longest to import
+(from `python -X importtime`), self time included.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.warmup.wait())
+print(json.dumps({"import": imported - start, "warmup": time.perf_counter() - imported}))
+"""
+
+
+def run_probe(env):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=HERE, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(importtime_log, top):
+    """(cumulative seconds, module) of the slowest imports in a `-X importtime` log."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative) / 1e6, name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    # Downstreams are never called; the Gemini client only needs a key to be built
+    env = {**os.environ, "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "bench"), "CHECKPOINT_DB": ":memory:"}
+    timings, log = [], ""
+    for _ in range(args.runs):
+        timing, log = run_probe(env)
+        timings.append(timing)
+
+    for phase in ("import", "warmup"):
+        values = [t[phase] for t in timings]
+        print(f"{phase:>8}: median {statistics.median(values) * 1000:7.1f} ms  (min {min(values) * 1000:.1f}, max {max(values) * 1000:.1f})")
+    print("\nSlowest imports (last run, cumulative):")
+    for seconds, name in slowest_imports(log, args.top):
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
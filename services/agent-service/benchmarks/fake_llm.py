@@ -0,0 +1,86 @@
+"""Scripted stand-in for the Gemini chat model, for tests and benchmarks.
+
+`ScriptedChatModel` is a real langchain chat model, so it works with
+`ainvoke`, token streaming and `bind_tools`. Each call takes the next reply
+from `script` (wrapping around), waits `latency` seconds, and then streams
+the reply's content word by word, `token_latency` seconds apart, followed
+by a chunk with the tool calls and an approximate `usage_metadata`. Replies
+are strings, or AIMessages carrying `tool_calls`.
+"""
+import asyncio
+import itertools
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class ScriptedChatModel(BaseChatModel):
+    script: List[Any]
+    latency: float = 0.0
+    token_latency: float = 0.0
+    calls: int = 0
+    prompts: List[List[BaseMessage]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_reply(self, messages) -> AIMessage:
+        self.prompts.append(list(messages))
+        reply = self.script[self.calls % len(self.script)]
+        self.calls += 1
+        return AIMessage(content=reply) if isinstance(reply, str) else reply
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next_reply(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._next_reply(messages)
+        await asyncio.sleep(self.latency)
+
+        words = reply.content.split(" ") if reply.content else []
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+        tool_call_chunks = [
+            {"name": call["name"], "args": _json(call["args"]), "id": call["id"], "index": i}
+            for i, call in enumerate(reply.tool_calls)
+        ]
+        # Usage goes on a closing chunk, as Gemini reports it with the last one.
+        usage = {
+            "input_tokens": sum(len(str(m.content)) for m in messages) // 4,
+            "output_tokens": len(words) + len(tool_call_chunks),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks, usage_metadata=usage))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        chunks = [chunk async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        message = chunks[0]
+        for chunk in chunks[1:]:
+            message += chunk
+        return ChatResult(generations=[ChatGeneration(message=_finalize(message.message))])
+
+
+def _json(args) -> str:
+    import json
+    return json.dumps(args)
+
+
+def _finalize(chunk: AIMessageChunk) -> AIMessage:
+    return AIMessage(content=chunk.content, tool_calls=chunk.tool_calls, id=chunk.id, usage_metadata=chunk.usage_metadata)
+
+
+def tool_call(name: str, call_id: Optional[str] = None, **args) -> AIMessage:
+    """An AIMessage reply that asks for one tool call."""
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id or f"call-{name}"}])
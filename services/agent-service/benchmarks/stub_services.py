@@ -0,0 +1,106 @@
+"""Local stand-in for the analyzer, scheduler and profile services.
+
+One asyncio HTTP/1.1 server answers the routes of all three, so point
+MEDICINE_ANALYZER_URL, MEDICINE_SCHEDULER_URL and PROFILE_MANAGER_URL at
+it. Every request waits `latency` seconds (plus up to `jitter`) and gets a
+canned JSON body; `error_rate` of them get a 503 instead. Keep-alive is
+supported, and asyncio keeps thousands of open connections cheap, so the
+stub is not the bottleneck of a load test.
+
+    python benchmarks/stub_services.py --port 3100 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+
+PROFILE = {"userId": "", "allergies": ["penicillin"], "conditions": ["hypertension"], "medications": ["Amlodipine 5mg"]}
+REMINDER = {"medicineName": "Paracetamol", "dosage": "500mg", "schedule": {"frequency": "daily", "time": "09:00 AM"}}
+ANALYSIS = {
+    "status": "success",
+    "data": {"name": "Paracetamol", "uses": ["Fever", "Pain relief"], "side_effects": ["Nausea"], "warnings": ["Liver disease"]},
+}
+
+
+def route(method, path, body):
+    if method == "POST" and path == "/analyze":
+        return 200, ANALYSIS
+    if method == "POST" and path == "/reminders":
+        return 201, {"id": "r-1", **(body or {})}
+    if method == "GET" and (match := re.fullmatch(r"/reminders/user/([^/]+)", path)):
+        return 200, {"reminders": [{**REMINDER, "userId": match.group(1)}] * 3}
+    if method == "GET" and (match := re.fullmatch(r"/profile/([^/]+)/medical-info", path)):
+        return 200, {**PROFILE, "userId": match.group(1)}
+    return 404, {"error": "not found"}
+
+
+class StubServices:
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.server = None
+        self.writers = set()
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self._connection, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{self.port}"
+        return self
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def _connection(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {k.lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+                length = int(headers.get("content-length") or 0)
+                body = json.loads(await reader.readexactly(length)) if length else None
+
+                self.requests += 1
+                await asyncio.sleep(self.latency + random.random() * self.jitter)
+                if random.random() < self.error_rate:
+                    status, payload = 503, {"error": "unavailable"}
+                else:
+                    status, payload = route(method, path, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+async def serve(args):
+    stub = await StubServices(args.latency, args.jitter, args.error_rate).start(args.host, args.port)
+    print(f"Stub services listening on {stub.url}", flush=True)
+    await stub.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
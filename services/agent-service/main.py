@@ -1,16 +1,94 @@
+import asyncio
+import hashlib
+import json
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from agent.graph import graph
-from langchain_core.messages import HumanMessage
+from agent import answer_cache, metrics, profiler
+from agent.http_client import close_clients
+from agent.turns import TurnQueueFull, turns
+from agent.warmup import warmup
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from utils import logger as logging_setup
 from utils.logger import logger
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
 
-load_dotenv()
+# Events buffered per stream before the graph run waits for the client to catch up.
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
 
-app = FastAPI(title="AushadX Agent Service", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the graph and open the pools in the background, so the port is
+    # bound and /health answers right away; /ready reports when they are warm.
+    warmup.start()
+    yield
+    # Close the downstream connection pools opened by the tools
+    await close_clients()
 
+app = FastAPI(title="AushadX Agent Service", version="1.0.0", lifespan=lifespan)
+
+class ObservabilityMiddleware:
+    """Times every request, from the first byte in to the last byte out.
+
+    Each request gets a trace collecting its node, LLM, tool and HTTP spans,
+    returned as `X-Trace-Id` and, where the response is built before its
+    headers go out, a `Server-Timing` header. With PROFILING_ENABLED, a
+    request sent with `X-Profile: 1` is also sampled by the profiler and the
+    folded stacks are written to the path in the `X-Profile` response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def endpoint(self, scope) -> str:
+        # Label by route, never by raw path, to bound metric cardinality
+        path = scope["path"]
+        return path if any(getattr(route, "path", None) == path for route in app.routes) else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            return await self.app(scope, receive, send)
+
+        endpoint = self.endpoint(scope)
+        trace = metrics.start_trace()
+        logging_setup.start_request(trace.id)
+        headers = dict(scope["headers"])
+        sampler = None
+        if profiler.PROFILING_ENABLED and headers.get(b"x-profile", b"").lower() in (b"1", b"true"):
+            sampler = profiler.SamplingProfiler()
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra = [(b"x-trace-id", trace.id.encode())]
+                if trace.spans:
+                    extra.append((b"server-timing", trace.server_timing().encode()))
+                if sampler is not None:
+                    extra.append((b"x-profile", profiler.profile_path(trace.id).encode()))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        metrics.requests_in_flight.inc(endpoint=endpoint)
+        start = time.perf_counter()
+        if sampler is not None:
+            sampler.start()
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+                await asyncio.to_thread(sampler.write, profiler.profile_path(trace.id))
+            metrics.requests_in_flight.dec(endpoint=endpoint)
+            metrics.request_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+            metrics.requests_total.inc(endpoint=endpoint, status=status)
+
+app.add_middleware(ObservabilityMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,34 +104,206 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+def turn_tool_calls(messages) -> list:
+    """Tool calls made since the last human message, i.e. by the turn that just ran."""
+    calls = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        calls.extend(getattr(message, "tool_calls", None) or [])
+    return calls
+
+async def cached_answer(message: str, config: dict):
+    """A cached answer to `message`, recorded in the thread as if the agent had given it, or None."""
+    hit = answer_cache.answers.lookup(message)
+    if hit is None:
+        return None
+    answer, score = hit
+    logger.info("Answer cache hit for %s (similarity %.2f)", config["configurable"]["thread_id"], score)
+    graph = await warmup.graph()
+    # The graph does not run, so write the turn to the checkpoint here; the thread's next turn has it as history
+    await graph.aupdate_state(config, {"messages": [HumanMessage(content=message), AIMessage(content=answer)]}, as_node="agent")
+    return answer
+
+async def fresh_thread(graph, config: dict) -> bool:
+    """Whether the thread has no earlier turns or summary yet.
+
+    Only such a turn's answer can go in the answer cache: otherwise the
+    model answered with the user's history in view, and may have used it.
+    """
+    values = (await graph.aget_state(config)).values
+    return not values.get("messages") and not values.get("summary")
+
+def log_chat_request(kind: str, request: "ChatRequest"):
+    # Messages are health data: INFO records carry only their size and a short
+    # hash, enough to spot repeats, and the text itself needs LOG_LEVEL=DEBUG.
+    digest = hashlib.sha256(request.message.encode("utf-8")).hexdigest()[:12]
+    logger.info("Received %s from %s (%d chars, sha256 %s)", kind, request.user_id, len(request.message), digest)
+    logger.debug("Message %s from %s: %s", digest, request.user_id, request.message)
+
 @app.post("/api/agent/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        logger.info(f"Received chat request from {request.user_id}: {request.message}")
+        log_chat_request("chat request", request)
         
         # Determine thread config for persistence if using checkpointer
         config = {"configurable": {"thread_id": request.user_id}}
         
         inputs = {"messages": [HumanMessage(content=request.message)]}
+
+        async def run_turn():
+            if answer_cache.ANSWER_CACHE_ENABLED:
+                answer = await cached_answer(request.message, config)
+                if answer is not None:
+                    return {"messages": [AIMessage(content=answer)]}
+            graph = await warmup.graph()
+            cacheable = answer_cache.ANSWER_CACHE_ENABLED and await fresh_thread(graph, config)
+            result = await graph.ainvoke(inputs, config=config)
+            if cacheable:
+                messages = result["messages"]
+                answer_cache.answers.remember(request.message, message_text(messages[-1]), turn_tool_calls(messages))
+            return result
         
-        # Invoke the graph
-        # For simplicity in this REST API, we invoke and wait for the final result.
-        # In a real-world scenario, you might use .stream() and yield SSE.
-        result = await graph.ainvoke(inputs, config=config)
+        # Invoke the graph once this user's earlier turns are done; a repeat of
+        # a turn that is still running gets that run's result instead.
+        result = await turns.submit(request.user_id, request.message, run_turn)
         
         last_message = result["messages"][-1]
         response_content = last_message.content
         
         return ChatResponse(response=response_content)
 
+    except TurnQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        logger.error(f"Error processing chat request: {e}", exc_info=True)
+        logger.error("Error processing chat request: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def message_text(message) -> str:
+    return message.content if isinstance(message.content, str) else message.text
+
+def graph_events(mode: str, chunk):
+    """SSE events for one item of `graph.astream(stream_mode=["messages", "updates"])`."""
+    if mode == "messages":
+        message, metadata = chunk
+        if metadata.get("langgraph_node") == "agent" and isinstance(message, AIMessageChunk):
+            text = message_text(message)
+            if text:
+                yield "token", {"content": text}
+        return
+
+    for node, update in chunk.items():
+        for message in (update or {}).get("messages", []):
+            if node == "agent":
+                for call in message.tool_calls:
+                    yield "tool_start", {"id": call["id"], "name": call["name"]}
+            elif node == "tools":
+                yield "tool_end", {"id": message.tool_call_id, "name": message.name, "status": message.status}
+
+async def stream_chat(inputs: dict, config: dict):
+    """Run the graph in a task feeding a bounded queue, and yield SSE frames from it.
+
+    The run waits for the thread's earlier turns. A client that stops
+    reading fills the queue, which pauses the run at its next event; a
+    client that disconnects cancels the run. A cached answer is sent as a
+    single `token` event.
+    """
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    done = object()
+    message = inputs["messages"][0].content
+
+    async def produce():
+        try:
+            response = None
+            async with turns.slot(config["configurable"]["thread_id"]):
+                if answer_cache.ANSWER_CACHE_ENABLED:
+                    response = await cached_answer(message, config)
+                    if response is not None:
+                        await queue.put(("token", {"content": response}))
+                if response is None:
+                    final, tool_calls = None, []
+                    graph = await warmup.graph()
+                    cacheable = answer_cache.ANSWER_CACHE_ENABLED and await fresh_thread(graph, config)
+                    async for mode, chunk in graph.astream(inputs, config=config, stream_mode=["messages", "updates"]):
+                        for event in graph_events(mode, chunk):
+                            await queue.put(event)
+                        if mode == "updates" and "agent" in chunk:
+                            final = chunk["agent"]["messages"][-1]
+                            tool_calls.extend(final.tool_calls)
+                    response = message_text(final) if final is not None else ""
+                    if cacheable:
+                        answer_cache.answers.remember(message, response, tool_calls)
+            await queue.put(("done", {"response": response}))
+        except Exception as e:
+            logger.error("Error streaming chat: %s", e, exc_info=True)
+            await queue.put(("error", {"detail": str(e)}))
+        # Not reached when cancelled, since nobody is left to read it
+        await queue.put(done)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await queue.get()) is not done:
+            yield sse(*item)
+    finally:
+        producer.cancel()
+
+@app.post("/api/agent/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Same as /api/agent/chat, but streams `token`, `tool_start`, `tool_end` and a final `done` event."""
+    log_chat_request("streaming chat request", request)
+    if turns.full(request.user_id):
+        raise HTTPException(status_code=429, detail=f"Too many turns in progress for {request.user_id}", headers={"Retry-After": "1"})
+    config = {"configurable": {"thread_id": request.user_id}}
+    inputs = {"messages": [HumanMessage(content=request.message)]}
+    return StreamingResponse(
+        stream_chat(inputs, config),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class AnalyzeMedicinesRequest(BaseModel):
+    medicines: List[str]
+    user_id: str
+
+@app.post("/api/agent/medicines/analyze")
+async def analyze_medicines(request: AnalyzeMedicinesRequest):
+    """Details of several medicines at once, e.g. a scanned prescription, without going through the agent."""
+    logger.info("Received bulk analysis request from %s for %d medicines", request.user_id, len(request.medicines))
+    # Only the pools and the medicine data: this works without the graph or the LLM client
+    await warmup.wait("clients", "medicine_data")
+    # Imported here rather than at the top, to keep langchain's tool machinery off the startup path
+    from agent.tools import analyze_medicines as analyze_medicines_tool
+    return await analyze_medicines_tool.ainvoke({"medicines": request.medicines, "user_id": request.user_id})
+
+@metrics.collector
+def logging_metrics():
+    handler = logging_setup.queue_handler
+    yield "agent_log_records_dropped_total", "counter", "Log records dropped because the log queue was full.", {(): handler.dropped}
+    yield "agent_log_records_sampled_out_total", "counter", "INFO log records skipped by LOG_SAMPLE_RATE.", {(): handler.sampled_out}
+    yield "agent_log_queue_size", "gauge", "Log records waiting to be written.", {(): logging_setup.log_queue.qsize()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text format: request, span, token, downstream, cache and checkpoint metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health_check():
     return {"status": "ok", "service": "agent-service"}
 
+@app.get("/ready")
+def readiness_check():
+    """200 once every part of the warm-up is done, 503 with each part's state until then."""
+    if warmup.ready:
+        return {"status": "ready", "service": "agent-service"}
+    content = {"status": "failed" if warmup.errors else "starting", "service": "agent-service", "parts": warmup.status()}
+    if warmup.errors:
+        content["errors"] = dict(warmup.errors)
+    return JSONResponse(status_code=503, content=content)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 3004))
@@ -2,9 +2,6 @@ import asyncio
 import os
 from langchain_core.messages import HumanMessage
 from agent.graph import graph
-from dotenv import load_dotenv
-
-load_dotenv()
 
 async def test_agent():
     print("Starting Agent Test...")
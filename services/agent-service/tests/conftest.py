@@ -0,0 +1,97 @@
+import os
+
+# Keep test runs from creating a checkpoint database in the working tree.
+os.environ.setdefault("CHECKPOINT_DB", ":memory:")
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StubServer:
+    """Local HTTP server whose responses are scripted per path.
+
+    `script(path, *responses)` queues `(status, body, delay)` tuples that are
+    served in order; the last one repeats. A status of None drops the
+    connection without answering. Requests are recorded in `requests`.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                stub.requests.append((self.command, self.path, body))
+
+                queue = stub.routes.get(self.path) or [(404, {"error": "not found"}, 0)]
+                status, payload, delay = queue.pop(0) if len(queue) > 1 else queue[0]
+                time.sleep(delay)
+                if status is None:
+                    self.close_connection = True
+                    return
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _serve
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def script(self, path, *responses):
+        self.routes[path] = [(status, body, delay) for status, body, delay in responses]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    from agent.answer_cache import answers
+    from agent.cache import medicine_cache, user_cache
+    medicine_cache.clear()
+    user_cache.clear()
+    answers.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def no_local_index(monkeypatch):
+    """Keep a medicine_index/ directory at MEDICINE_INDEX_PATH from answering for the analyzer; tests that want one patch it in."""
+    from agent import medicine_index
+    monkeypatch.setattr(medicine_index, "get_index", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def offline_llm(monkeypatch):
+    """Stand in for the Gemini client, so no test builds it or needs GOOGLE_API_KEY; tests script their own."""
+    from agent import graph as graph_module
+    from fake_llm import ScriptedChatModel
+    model = ScriptedChatModel(script=["OK"])
+    monkeypatch.setattr(graph_module, "llm", model)
+    monkeypatch.setattr(graph_module, "llm_with_tools", model)
@@ -0,0 +1,52 @@
+from agent.answer_cache import AnswerCache, cached_medicines
+
+
+def details(name):
+    return {"name": "get_medicine_details", "args": {"medicine_name": name}, "id": "1"}
+
+
+def test_paraphrases_hit_and_other_questions_miss():
+    cache = AnswerCache()
+    cache.remember("What are the side effects of Dolo 650?", "Nausea, rash.", [details("Dolo 650")])
+
+    for question in ("side effects of dolo 650", "Dolo 650 side-effects?", "tell me the side effects of dolo 650 tablet"):
+        assert cache.lookup(question)[0] == "Nausea, rash.", question
+
+    for question in ("What are the uses of Dolo 650?", "Is dolo 650 safe in pregnancy?"):
+        assert cache.lookup(question) is None, question
+
+
+def test_a_different_medicine_or_strength_never_hits():
+    cache = AnswerCache(threshold=0.5)
+    cache.remember("What are the side effects of Dolo 650?", "Nausea, rash.", [details("Dolo 650")])
+
+    assert cache.lookup("What are the side effects of Dolo 6500?") is None
+    assert cache.lookup("What are the side effects of Crocin 650?") is None
+
+
+def test_personal_or_context_dependent_turns_are_not_cached():
+    # User-scoped tools, no lookup at all, or a medicine the question does not name
+    assert cached_medicines("Can I take Dolo 650?", [details("Dolo 650"), {"name": "get_medical_profile", "args": {}}]) is None
+    assert cached_medicines("Hello", []) is None
+    assert cached_medicines("What about its side effects?", [details("Dolo 650")]) is None
+    assert cached_medicines("Dolo 650 vs Crocin?", [details("dolo 650"), details("Crocin")]) == ("crocin", "dolo 650")
+
+    cache = AnswerCache()
+    cache.remember("What about its side effects?", "Nausea.", [details("Dolo 650")])
+    assert len(cache) == 0
+
+
+def test_entries_expire_and_the_least_recently_used_is_evicted():
+    now = [0.0]
+    cache = AnswerCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    for name in ("Dolo 650", "Crocin", "Azithral 500"):
+        cache.remember(f"Uses of {name}", f"{name} answer", [details(name)])
+
+    assert len(cache) == 2
+    assert cache.lookup("Uses of Dolo 650") is None
+    assert cache.lookup("Uses of Crocin")[0] == "Crocin answer"
+
+    now[0] = 11
+    assert cache.lookup("Uses of Crocin") is None
+    # Expired entries scored by the lookup are dropped on the way
+    assert len(cache) == 0
@@ -1,3 +1,7 @@
+import asyncio
+import json
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch
@@ -10,7 +14,7 @@ def test_health_check():
     assert response.status_code == 200
     assert response.json() == {"status": "ok", "service": "agent-service"}
 
-@patch("main.graph.ainvoke", new_callable=AsyncMock)
+@patch("agent.graph.graph.ainvoke", new_callable=AsyncMock)
 def test_chat_success(mock_ainvoke):
     from main import app
     client = TestClient(app)
@@ -20,3 +24,236 @@ def test_chat_success(mock_ainvoke):
     assert response.status_code == 200
     assert response.json()["response"] == "Hello there!"
     mock_ainvoke.assert_called_once()
+
+def parse_sse(body):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+@pytest.fixture
+def scripted_graph(monkeypatch):
+    from agent import graph as graph_module
+    from langchain_core.tools import StructuredTool
+    from fake_llm import ScriptedChatModel
+
+    async def lookup(user_id: str):
+        return {"reminders": []}
+
+    monkeypatch.setattr(graph_module, "tools_by_name", {
+        "get_reminders": StructuredTool.from_function(coroutine=lookup, name="get_reminders", description="x")
+    })
+
+    def install(script, **kwargs):
+        llm = ScriptedChatModel(script=script, **kwargs)
+        monkeypatch.setattr(graph_module, "llm_with_tools", llm)
+        return llm
+    return install
+
+def test_chat_stream_emits_tool_progress_tokens_and_done(scripted_graph):
+    from main import app
+    from fake_llm import tool_call
+    scripted_graph([tool_call("get_reminders", user_id="u1"), "You have no reminders"])
+    client = TestClient(app)
+
+    response = client.post("/api/agent/chat/stream", json={"message": "My reminders?", "user_id": "stream-1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert events[0] == ("tool_start", {"id": "call-get_reminders", "name": "get_reminders"})
+    assert events[1] == ("tool_end", {"id": "call-get_reminders", "name": "get_reminders", "status": "success"})
+    assert "".join(data["content"] for name, data in events if name == "token") == "You have no reminders"
+    assert events[-1] == ("done", {"response": "You have no reminders"})
+
+def test_chat_stream_reports_errors(scripted_graph, monkeypatch):
+    from main import app
+    llm = scripted_graph(["unused"])
+    monkeypatch.setattr(type(llm), "_astream", lambda *a, **k: (_ for _ in ()).throw(RuntimeError("model down")))
+    client = TestClient(app)
+
+    events = parse_sse(client.post("/api/agent/chat/stream", json={"message": "Hi", "user_id": "stream-2"}).text)
+
+    assert events[-1][0] == "error"
+    assert "model down" in events[-1][1]["detail"]
+
+@pytest.mark.asyncio
+async def test_stream_yields_first_token_early_and_cancels_on_disconnect(scripted_graph):
+    from main import stream_chat
+    from langchain_core.messages import HumanMessage
+    llm = scripted_graph(["one two three four five six"], latency=0.05, token_latency=0.2)
+    stream = stream_chat({"messages": [HumanMessage(content="Hi")]}, {"configurable": {"thread_id": "stream-3"}})
+
+    start = time.perf_counter()
+    first = await stream.__anext__()
+    assert "event: token" in first
+    assert time.perf_counter() - start < 0.2
+
+    # The client goes away: closing the generator cancels the graph run.
+    await stream.aclose()
+    await asyncio.sleep(0.3)
+    pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    assert pending == []
+    assert llm.calls == 1
+
+def test_chat_reports_trace_headers_and_metrics(scripted_graph):
+    from main import app
+    from fake_llm import tool_call
+    scripted_graph([tool_call("get_reminders", user_id="u1"), "You have no reminders"])
+    client = TestClient(app)
+
+    response = client.post("/api/agent/chat", json={"message": "My reminders?", "user_id": "metrics-1"})
+
+    assert response.status_code == 200
+    assert len(response.headers["x-trace-id"]) == 16
+    timing = response.headers["server-timing"]
+    for span in ("node.agent", "node.tools", "llm.chat", "tool.get_reminders"):
+        assert f"{span};dur=" in timing
+
+    text = client.get("/metrics").text
+    assert 'agent_requests_total{endpoint="/api/agent/chat",status="200"}' in text
+    assert 'agent_span_seconds_count{kind="tool",name="get_reminders"}' in text
+    assert 'agent_llm_tokens_total{call="chat",type="output"}' in text
+    assert 'agent_requests_in_flight{endpoint="/api/agent/chat"} 0' in text
+    client.get("/no/such/path")
+    assert 'agent_requests_total{endpoint="other",status="404"}' in client.get("/metrics").text
+
+def test_profile_header_writes_folded_stacks(scripted_graph, monkeypatch, tmp_path):
+    from main import app
+    from agent import profiler
+    scripted_graph(["Hello"], latency=0.05)
+    monkeypatch.setattr(profiler, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    client = TestClient(app)
+
+    plain = client.post("/api/agent/chat", json={"message": "Hi", "user_id": "profile-1"})
+    assert "x-profile" not in plain.headers
+
+    response = client.post("/api/agent/chat", json={"message": "Hi", "user_id": "profile-1"}, headers={"X-Profile": "1"})
+    path = response.headers["x-profile"]
+    assert path.startswith(str(tmp_path))
+    with open(path) as f:
+        assert f.read().strip()
+
+@pytest.mark.asyncio
+async def test_duplicate_submits_share_one_graph_run_and_overflow_gets_429(scripted_graph, monkeypatch):
+    import httpx
+    from main import app
+    from agent import turns as turns_module
+    llm = scripted_graph(["Take it after food"], latency=0.1)
+    monkeypatch.setattr(turns_module, "turns", turns_module.TurnScheduler(queue_size=1))
+    monkeypatch.setattr("main.turns", turns_module.turns)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        def post(message):
+            return client.post("/api/agent/chat", json={"message": message, "user_id": "dup-1"})
+        responses = await asyncio.gather(post("Dose?"), post("Dose?"), post("Dose?"), post("Other"), post("Third"))
+
+    assert [r.status_code for r in responses] == [200, 200, 200, 200, 429]
+    assert responses[4].headers["retry-after"] == "1"
+    assert responses[0].json() == responses[1].json() == responses[2].json() == {"response": "Take it after food"}
+    assert llm.calls == 2
+
+def test_cached_answer_skips_the_graph_and_keeps_the_thread_history(scripted_graph, monkeypatch):
+    from main import app
+    from agent import answer_cache, graph as graph_module
+    from langchain_core.tools import StructuredTool
+    from fake_llm import tool_call
+
+    async def details(medicine_name: str):
+        return {"name": medicine_name}
+
+    monkeypatch.setitem(graph_module.tools_by_name, "get_medicine_details",
+                        StructuredTool.from_function(coroutine=details, name="get_medicine_details", description="x"))
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", True)
+    llm = scripted_graph([tool_call("get_medicine_details", medicine_name="Dolo 650"), "Nausea and rash."])
+    client = TestClient(app)
+
+    first = client.post("/api/agent/chat", json={"message": "What are the side effects of Dolo 650?", "user_id": "cache-1"})
+    assert first.json() == {"response": "Nausea and rash."}
+    assert llm.calls == 2
+
+    second = client.post("/api/agent/chat", json={"message": "side effects of dolo 650", "user_id": "cache-2"})
+    assert second.json() == {"response": "Nausea and rash."}
+    stream = client.post("/api/agent/chat/stream", json={"message": "Dolo 650 side effects?", "user_id": "cache-2"})
+    assert parse_sse(stream.text) == [("token", {"content": "Nausea and rash."}), ("done", {"response": "Nausea and rash."})]
+    assert llm.calls == 2
+
+    history = asyncio.run(graph_module.graph.aget_state({"configurable": {"thread_id": "cache-2"}})).values["messages"]
+    assert [(m.type, m.content) for m in history] == [
+        ("human", "side effects of dolo 650"), ("ai", "Nausea and rash."),
+        ("human", "Dolo 650 side effects?"), ("ai", "Nausea and rash."),
+    ]
+    # The next turn that does reach the model sees the cached turns as history
+    client.post("/api/agent/chat", json={"message": "Can I take it with alcohol?", "user_id": "cache-2"})
+    prompt = [(m.type, m.content) for m in llm.prompts[2]]
+    assert prompt[-5:] == [
+        ("human", "side effects of dolo 650"), ("ai", "Nausea and rash."),
+        ("human", "Dolo 650 side effects?"), ("ai", "Nausea and rash."),
+        ("human", "Can I take it with alcohol?"),
+    ]
+
+def test_bulk_analysis_endpoint_runs_the_tool_without_the_agent(monkeypatch):
+    import main
+    from agent import graph as graph_module, tools, warmup as warmup_module
+    monkeypatch.setattr(main, "warmup", warmup_module.Warmup())
+
+    def no_llm():
+        raise ValueError("GOOGLE_API_KEY is not set")
+    monkeypatch.setattr(graph_module, "get_llm_with_tools", no_llm)
+
+    async def details(medicine_name, user_id):
+        return {"analysis": {"drug_name": medicine_name.title(), "references": [{"source": "rag"}]}}
+    monkeypatch.setattr(tools, "get_medicine_details_async", details)
+
+    # The lifespan starts the whole warm-up, and the LLM client fails to build
+    with TestClient(main.app) as client:
+        response = client.post("/api/agent/medicines/analyze", json={"medicines": ["dolo 650", "Dolo 650", "crocin"], "user_id": "u1"})
+        with pytest.raises(ValueError):
+            client.portal.call(main.warmup.wait, "llm")
+        assert client.get("/ready").json()["errors"] == {"llm": "GOOGLE_API_KEY is not set"}
+
+    assert response.status_code == 200
+    assert response.json() == {"medicines": [
+        {"query": "dolo 650", "source": "analyzer", "drug_name": "Dolo 650"},
+        {"query": "crocin", "source": "analyzer", "drug_name": "Crocin"},
+    ]}
+
+def test_turns_with_history_do_not_populate_the_answer_cache(scripted_graph, monkeypatch):
+    from main import app
+    from agent import answer_cache, graph as graph_module
+    from langchain_core.tools import StructuredTool
+    from fake_llm import tool_call
+
+    async def details(medicine_name: str):
+        return {"name": medicine_name}
+
+    monkeypatch.setitem(graph_module.tools_by_name, "get_medicine_details",
+                        StructuredTool.from_function(coroutine=details, name="get_medicine_details", description="x"))
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", True)
+    scripted_graph(["Noted.", tool_call("get_medicine_details", medicine_name="Dolo 650"), "Safe in pregnancy at low doses."])
+    client = TestClient(app)
+
+    client.post("/api/agent/chat", json={"message": "I am pregnant", "user_id": "history-1"})
+    answer = client.post("/api/agent/chat", json={"message": "Side effects of Dolo 650?", "user_id": "history-1"})
+    assert answer.json() == {"response": "Safe in pregnancy at low doses."}
+    stream = client.post("/api/agent/chat/stream", json={"message": "Uses of Dolo 650?", "user_id": "history-1"})
+    assert parse_sse(stream.text)[-1][0] == "done"
+    assert len(answer_cache.answers) == 0
+
+
+def test_chat_messages_are_only_logged_at_debug(scripted_graph, caplog):
+    import logging
+    from main import app
+    scripted_graph(["Noted."])
+    client = TestClient(app)
+
+    with caplog.at_level(logging.INFO):
+        client.post("/api/agent/chat", json={"message": "I am pregnant and take Dolo 650", "user_id": "log-1"})
+    assert "Received chat request from log-1 (31 chars, sha256 " in caplog.text
+    assert "pregnant" not in caplog.text
+
+    with caplog.at_level(logging.DEBUG):
+        client.post("/api/agent/chat", json={"message": "I am pregnant and take Dolo 650", "user_id": "log-1"})
+    assert "pregnant" in caplog.text
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import bench_load
+from stub_services import StubServices
+
+
+@pytest.mark.asyncio
+async def test_open_loop_keeps_schedule_and_counts_queueing_as_latency():
+    gate = asyncio.Semaphore(1)
+    users = []
+
+    async def send(user):
+        users.append(user)
+        async with gate:  # a server that handles one request at a time
+            await asyncio.sleep(0.02)
+
+    latencies, errors, elapsed = await bench_load.open_loop(send, rps=100, duration=0.2, users=3)
+
+    assert len(latencies) == 20 and errors == []
+    assert users[:4] == ["bench-user-0", "bench-user-1", "bench-user-2", "bench-user-0"]
+    # Sends were not held back by the slow server, so the last ones queued
+    # behind it for the whole 0.4s of work, not just their own 0.02s
+    assert max(latencies) > 0.15
+    assert elapsed >= 0.4
+
+
+def test_summarize_ms():
+    stats = bench_load.summarize_ms([i / 1000 for i in range(1, 101)])
+    assert stats["p50"] == 51 and stats["p99"] == 100 and stats["max"] == 100
+    assert bench_load.summarize_ms([]) == {}
+
+
+@pytest.mark.asyncio
+async def test_scenario_model_drives_the_graph_against_stub_services(monkeypatch):
+    from agent import graph, tools
+    stub = await StubServices(latency=0.01).start()
+    for name in ("MEDICINE_ANALYZER_URL", "MEDICINE_SCHEDULER_URL", "PROFILE_MANAGER_URL"):
+        monkeypatch.setattr(tools, name, stub.url)
+    model = bench_load.ScenarioChatModel(script=[""], hops=bench_load.parse_hops("get_medical_profile,get_reminders;get_medicine_details"), answer="done")
+    monkeypatch.setattr(graph, "llm_with_tools", model)
+
+    try:
+        results = await asyncio.gather(*(
+            graph.graph.ainvoke({"messages": [HumanMessage(content="Hi")]}, config={"configurable": {"thread_id": f"bench-{i}"}})
+            for i in range(3)
+        ))
+    finally:
+        await stub.close()
+
+    for result in results:
+        tool_results = [json.loads(m.content) for m in result["messages"] if m.type == "tool"]
+        assert len(tool_results) == 3 and not any("error" in r for r in tool_results)
+        assert result["messages"][-1].content == "done"
+    assert model.calls == 9
+    # The three chats share a user, so the tool caches coalesce each lookup into one request
+    assert stub.requests == 3
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from agent import tools
+from agent.cache import TTLCache, medicine_cache, user_cache
+from agent.http_client import close_clients
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_lru_eviction():
+    clock = FakeClock()
+    cache = TTLCache("test", maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "coalesced": 0, "size": 1}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_coalesce():
+    cache = TTLCache("test", maxsize=10, ttl=60)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"name": "paracetamol"}
+
+    results = await asyncio.gather(*(cache.get_or_load("k", load) for _ in range(10)))
+
+    assert len(calls) == 1
+    assert all(r == {"name": "paracetamol"} for r in results)
+    assert await cache.get_or_load("k", load) == {"name": "paracetamol"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 9, "size": 1}
+
+
+@pytest.mark.asyncio
+async def test_uncacheable_results_and_failures_are_not_stored():
+    cache = TTLCache("test", maxsize=10, ttl=60)
+
+    async def error_payload():
+        return {"error": "boom"}
+
+    async def raises():
+        raise RuntimeError("boom")
+
+    await cache.get_or_load("a", error_payload, cacheable=tools.succeeded)
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load("b", raises)
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidate_discards_in_flight_load_and_cancel_spares_waiters():
+    cache = TTLCache("test", maxsize=10, ttl=60)
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "stale"
+
+    first = asyncio.ensure_future(cache.get_or_load("k", load))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(cache.get_or_load("k", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    cache.invalidate("k")
+    release.set()
+
+    assert await second == "stale"
+    assert first.cancelled()
+    assert cache.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_tools_serve_repeats_from_cache_and_invalidate_reminders(stub_server, monkeypatch):
+    monkeypatch.setattr(tools, "MEDICINE_ANALYZER_URL", stub_server.url)
+    monkeypatch.setattr(tools, "MEDICINE_SCHEDULER_URL", stub_server.url)
+    stub_server.script("/analyze", (200, {"name": "Paracetamol"}, 0.05))
+    stub_server.script("/reminders/user/u1", (200, [], 0))
+    stub_server.script("/reminders", (201, {"id": "1"}, 0))
+    misses = medicine_cache.stats()["misses"]
+    try:
+        names = ["Paracetamol", " paracetamol", "PARACETAMOL "]
+        results = await asyncio.gather(*(
+            tools.get_medicine_details.ainvoke({"medicine_name": name, "user_id": f"u{i}"})
+            for i, name in enumerate(names)
+        ))
+        assert results == [{"name": "Paracetamol"}] * 3
+        assert medicine_cache.stats()["misses"] == misses + 1
+
+        await tools.get_reminders.ainvoke({"user_id": "u1"})
+        await tools.get_reminders.ainvoke({"user_id": "u1"})
+        await tools.schedule_medicine.ainvoke({
+            "user_id": "u1", "medicine_name": "Dolo", "dosage": "650mg",
+            "frequency": "daily", "time": "09:00 AM"
+        })
+        await tools.get_reminders.ainvoke({"user_id": "u1"})
+    finally:
+        await close_clients()
+
+    paths = [path for _, path, _ in stub_server.requests]
+    assert paths.count("/analyze") == 1
+    assert paths.count("/reminders/user/u1") == 2
+    assert user_cache.stats()["hits"] == 1
@@ -0,0 +1,104 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent import graph as graph_module
+from agent.checkpointer import SQLiteLRUSaver
+from fake_llm import ScriptedChatModel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    model = ScriptedChatModel(script=["first", "second", "third"])
+    monkeypatch.setattr(graph_module, "llm_with_tools", model)
+    return model
+
+
+async def chat(graph, thread_id, text):
+    result = await graph.ainvoke({"messages": [HumanMessage(content=text)]},
+                                 config={"configurable": {"thread_id": thread_id}})
+    return [m.content for m in result["messages"]]
+
+
+@pytest.mark.asyncio
+async def test_conversation_survives_restart(tmp_path, llm):
+    path = str(tmp_path / "checkpoints.sqlite")
+    saver = SQLiteLRUSaver(path)
+    await chat(graph_module.workflow.compile(checkpointer=saver), "u1", "Hi")
+    await chat(graph_module.workflow.compile(checkpointer=saver), "u1", "And?")
+    saver.close()
+
+    restarted = SQLiteLRUSaver(path)
+    history = await chat(graph_module.workflow.compile(checkpointer=restarted), "u1", "Last")
+
+    assert history == ["Hi", "first", "And?", "second", "Last", "third"]
+    assert restarted.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_only_newest_checkpoints_are_kept(tmp_path, llm):
+    saver = SQLiteLRUSaver(str(tmp_path / "c.sqlite"), keep=2)
+    graph = graph_module.workflow.compile(checkpointer=saver)
+    for i in range(5):
+        await chat(graph, "u1", f"turn {i}")
+
+    (count,) = saver.conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = 'u1'").fetchone()
+    assert count == 2
+    assert len(list(saver.list({"configurable": {"thread_id": "u1"}}))) == 2
+    # The next turn reads the cached latest checkpoint rather than SQLite.
+    before = saver.stats()["hits"]
+    await chat(graph, "u1", "again")
+    assert saver.stats()["hits"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_hot_threads_are_bounded_and_idle_ones_evicted(tmp_path, llm):
+    clock = FakeClock()
+    saver = SQLiteLRUSaver(str(tmp_path / "c.sqlite"), cache_size=3, idle_seconds=60, clock=clock)
+    graph = graph_module.workflow.compile(checkpointer=saver)
+    for i in range(10):
+        await chat(graph, f"user-{i}", "Hi")
+    assert list(key[0] for key in saver.hot) == ["user-7", "user-8", "user-9"]
+
+    clock.now = 61
+    await chat(graph, "user-0", "Back")
+    assert list(key[0] for key in saver.hot) == ["user-0"]
+
+    # Evicted threads still have their history on disk.
+    assert (await chat(graph, "user-5", "Again"))[:3] == ["Hi", "third", "Again"]
+
+
+@pytest.mark.asyncio
+async def test_workers_sharing_a_database_see_each_others_turns(tmp_path, llm):
+    path = str(tmp_path / "c.sqlite")
+    worker_a = graph_module.workflow.compile(checkpointer=SQLiteLRUSaver(path))
+    worker_b = graph_module.workflow.compile(checkpointer=SQLiteLRUSaver(path))
+
+    await chat(worker_a, "u1", "one")
+    await chat(worker_b, "u1", "two")
+    history = await chat(worker_a, "u1", "three")
+
+    assert history == ["one", "first", "two", "second", "three", "third"]
+
+
+def test_delete_thread(tmp_path):
+    saver = SQLiteLRUSaver(str(tmp_path / "c.sqlite"))
+    config = {"configurable": {"thread_id": "u1", "checkpoint_ns": ""}}
+    checkpoint = {"v": 1, "id": "0001", "ts": "", "channel_values": {"messages": ["x" * 5000]},
+                  "channel_versions": {}, "versions_seen": {}}
+    saved = saver.put(config, checkpoint, {}, {})
+    saver.put_writes(saved, [("messages", "pending")], task_id="t1")
+
+    loaded = saver.get_tuple({"configurable": {"thread_id": "u1"}})
+    assert loaded.checkpoint["channel_values"]["messages"] == ["x" * 5000]
+    assert loaded.pending_writes == [("t1", "messages", "pending")]
+
+    saver.delete_thread("u1")
+    assert saver.get_tuple({"configurable": {"thread_id": "u1"}}) is None
@@ -0,0 +1,86 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from agent import context
+from agent import graph as graph_module
+from fake_llm import ScriptedChatModel, tool_call
+
+
+def turn(i, size=40, with_tool=False):
+    messages = [HumanMessage(content=f"question {i} " + "x" * size)]
+    if with_tool:
+        call = tool_call("get_reminders", call_id=f"call-{i}", user_id="u1")
+        messages += [call, ToolMessage(content="y" * size, tool_call_id=f"call-{i}", name="get_reminders")]
+    messages.append(AIMessage(content=f"answer {i} " + "z" * size))
+    return messages
+
+
+def test_window_start_keeps_everything_that_fits():
+    messages = turn(0) + turn(1)
+    assert context.window_start(messages, budget=10_000) == 0
+
+
+def test_window_start_cuts_at_turn_boundaries_without_splitting_tool_pairs():
+    messages = [m for i in range(20) for m in turn(i, size=200, with_tool=i % 2 == 0)]
+    budget = context.estimate_tokens(messages) // 2
+
+    start = context.window_start(messages, budget, keep_ratio=0.5)
+
+    assert isinstance(messages[start], HumanMessage)
+    assert context.estimate_tokens(messages[start:]) <= budget * 0.5
+    assert context.estimate_tokens(messages[start - 4:]) > budget * 0.5 or start == 0
+    ids = {m.tool_call_id for m in messages[start:] if isinstance(m, ToolMessage)}
+    calls = {c["id"] for m in messages[start:] if isinstance(m, AIMessage) for c in m.tool_calls}
+    assert ids == calls
+
+
+def test_window_never_starts_after_the_current_turn():
+    messages = turn(0) + [HumanMessage(content="huge " + "x" * 10_000)]
+    assert context.window_start(messages, budget=100) == 2
+
+
+def test_cap_tool_content():
+    assert context.cap_tool_content("short", limit=10) == "short"
+    capped = context.cap_tool_content("a" * 50, limit=10)
+    assert capped == "a" * 10 + "... [truncated 40 characters]"
+
+
+@pytest.mark.asyncio
+async def test_call_model_summarizes_old_turns_once_per_window_shift(monkeypatch):
+    chat = ScriptedChatModel(script=[f"answer {i} " + "z" * 200 for i in range(100)])
+    summarizer = ScriptedChatModel(script=["User asked many questions about Dolo 650."])
+    monkeypatch.setattr(graph_module, "llm_with_tools", chat)
+    monkeypatch.setattr(graph_module, "llm", summarizer)
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGET", 800)
+    config = {"configurable": {"thread_id": "context-user"}}
+
+    for i in range(30):
+        result = await graph_module.graph.ainvoke({"messages": [HumanMessage(content=f"question {i} " + "x" * 200)]},
+                                                  config=config)
+
+    # Each summary frees half the budget, so it is redone every few turns, not every turn.
+    assert 3 <= summarizer.calls <= 12
+    assert result["summary"] == "User asked many questions about Dolo 650."
+    assert context.estimate_tokens(result["messages"]) <= 800
+    last_prompt = chat.prompts[-1]
+    assert isinstance(last_prompt[0], SystemMessage)
+    assert "Summary of the earlier conversation" in last_prompt[0].content
+    assert context.estimate_tokens(last_prompt[1:]) <= 800
+
+
+@pytest.mark.asyncio
+async def test_tool_results_are_capped(monkeypatch):
+    from langchain_core.tools import StructuredTool
+
+    async def huge(user_id: str):
+        return {"data": "x" * 10_000}
+
+    monkeypatch.setattr(graph_module, "tools_by_name", {
+        "get_reminders": StructuredTool.from_function(coroutine=huge, name="get_reminders", description="x")
+    })
+    monkeypatch.setattr(context, "TOOL_RESULT_MAX_CHARS", 100)
+    state = {"messages": [tool_call("get_reminders", user_id="u1")]}
+
+    result = await graph_module.call_tools(state, config={})
+
+    assert result["messages"][0].content.endswith("[truncated 9912 characters]")
@@ -1,5 +1,8 @@
+import asyncio
+import time
+
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import END
 
@@ -16,12 +19,150 @@ def test_should_continue_tools():
     result = should_continue(state)
     assert result == "tools"
 
+@pytest.mark.asyncio
 @patch("agent.graph.llm_with_tools")
-def test_call_model(mock_llm):
+async def test_call_model(mock_llm):
     from agent.graph import call_model
     mock_response = AIMessage(content="Test Response")
-    mock_llm.invoke.return_value = mock_response
+    mock_llm.ainvoke = AsyncMock(return_value=mock_response)
     state = {"messages": [HumanMessage(content="Hello")]}
-    result = call_model(state, config={"configurable": {"thread_id": "test_user"}})
+    result = await call_model(state, config={"configurable": {"thread_id": "test_user"}})
     assert len(result["messages"]) == 1
     assert result["messages"][0].content == "Test Response"
+
+class SlowLLM:
+    """Stub chat model that answers after a fixed delay and tracks calls in flight."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def ainvoke(self, prompt):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return AIMessage(content="ok")
+
+async def run_chats(n):
+    from agent.graph import graph
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        graph.ainvoke({"messages": [HumanMessage(content="Hi")]},
+                      config={"configurable": {"thread_id": f"load-{i}"}})
+        for i in range(n)
+    ))
+    return time.perf_counter() - start
+
+@pytest.mark.asyncio
+async def test_concurrent_chats_overlap_llm_calls(monkeypatch):
+    llm = SlowLLM(delay=0.2)
+    monkeypatch.setattr("agent.graph.llm_with_tools", llm)
+
+    elapsed = await run_chats(20)
+
+    # Serialized, 20 calls would take 4s; overlapped they take about one delay.
+    assert llm.peak == 20
+    assert elapsed < 1.0
+
+@pytest.mark.asyncio
+async def test_llm_concurrency_cap(monkeypatch):
+    from agent import graph as graph_module
+    llm = SlowLLM(delay=0.05)
+    monkeypatch.setattr(graph_module, "llm_with_tools", llm)
+    monkeypatch.setattr(graph_module, "LLM_MAX_CONCURRENCY", 4)
+    monkeypatch.setattr(graph_module, "_llm_semaphores", graph_module.weakref.WeakKeyDictionary())
+
+    elapsed = await run_chats(12)
+
+    assert llm.peak == 4
+    assert elapsed >= 3 * 0.05
+
+def make_tools(latencies):
+    from langchain_core.tools import StructuredTool
+
+    def make(name, delay):
+        async def run(user_id: str):
+            await asyncio.sleep(delay)
+            if delay < 0:
+                raise RuntimeError("downstream exploded")
+            return {"tool": name, "user_id": user_id}
+        return StructuredTool.from_function(coroutine=run, name=name, description=name)
+
+    return {name: make(name, delay) for name, delay in latencies.items()}
+
+def tool_turn(*names):
+    calls = [{"name": name, "args": {"user_id": "u1"}, "id": f"call-{i}"} for i, name in enumerate(names)]
+    return {"messages": [HumanMessage(content="Hi"), AIMessage(content="", tool_calls=calls)]}
+
+@pytest.mark.asyncio
+async def test_call_tools_runs_concurrently_in_order(monkeypatch):
+    from agent import graph as graph_module
+    monkeypatch.setattr(graph_module, "tools_by_name", make_tools({"slow": 0.3, "medium": 0.2, "fast": 0.1}))
+
+    start = time.perf_counter()
+    result = await graph_module.call_tools(tool_turn("slow", "medium", "fast"), config={})
+    elapsed = time.perf_counter() - start
+
+    assert [m.tool_call_id for m in result["messages"]] == ["call-0", "call-1", "call-2"]
+    assert [m.name for m in result["messages"]] == ["slow", "medium", "fast"]
+    assert '"tool": "slow"' in result["messages"][0].content
+    assert elapsed < 0.45
+
+@pytest.mark.asyncio
+async def test_call_tools_annotates_timeouts_and_errors(monkeypatch):
+    from agent import graph as graph_module
+    monkeypatch.setattr(graph_module, "tools_by_name", make_tools({"stuck": 5, "broken": -1, "fast": 0}))
+    monkeypatch.setattr(graph_module, "TOOL_TIMEOUT", 0.1)
+
+    start = time.perf_counter()
+    result = await graph_module.call_tools(tool_turn("stuck", "broken", "fast", "missing"), config={})
+
+    assert time.perf_counter() - start < 1
+    stuck, broken, fast, missing = result["messages"]
+    assert stuck.status == "error" and "Timed out" in stuck.content
+    assert broken.status == "error" and "downstream exploded" in broken.content
+    assert fast.status == "success"
+    assert "Unknown tool: missing" in missing.content
+
+@pytest.mark.asyncio
+async def test_call_tools_concurrency_limit(monkeypatch):
+    from agent import graph as graph_module
+    monkeypatch.setattr(graph_module, "tools_by_name", make_tools({f"t{i}": 0.1 for i in range(4)}))
+    monkeypatch.setattr(graph_module, "TOOL_MAX_CONCURRENCY", 2)
+
+    start = time.perf_counter()
+    await graph_module.call_tools(tool_turn("t0", "t1", "t2", "t3"), config={})
+
+    assert time.perf_counter() - start >= 0.2
+
+class ScriptedLLM:
+    """Stub chat model that replays `replies` and records each prompt."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+@pytest.mark.asyncio
+async def test_graph_keeps_history_across_tool_hops_and_turns(monkeypatch):
+    from agent import graph as graph_module
+    from langchain_core.messages import ToolMessage
+    call = {"name": "fast", "args": {"user_id": "u1"}, "id": "call-0"}
+    llm = ScriptedLLM([AIMessage(content="", tool_calls=[call]), AIMessage(content="Done"), AIMessage(content="Again")])
+    monkeypatch.setattr(graph_module, "llm_with_tools", llm)
+    monkeypatch.setattr(graph_module, "tools_by_name", make_tools({"fast": 0}))
+    config = {"configurable": {"thread_id": "history-user"}}
+
+    await graph_module.graph.ainvoke({"messages": [HumanMessage(content="Hi")]}, config=config)
+    result = await graph_module.graph.ainvoke({"messages": [HumanMessage(content="More")]}, config=config)
+
+    second_hop = [type(m) for m in llm.prompts[1][1:]]
+    assert second_hop == [HumanMessage, AIMessage, ToolMessage]
+    assert [m.content for m in result["messages"]][-3:] == ["Done", "More", "Again"]
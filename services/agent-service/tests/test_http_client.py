@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from agent import tools
+from agent.http_client import CircuitBreaker, CircuitOpenError, ServiceClient, close_clients
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_get_retries_transient_status(stub_server):
+    stub_server.script("/profile", (503, {}, 0), (200, {"ok": True}, 0))
+    client = ServiceClient("profile", retries=2, backoff=0)
+    try:
+        assert await client.get(f"{stub_server.url}/profile") == {"ok": True}
+    finally:
+        await client.aclose()
+    assert len(stub_server.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_post_is_not_resent_after_it_was_sent(stub_server):
+    stub_server.script("/reminders", (503, {}, 0), (200, {"id": "1"}, 0))
+    client = ServiceClient("scheduler", retries=2, backoff=0)
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.post(f"{stub_server.url}/reminders", json={"a": 1})
+    finally:
+        await client.aclose()
+    assert len(stub_server.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_post_is_retried_when_connection_fails():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"id": "1"})
+
+    client = ServiceClient("scheduler", backoff=0, transport=httpx.MockTransport(handler))
+    try:
+        assert await client.post("http://scheduler/reminders", json={}) == {"id": "1"}
+    finally:
+        await client.aclose()
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_slow_downstream(stub_server):
+    stub_server.script("/analyze", (200, {}, 1.0))
+    client = ServiceClient("analyzer", deadline=0.2)
+    start = time.perf_counter()
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await client.post(f"{stub_server.url}/analyze", json={})
+    finally:
+        await client.aclose()
+    assert time.perf_counter() - start < 0.6
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_fails_fast_and_recovers(stub_server):
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    stub_server.script("/profile", (500, {}, 0), (500, {}, 0), (200, {"ok": True}, 0))
+    client = ServiceClient("profile", retries=0, breaker=breaker)
+    url = f"{stub_server.url}/profile"
+    try:
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.get(url)
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            await client.get(url)
+        assert len(stub_server.requests) == 2
+
+        clock.now = 10
+        assert breaker.state == "half_open"
+        assert await client.get(url) == {"ok": True}
+        assert breaker.state == "closed"
+    finally:
+        await client.aclose()
+
+
+def test_failed_half_open_trial_reopens_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5, clock=clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_ends_on_any_error():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+
+    def handler(request):
+        raise httpx.DecodingError("bad gzip", request=request)
+    client = ServiceClient("analyzer", retries=0, breaker=breaker, transport=httpx.MockTransport(handler))
+    try:
+        clock.now = 5
+        with pytest.raises(httpx.DecodingError):
+            await client.get("http://analyzer/analyze")
+        assert breaker.state == "open" and not breaker.trial_in_flight
+        clock.now = 10
+        assert breaker.allow()
+    finally:
+        await client.aclose()
+
+@pytest.mark.asyncio
+async def test_async_tools_use_downstream_clients(stub_server, monkeypatch):
+    monkeypatch.setattr(tools, "MEDICINE_SCHEDULER_URL", stub_server.url)
+    monkeypatch.setattr(tools, "PROFILE_MANAGER_URL", stub_server.url)
+    stub_server.script("/reminders/user/u1", (200, [{"medicineName": "Dolo"}], 0))
+    stub_server.script("/reminders", (201, {"id": "9"}, 0))
+    stub_server.script("/profile/u1/medical-info", (404, {"error": "no profile"}, 0))
+    try:
+        assert await tools.get_reminders.ainvoke({"user_id": "u1"}) == [{"medicineName": "Dolo"}]
+        result = await tools.schedule_medicine.ainvoke({
+            "user_id": "u1", "medicine_name": "Dolo", "dosage": "650mg",
+            "frequency": "daily", "time": "09:00 AM"
+        })
+        assert result == {"id": "9"}
+        assert stub_server.requests[-1][2]["schedule"] == {"frequency": "daily", "time": "09:00 AM"}
+
+        profile = await tools.get_medical_profile.ainvoke({"user_id": "u1"})
+        assert profile["message"] == "Failed to fetch medical profile."
+    finally:
+        await close_clients()
@@ -0,0 +1,77 @@
+import contextvars
+import json
+import logging
+import queue
+
+import pytest
+
+from utils.logger import BoundedQueueHandler, JsonFormatter, start_request
+
+
+@pytest.fixture
+def queued_logger():
+    """A logger feeding a fresh BoundedQueueHandler with room for four records."""
+    handler = BoundedQueueHandler(queue.Queue(maxsize=4))
+    log = logging.getLogger("test-queued")
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    log.addHandler(handler)
+    yield log, handler
+    log.removeHandler(handler)
+
+
+def drain(handler):
+    records = []
+    while not handler.queue.empty():
+        records.append(handler.queue.get_nowait())
+    return records
+
+
+def test_records_are_rendered_truncated_and_formatted_as_json(queued_logger, monkeypatch):
+    from utils import logger as logging_setup
+    monkeypatch.setattr(logging_setup, "LOG_MAX_MESSAGE_CHARS", 20)
+    log, handler = queued_logger
+    args = {"dose": "500mg"}
+
+    log.info("Dose is %s %s", args, "x" * 50, extra={"user_id": "u1"})
+    args["dose"] = "changed after logging"
+    try:
+        raise ValueError("bad dose")
+    except ValueError:
+        log.error("Failed", exc_info=True)
+
+    info, error = (json.loads(JsonFormatter().format(record)) for record in drain(handler))
+    assert info["message"].startswith("Dose is {'dose': '5")
+    assert info["message"].endswith("[truncated 56 characters]")
+    assert info["level"] == "INFO"
+    assert info["user_id"] == "u1"
+    assert error["message"] == "Failed"
+    assert "ValueError: bad dose" in error["exception"]
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking(queued_logger):
+    log, handler = queued_logger
+    for i in range(6):
+        log.warning("record %d", i)
+
+    assert [record.getMessage() for record in drain(handler)] == ["record 0", "record 1", "record 2", "record 3"]
+    assert handler.dropped == 2
+
+
+def test_request_sampling_keeps_warnings_and_tags_trace_id(queued_logger):
+    log, handler = queued_logger
+
+    def request(trace_id, rate):
+        start_request(trace_id, sample_rate=rate)
+        log.info("info")
+        log.warning("warning")
+
+    contextvars.copy_context().run(request, "kept", 1.0)
+    contextvars.copy_context().run(request, "skipped", 0.0)
+    log.info("outside any request")
+
+    records = drain(handler)
+    assert [(getattr(r, "trace_id", None), r.getMessage()) for r in records] == [
+        ("kept", "info"), ("kept", "warning"), ("skipped", "warning"), (None, "outside any request"),
+    ]
+    assert handler.sampled_out == 1
@@ -0,0 +1,164 @@
+import json
+import math
+import os
+from array import array
+
+import pytest
+
+from agent import medicine_graph, tools
+from agent.medicine_graph import NONE, MedicineGraph, ingredient_name
+from agent.medicine_index import normalize_name
+
+
+def write_graph(path, records):
+    """Write a medicine graph in the format vectordbScript/medicine_graph.py produces."""
+    by_name = {}
+    for record in records:
+        by_name.setdefault(normalize_name(record["name"]), record)
+    names = sorted(by_name)
+    records = [by_name[name] for name in names]
+
+    def vocabulary(values):
+        ordered = sorted({v for v in values if v}, key=lambda v: v.encode("utf-8"))
+        return ordered, {v: i for i, v in enumerate(ordered)}
+
+    def normalized(record, key):
+        return normalize_name(record.get(key) or "")
+
+    ingredients, ingredient_ids = vocabulary(ingredient_name(c) for r in records for c in r.get("compositions", []))
+    classes, class_ids = vocabulary(normalized(r, k) for r in records for k in ("therapeutic_class", "action_class"))
+    keys = [" + ".join(sorted(normalize_name(c) for c in r.get("compositions", []))) for r in records]
+    compositions, composition_ids = vocabulary(keys)
+    prices = array("f", [float(r.get("price", "nan")) for r in records])
+
+    def by_price(i):
+        return math.isnan(prices[i]), prices[i], i
+
+    def blob(stem, items):
+        offsets = array("Q", [0])
+        with open(os.path.join(path, f"{stem}.bin"), "wb") as f:
+            for item in items:
+                f.write(item.encode("utf-8"))
+                offsets.append(offsets[-1] + len(item.encode("utf-8")))
+        with open(os.path.join(path, f"{stem}.off"), "wb") as f:
+            offsets.tofile(f)
+
+    def csr(stem, rows):
+        offsets, ids = array("Q", [0]), array("I")
+        for row in rows:
+            ids.extend(row)
+            offsets.append(len(ids))
+        for suffix, values in (("off", offsets), ("ids", ids)):
+            with open(os.path.join(path, f"{stem}.{suffix}"), "wb") as f:
+                values.tofile(f)
+
+    def table(name, values):
+        with open(os.path.join(path, name), "wb") as f:
+            values.tofile(f)
+
+    os.makedirs(path, exist_ok=True)
+    for stem, items in (("medicines", names), ("ingredients", ingredients), ("classes", classes), ("compositions", compositions)):
+        blob(stem, items)
+    table("medicine_prices.f4", prices)
+    table("medicine_classes.u4", array("I", [
+        class_ids.get(normalized(r, k), NONE) for r in records for k in ("therapeutic_class", "action_class")
+    ]))
+    table("medicine_composition.u4", array("I", [composition_ids.get(key, NONE) for key in keys]))
+    medicine_ingredients = [sorted({ingredient_ids[ingredient_name(c)] for c in r.get("compositions", [])}) for r in records]
+    csr("medicine_ingredients", medicine_ingredients)
+    csr("ingredient_medicines", [[i for i, row in enumerate(medicine_ingredients) if k in row] for k in range(len(ingredients))])
+    csr("class_medicines", [[i for i, r in enumerate(records) if c in (normalized(r, "therapeutic_class"), normalized(r, "action_class"))]
+                            for c in classes])
+    csr("composition_medicines", [sorted((i for i, key in enumerate(keys) if key == c), key=by_price) for c in compositions])
+    csr("medicine_substitutes", [
+        sorted({names.index(normalize_name(s)) for s in r.get("substitutes", []) if normalize_name(s) in by_name}, key=by_price)
+        for r in records
+    ])
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"format": "aushadx-medicine-graph", "version": 1, "medicines": len(names), "ingredients": len(ingredients),
+                   "classes": len(classes), "compositions": len(compositions)}, f)
+
+
+MEDICINES = [
+    {"name": "Dolo 650 Tablet", "price": "30.9", "compositions": ["Paracetamol (650mg)"],
+     "substitutes": ["Calpol 650 Tablet"], "therapeutic_class": "PAIN ANALGESICS", "action_class": "Analgesic"},
+    {"name": "Pacimol 650mg Tablet", "price": "15", "compositions": ["Paracetamol (650mg)"],
+     "therapeutic_class": "PAIN ANALGESICS", "action_class": "Analgesic"},
+    {"name": "Calpol 650 Tablet", "price": "28", "compositions": ["Paracetamol  (500mg)"], "therapeutic_class": "PAIN ANALGESICS"},
+    {"name": "P 650 Tablet", "compositions": ["Paracetamol (650mg)"]},
+    {"name": "Pan 40 Tablet", "price": "155", "compositions": ["Pantoprazole (40mg)"],
+     "therapeutic_class": "GASTRO INTESTINAL", "action_class": "Proton Pump Inhibitor"},
+    {"name": "Razo 20 Tablet", "price": "120", "compositions": ["Rabeprazole (20mg)"],
+     "therapeutic_class": "GASTRO INTESTINAL", "action_class": "Proton Pump Inhibitor"},
+    {"name": "Augmentin 625 Duo Tablet", "price": "223", "compositions": ["Amoxycillin (500mg)", "Clavulanic Acid (125mg)"],
+     "therapeutic_class": "ANTI INFECTIVES"},
+]
+
+
+@pytest.fixture
+def graph(tmp_path):
+    write_graph(str(tmp_path), MEDICINES)
+    graph = MedicineGraph(str(tmp_path))
+    yield graph
+    graph.close()
+
+
+def test_find_medicine_prefers_exact_then_shortest_whole_word_prefix(graph):
+    assert graph.medicines[graph.find_medicine("DOLO 650 tablet")] == b"dolo 650 tablet"
+    assert graph.medicines[graph.find_medicine("dolo 650")] == b"dolo 650 tablet"
+    assert graph.find_medicine("dolo 65") is None
+    assert graph.find_medicine("") is None
+    assert graph.find_ingredient("Paracetamol (650mg)") == graph.find_ingredient("paracetamol") is not None
+
+
+def test_substitutes_share_the_composition_or_are_listed_cheapest_first(graph):
+    dolo = graph.find_medicine("dolo 650")
+    subs = [graph.medicine(i) for i in graph.substitutes(dolo)]
+    # Same composition first by price, unknown prices last; Calpol is listed though its strength differs
+    assert [s["name"] for s in subs] == ["pacimol 650mg tablet", "calpol 650 tablet", "p 650 tablet"]
+    assert subs[0] == {"name": "pacimol 650mg tablet", "price": 15.0, "composition": "paracetamol (650mg)",
+                       "therapeutic_class": "pain analgesics", "action_class": "analgesic"}
+    assert graph.substitutes(dolo, limit=1) == [graph.find_medicine("pacimol 650mg")]
+    assert graph.substitutes(graph.find_medicine("augmentin")) == []
+
+
+def test_overlaps_flag_shared_ingredients_and_duplicate_classes(graph):
+    result = graph.overlaps(["Dolo 650", "Paracetamol", "Pan 40", "Razo 20", "Augmentin 625", "Mystery"])
+
+    assert result["unresolved"] == ["Mystery"]
+    assert {"query": "Paracetamol", "matched": "paracetamol"} in result["checked"]
+    assert result["overlaps"] == [
+        {"medicines": ["Dolo 650", "Paracetamol"], "shared_ingredients": ["paracetamol"]},
+        {"medicines": ["Pan 40", "Razo 20"], "same_action_class": "proton pump inhibitor", "same_therapeutic_class": "gastro intestinal"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tools_answer_from_the_graph(graph, monkeypatch, stub_server):
+    from agent.http_client import close_clients
+    monkeypatch.setattr(medicine_graph, "get_medicine_graph", lambda: graph)
+    monkeypatch.setattr(tools, "MEDICINE_SCHEDULER_URL", stub_server.url)
+    stub_server.script("/reminders/user/u1", (200, {"reminders": [
+        {"medicineName": "Dolo 650"}, {"medicineName": "dolo 650"}, {"medicineName": "Pan 40"},
+    ]}, 0))
+
+    result = await tools.find_substitutes.ainvoke({"medicine_name": "Dolo 650 Tablet", "limit": 2})
+    assert result["medicine"]["price"] == pytest.approx(30.9)
+    assert [(s["name"], s.get("cheaper_by")) for s in result["substitutes"]] == [
+        ("pacimol 650mg tablet", pytest.approx(15.9)), ("calpol 650 tablet", pytest.approx(2.9)),
+    ]
+    assert "error" in await tools.find_substitutes.ainvoke({"medicine_name": "Unknown"})
+
+    try:
+        result = await tools.check_medicine_overlaps.ainvoke({"user_id": "u1", "medicine_name": "Calpol 650"})
+    finally:
+        await close_clients()
+    assert [c["query"] for c in result["checked"]] == ["Dolo 650", "Pan 40", "Calpol 650"]
+    assert result["overlaps"] == [{
+        "medicines": ["Dolo 650", "Calpol 650"], "shared_ingredients": ["paracetamol"], "same_therapeutic_class": "pain analgesics",
+    }]
+
+
+def test_tools_report_a_missing_graph(monkeypatch):
+    monkeypatch.setattr(medicine_graph, "get_medicine_graph", lambda: None)
+    assert tools.find_substitutes.invoke({"medicine_name": "Dolo 650"})["error"] == "Medicine graph not available"
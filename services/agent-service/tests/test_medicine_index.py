@@ -0,0 +1,130 @@
+import json
+import os
+from array import array
+
+import pytest
+
+from agent import medicine_index, tools
+from agent.medicine_index import MedicineIndex, normalize_name, trigram_keys
+
+
+def write_index(path, records):
+    """Write a lookup index in the format vectordbScript/lookup_index.py produces."""
+    by_name = {}
+    for record in records:
+        by_name.setdefault(normalize_name(record["name"]), {**record, "name": normalize_name(record["name"])})
+    names = sorted(name.encode("utf-8") for name in by_name)
+
+    postings = {}
+    for i, name in enumerate(names):
+        for key in trigram_keys(name.decode("utf-8")):
+            postings.setdefault(key, []).append(i)
+
+    def blob(stem, items):
+        offsets = array("Q", [0])
+        with open(os.path.join(path, f"{stem}.bin"), "wb") as f:
+            for item in items:
+                f.write(item)
+                offsets.append(offsets[-1] + len(item))
+        with open(os.path.join(path, f"{stem}.off"), "wb") as f:
+            offsets.tofile(f)
+
+    os.makedirs(path, exist_ok=True)
+    blob("names", names)
+    blob("records", [json.dumps(by_name[name.decode("utf-8")]).encode("utf-8") for name in names])
+    keys = sorted(postings)
+    key_offsets = array("Q", [0])
+    ids = array("I")
+    for key in keys:
+        ids.extend(postings[key])
+        key_offsets.append(len(ids))
+    for name, values in (("trigrams.keys", array("I", keys)), ("trigrams.off", key_offsets), ("trigrams.post", ids)):
+        with open(os.path.join(path, name), "wb") as f:
+            values.tofile(f)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"format": "aushadx-medicine-lookup", "version": 1, "count": len(names), "trigrams": len(keys)}, f)
+
+
+MEDICINES = [
+    {"name": "Dolo 650 Tablet", "compositions": ["Paracetamol (650mg)"]},
+    {"name": "Dolo 6500 Tablet", "compositions": ["Paracetamol (6500mg)"]},
+    {"name": "Azithral 500 Tablet", "compositions": ["Azithromycin (500mg)"]},
+    {"name": "Augmentin 625 Duo Tablet", "compositions": ["Amoxycillin (500mg)", "Clavulanic Acid (125mg)"]},
+    {"name": "Crocin Advance Tablet", "compositions": ["Paracetamol (500mg)"]},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    write_index(str(tmp_path), MEDICINES)
+    index = MedicineIndex(str(tmp_path))
+    yield index
+    index.close()
+
+
+def test_exact_lookup_is_case_and_space_insensitive(index):
+    i = index.exact("  AZITHRAL   500 tablet")
+    assert index.name(i) == "azithral 500 tablet"
+    assert index.record(i)["compositions"] == ["Azithromycin (500mg)"]
+    assert index.exact("azithral") is None
+
+
+def test_prefix_lookup_respects_word_boundaries(index):
+    assert [index.name(i) for i in index.prefix("dolo")] == ["dolo 650 tablet", "dolo 6500 tablet"]
+    assert [index.name(i) for i in index.prefix("dolo 650", whole_words=True)] == ["dolo 650 tablet"]
+
+
+def test_fuzzy_lookup_ranks_misspellings(index):
+    (i, score), = index.fuzzy("augmentin 625 duo tabet", limit=1)
+    assert index.name(i) == "augmentin 625 duo tablet"
+    assert score > 0.9
+    assert index.fuzzy("zzzz qqqq") == []
+
+
+def test_lookup_falls_through_match_kinds(index):
+    assert index.lookup("Crocin Advance Tablet")["match"] == "exact"
+    assert index.lookup("Azithral 500")["medicine"]["name"] == "azithral 500 tablet"
+    assert index.lookup("dolo") == {"match": "ambiguous", "candidates": ["dolo 650 tablet", "dolo 6500 tablet"]}
+    # Near misses are only suggestions, never an answer
+    assert index.lookup("crocin advanse tablet") == {"match": "fuzzy", "candidates": ["crocin advance tablet"]}
+    assert index.lookup("metformin") is None
+
+
+def test_another_strength_does_not_resolve(index, monkeypatch, requests_mock):
+    found = index.lookup("Dolo 500 Tablet")
+    assert "medicine" not in found and "dolo 650 tablet" in found["candidates"]
+
+    monkeypatch.setattr(medicine_index, "get_index", lambda: index)
+    monkeypatch.setattr(tools, "MEDICINE_ANALYZER_URL", "http://mock-analyzer")
+    requests_mock.post("http://mock-analyzer/analyze", json={"status": "success", "data": "dolo 500 info"})
+    assert tools.get_medicine_details.invoke({"medicine_name": "Dolo 500 Tablet", "user_id": "u1"})["data"] == "dolo 500 info"
+
+    requests_mock.post("http://mock-analyzer/analyze", status_code=503)
+    result = tools.get_medicine_details.invoke({"medicine_name": "Dolo 500 Tablets", "user_id": "u1"})
+    assert "error" in result and "dolo 650 tablet" in result["did_you_mean"]
+
+
+def test_rejects_other_formats(tmp_path):
+    (tmp_path / "meta.json").write_text(json.dumps({"format": "something-else", "version": 1}))
+    with pytest.raises(ValueError):
+        MedicineIndex(str(tmp_path))
+
+
+def test_get_medicine_details_prefers_local_index(index, monkeypatch, requests_mock):
+    monkeypatch.setattr(medicine_index, "get_index", lambda: index)
+    result = tools.get_medicine_details.invoke({"medicine_name": "Dolo 650", "user_id": "u1"})
+    assert result["source"] == "local_index"
+    assert result["medicine"]["compositions"] == ["Paracetamol (650mg)"]
+    assert requests_mock.call_count == 0
+
+    # Unknown names still go to the analyzer
+    monkeypatch.setattr(tools, "MEDICINE_ANALYZER_URL", "http://mock-analyzer")
+    requests_mock.post("http://mock-analyzer/analyze", json={"status": "success", "data": "info"})
+    assert tools.get_medicine_details.invoke({"medicine_name": "Metformin", "user_id": "u1"}) == {"status": "success", "data": "info"}
+
+
+@pytest.mark.asyncio
+async def test_get_medicine_details_async_prefers_local_index(index, monkeypatch):
+    monkeypatch.setattr(medicine_index, "get_index", lambda: index)
+    result = await tools.get_medicine_details.ainvoke({"medicine_name": "azithral 500 tablet", "user_id": "u1"})
+    assert result == {"source": "local_index", "match": "exact", "medicine": {"name": "azithral 500 tablet", "compositions": ["Azithromycin (500mg)"]}}
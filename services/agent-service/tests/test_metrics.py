@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent import metrics
+from agent.profiler import SamplingProfiler
+
+
+def test_counter_gauge_and_histogram_render():
+    counter = metrics.Counter("test_things_total", "Things.", ("kind",))
+    gauge = metrics.Gauge("test_things_open", "Open things.")
+    histogram = metrics.Histogram("test_thing_seconds", "Thing latency.", ("kind",), buckets=(0.1, 1))
+    counter.inc(kind='a "quoted"\nkind')
+    counter.inc(2, kind="b")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, kind="x")
+
+    text = metrics.render()
+    assert 'test_things_total{kind="a \\"quoted\\"\\nkind"} 1' in text
+    assert 'test_things_total{kind="b"} 2' in text
+    assert "# TYPE test_things_open gauge\ntest_things_open 1\n" in text
+    assert 'test_thing_seconds_bucket{kind="x",le="0.1"} 1' in text
+    assert 'test_thing_seconds_bucket{kind="x",le="1"} 2' in text
+    assert 'test_thing_seconds_bucket{kind="x",le="+Inf"} 3' in text
+    assert 'test_thing_seconds_sum{kind="x"} 5.55' in text
+    assert 'test_thing_seconds_count{kind="x"} 3' in text
+
+
+def test_collectors_render_at_scrape_time():
+    from agent.cache import medicine_cache
+    medicine_cache.set("dolo", {"name": "dolo"})
+    medicine_cache.get("dolo")
+    before = metrics.render()
+    medicine_cache.get("dolo")
+
+    text = metrics.render()
+    assert 'agent_cache_entries{cache="medicine"} 1' in text
+    assert 'agent_cache_requests_total{cache="medicine",result="hit"}' in text
+    assert before != text
+    assert "agent_checkpoint_hot_threads" in text
+
+
+@pytest.mark.asyncio
+async def test_spans_reach_histograms_and_the_trace_of_concurrent_tasks():
+    trace = metrics.start_trace("trace-1")
+
+    async def step(name):
+        with metrics.span("tool", name):
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(asyncio.create_task(step("alpha")), asyncio.create_task(step("beta")))
+    with pytest.raises(ValueError):
+        with metrics.span("tool", "alpha"):
+            raise ValueError("boom")
+
+    assert sorted(name for _, name, _, _ in trace.spans) == ["alpha", "alpha", "beta"]
+    assert metrics.span_errors_total.value(kind="tool", name="alpha", error="ValueError") >= 1
+    assert metrics.spans_in_flight.value(kind="tool", name="alpha") == 0
+    assert "tool.alpha;dur=" in trace.server_timing()
+
+
+def test_sampling_profiler_sees_the_busy_function():
+    def busy_wait():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+
+    with SamplingProfiler(interval=0.002) as profiler:
+        busy_wait()
+
+    assert sum(profiler.samples.values()) > 10
+    assert "busy_wait (test_metrics.py:" in profiler.folded()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profiler.folded().splitlines())
+
+
+def test_sampling_profiler_stops_when_its_thread_exits():
+    worker = threading.Thread(target=time.sleep, args=(0.05,))
+    worker.start()
+    profiler = SamplingProfiler(thread_id=worker.ident, interval=0.002)
+    profiler.start()
+    worker.join()
+    time.sleep(0.02)
+    assert not profiler._thread.is_alive()
+    profiler.stop()
@@ -26,7 +26,8 @@ def test_get_medicine_details_success(monkeypatch):
         result = tools.get_medicine_details.invoke({"medicine_name": "Aspirin", "user_id": "user123"})
         
         assert result == {"status": "success", "data": "info"}
-        assert m.last_request.json() == {"medicine_data": {"text": "Information about Aspirin"}, "userId": "user123"}
+        # General details are shared between users, so they are never asked for on one's behalf
+        assert m.last_request.json() == {"medicine_data": {"text": "Information about Aspirin"}}
 
 def test_schedule_medicine_success(monkeypatch):
     # Patch the global variable in the module
@@ -53,3 +54,55 @@ def test_schedule_medicine_success(monkeypatch):
                 "time": "09:00 AM"
             }
         }
+
+ANALYSIS = {
+    "success": True,
+    "analysis": {
+        "drug_name": "Metformin",
+        "indications": ["Type 2 diabetes"],
+        "side_effects": [{"name": "Nausea", "likelihood": "common", "notes": ""}],
+        "interactions": [{"substance": "Alcohol", "severity": "high", "notes": ""}],
+        "contraindications": [],
+        "confidence": {"level": "high", "rationale": "Well known"},
+        "references": [{"source": "rag", "context_index": 0}],
+    },
+}
+
+@pytest.mark.asyncio
+async def test_analyze_medicines_dedups_reuses_the_cache_and_compacts(stub_server, monkeypatch):
+    from agent import medicine_index
+    from agent.http_client import close_clients
+    monkeypatch.setattr(medicine_index, "get_index", lambda: None)
+    monkeypatch.setattr(tools, "MEDICINE_ANALYZER_URL", stub_server.url)
+    monkeypatch.setattr(tools, "BULK_ANALYZE_MAX_ITEMS", 3)
+    stub_server.script("/analyze", (200, ANALYSIS, 0.05))
+    try:
+        await tools.get_medicine_details.ainvoke({"medicine_name": "Amlodipine", "user_id": "u1"})
+        result = await tools.analyze_medicines.ainvoke({
+            "medicines": ["Metformin 500", "amlodipine", " METFORMIN  500", "", "Atorvastatin", "Pantoprazole"],
+            "user_id": "u1",
+        })
+    finally:
+        await close_clients()
+
+    assert [m["query"] for m in result["medicines"]] == ["Metformin 500", "amlodipine", "Atorvastatin"]
+    assert result["skipped"] == ["Pantoprazole"]
+    assert result["medicines"][0] == {
+        "query": "Metformin 500",
+        "source": "analyzer",
+        "drug_name": "Metformin",
+        "indications": ["Type 2 diabetes"],
+        "side_effects": ["Nausea"],
+        "interactions": ["Alcohol (high)"],
+        "confidence": "high",
+    }
+    # Amlodipine was already cached; Metformin was asked for twice
+    texts = [body["medicine_data"]["text"] for _, path, body in stub_server.requests if path == "/analyze"]
+    assert sorted(texts) == ["Information about Amlodipine", "Information about Atorvastatin", "Information about Metformin 500"]
+
+def test_analyze_medicines_reports_failures_per_medicine(monkeypatch, requests_mock):
+    monkeypatch.setattr(tools, "MEDICINE_ANALYZER_URL", "http://mock-analyzer")
+    requests_mock.post("http://mock-analyzer/analyze", status_code=503)
+    result = tools.analyze_medicines.invoke({"medicines": ["Metformin"], "user_id": "u1"})
+    assert result["medicines"][0]["query"] == "Metformin"
+    assert "503" in result["medicines"][0]["error"]
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from agent.turns import TurnQueueFull, TurnScheduler
+
+
+def recorder(log, delay=0.02):
+    def make(name):
+        async def run():
+            log.append(f"start {name}")
+            await asyncio.sleep(delay)
+            log.append(f"end {name}")
+            return name
+        return run
+    return make
+
+
+@pytest.mark.asyncio
+async def test_turns_of_one_thread_run_in_order_and_threads_in_parallel():
+    scheduler = TurnScheduler()
+    log = []
+    run = recorder(log)
+
+    results = await asyncio.gather(
+        scheduler.submit("u1", "first", run("u1-first")),
+        scheduler.submit("u1", "second", run("u1-second")),
+        scheduler.submit("u2", "first", run("u2-first")),
+    )
+
+    assert results == ["u1-first", "u1-second", "u2-first"]
+    assert log.index("end u1-first") < log.index("start u1-second")
+    assert log.index("start u2-first") < log.index("end u1-first")
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_repeated_message_joins_the_run_in_flight():
+    now = [0.0]
+    scheduler = TurnScheduler(coalesce_window=5, clock=lambda: now[0])
+    calls = []
+
+    async def run():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"answer": len(calls)}
+
+    first = asyncio.ensure_future(scheduler.submit("u1", "What is Dolo 650?", run))
+    await asyncio.sleep(0)
+    second = await scheduler.submit("u1", "  What is  Dolo 650? ", run)
+
+    assert await first == second == {"answer": 1}
+    assert len(calls) == 1
+
+    # Same text after the turn finished, or from another user, runs again
+    assert await scheduler.submit("u1", "What is Dolo 650?", run) == {"answer": 2}
+    assert await scheduler.submit("u2", "What is Dolo 650?", run) == {"answer": 3}
+
+
+@pytest.mark.asyncio
+async def test_repeat_outside_the_window_queues_as_a_new_turn():
+    now = [0.0]
+    scheduler = TurnScheduler(coalesce_window=5, clock=lambda: now[0])
+    calls = []
+
+    async def run():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+
+    first = asyncio.ensure_future(scheduler.submit("u1", "hi", run))
+    await asyncio.sleep(0)
+    now[0] = 6
+    await asyncio.gather(first, scheduler.submit("u1", "hi", run))
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_full_thread_queue_rejects_new_turns():
+    scheduler = TurnScheduler(queue_size=1)
+    release = asyncio.Event()
+
+    async def run():
+        await release.wait()
+
+    running = [asyncio.ensure_future(scheduler.submit("u1", f"msg {i}", run)) for i in range(2)]
+    await asyncio.sleep(0)
+    assert scheduler.full("u1")
+    with pytest.raises(TurnQueueFull):
+        await scheduler.submit("u1", "msg 2", run)
+    # Repeats of a queued turn still join it
+    repeat = asyncio.ensure_future(scheduler.submit("u1", "msg 1", run))
+    assert not scheduler.full("u2")
+
+    release.set()
+    await asyncio.gather(*running, repeat)
+    assert not scheduler.full("u1")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_run():
+    scheduler = TurnScheduler()
+    finished = []
+
+    async def run():
+        await asyncio.sleep(0.02)
+        finished.append(1)
+        return "done"
+
+    first = asyncio.ensure_future(scheduler.submit("u1", "hi", run))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(scheduler.submit("u1", "hi", run))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+    assert finished == [1]
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_main_leaves_langgraph_and_gemini_to_the_warm_up():
+    code = (
+        "import sys, main\n"
+        "heavy = [m for m in ('agent.graph', 'langgraph', 'langchain_google_genai') if m in sys.modules]\n"
+        "print(heavy)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=SERVICE_DIR, capture_output=True, text=True,
+                            env={**os.environ, "GOOGLE_API_KEY": "x"}, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+@pytest.mark.asyncio
+async def test_requests_wait_for_the_warm_up_and_a_failed_part_is_retried(monkeypatch):
+    from agent import graph as graph_module, warmup as warmup_module
+    warmup = warmup_module.Warmup()
+    calls = []
+
+    def build():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("no API key")
+    monkeypatch.setattr(graph_module, "get_llm_with_tools", build)
+
+    with pytest.raises(RuntimeError):
+        await warmup.graph()
+    await warmup.wait("agent", "clients", "medicine_data")
+    assert not warmup.ready and warmup.errors == {"llm": "no API key"}
+    assert warmup.status() == {"agent": "ready", "llm": "failed", "clients": "ready", "medicine_data": "ready"}
+
+    graphs = await asyncio.gather(warmup.graph(), warmup.graph())
+    assert graphs == [graph_module.graph] * 2
+    assert warmup.ready and warmup.errors == {}
+    assert len(calls) == 2
+
+
+def test_ready_reports_the_part_that_failed(monkeypatch):
+    import main
+    from agent import graph as graph_module, warmup as warmup_module
+    monkeypatch.setattr(main, "warmup", warmup_module.Warmup())
+
+    def build():
+        raise ValueError("GOOGLE_API_KEY is not set")
+    monkeypatch.setattr(graph_module, "get_llm_with_tools", build)
+
+    with TestClient(main.app) as client:
+        with pytest.raises(ValueError):
+            client.portal.call(main.warmup.wait)
+        response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {
+        "status": "failed", "service": "agent-service",
+        "parts": {"agent": "ready", "llm": "failed", "clients": "ready", "medicine_data": "ready"},
+        "errors": {"llm": "GOOGLE_API_KEY is not set"},
+    }
+
+
+def test_ready_flips_once_the_lifespan_warm_up_is_done(monkeypatch):
+    import main
+    from agent import warmup as warmup_module
+    monkeypatch.setattr(warmup_module, "warmup", warmup_module.Warmup())
+    monkeypatch.setattr(main, "warmup", warmup_module.warmup)
+
+    client = TestClient(main.app)
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+    with TestClient(main.app) as client:
+        client.portal.call(main.warmup.wait)
+        assert client.get("/ready").json() == {"status": "ready", "service": "agent-service"}
+        metrics = client.get("/metrics").text
+        assert "\nagent_ready 1\n" in metrics
+        assert 'agent_warmup_seconds{part="llm"}' in metrics
@@ -1,13 +1,137 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for the classic format when reading logs by hand
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+# Fraction of requests whose INFO (and lower) logs are kept; warnings and errors always are.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+# Fields that every LogRecord has; anything else was passed through `extra=`.
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "trace_id"}
+
+_request = contextvars.ContextVar("log_request", default=None)
+
+
+def truncate(text: str, limit: int = None) -> str:
+    limit = LOG_MAX_MESSAGE_CHARS if limit is None else limit
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [truncated {len(text) - limit} characters]"
+
+
+def start_request(trace_id: str, sample_rate: float = None):
+    """Tag the current request's logs with `trace_id` and decide once whether its INFO logs are kept."""
+    sample_rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    _request.set((trace_id, random.random() < sample_rate))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace_id, extras and the traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            # Keep the end of a long traceback, where the exception itself is
+            text, limit = self.formatException(record.exc_info), LOG_MAX_MESSAGE_CHARS * 4
+            if len(text) > limit:
+                text = f"[truncated {len(text) - limit} characters] ...{text[-limit:]}"
+            entry["exception"] = text
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that drops records, counting them, instead of blocking when the queue is full.
+
+    Runs on the logging thread, usually the event loop, so it does as little
+    as possible: sampling, tagging with the trace id and rendering the
+    message text. JSON encoding, tracebacks and the write to stdout happen
+    on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        request = _request.get()
+        if request is not None:
+            trace_id, sampled = request
+            if not sampled and record.levelno <= logging.INFO:
+                self.sampled_out += 1
+                return False
+            record.trace_id = trace_id
+        return super().handle(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message now, while its arguments are still what they
+        # were, but leave exc_info for the listener to format.
+        record = copy.copy(record)
+        record.msg = truncate(record.getMessage())
+        record.args = None
+        record.stack_info = record.stack_info and truncate(record.stack_info)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose `stop()` waits for room for its sentinel rather than failing on a full queue."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def _output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    return handler
+
+
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = BoundedQueueHandler(log_queue)
+listener = DrainingQueueListener(log_queue, _output_handler(), respect_handler_level=True)
+
+# Configure logging: everything goes through the queue, and only the listener thread writes
+root = logging.getLogger()
+root.setLevel(LOG_LEVEL)
+root.addHandler(queue_handler)
+listener.start()
+# Flush what is still queued when the process exits
+atexit.register(listener.stop)
 
 logger = logging.getLogger("agent-service")
@@ -0,0 +1,46 @@
+"""Texts/sec of EmbeddingClient against the stub server by batch size and concurrency.
+
+Batch size 1 with concurrency 1 is the old one-request-per-text path.
+
+    python benchmarks/bench_embedding_client.py --texts 4000
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from embedding_client import EmbeddingClient
+from stub_embedder import StubEmbedder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=4000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--dimension", type=int, default=768)
+    args = parser.parse_args()
+
+    texts = [f"Medicine Name: synthetic {i}\nUses: Treatment of Fever" for i in range(args.texts)]
+
+    with StubEmbedder(dimension=args.dimension) as stub:
+        print(f"{args.texts} texts, dimension {args.dimension}, "
+              f"{stub.request_latency * 1000:.0f} ms/request + {stub.per_text_latency * 1000:.1f} ms/text")
+        print(f"{'batch':>6} {'conc':>5} {'texts/s':>10}")
+        for batch_size in args.batch_sizes:
+            for concurrency in args.concurrency:
+                n = min(args.texts, 400) if batch_size == 1 else args.texts
+                with EmbeddingClient(stub.url, batch_size, concurrency) as client:
+                    start = time.perf_counter()
+                    vectors = client.embed(texts[:n])
+                    elapsed = time.perf_counter() - start
+                assert vectors.shape == (n, args.dimension)
+                print(f"{batch_size:>6} {concurrency:>5} {n / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
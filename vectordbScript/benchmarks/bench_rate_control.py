@@ -0,0 +1,56 @@
+"""Time-to-ingest with the adaptive rate controller versus the fixed sleep.
+
+Runs `upsert_frame` against a QuotaIndex on a virtual clock, so a full
+250k-row ingest is simulated in seconds of wall time.
+
+    python benchmarks/bench_rate_control.py --rows 250000 --quota 10
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import pandas as pd
+
+import script
+from fake_index import QuotaIndex, VirtualClock
+from rate_control import make_controller
+
+
+def run(kind, df, quota, latency):
+    clock = VirtualClock()
+    index = QuotaIndex(clock, quota=quota, latency=latency)
+    controller = make_controller(kind, interval=script.SLEEP_INTERVAL, clock=clock, sleep=clock.sleep)
+
+    start = time.perf_counter()
+    script.upsert_frame(index, df, controller=controller)
+    wall = time.perf_counter() - start
+
+    assert len(index.records) == len(df)
+    return clock.now, index.throttled, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=250000)
+    parser.add_argument("--quota", type=int, default=10, help="Upserts per second the fake index accepts")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per accepted upsert")
+    args = parser.parse_args()
+
+    ids = [str(i) for i in range(args.rows)]
+    df = pd.DataFrame({"id": ids, "name": ids, "embedding_text": ids})
+    batches = -(-args.rows // script.BATCH_SIZE)
+    print(f"{args.rows} rows, {batches} batches, quota {args.quota}/s, latency {args.latency}s")
+
+    for kind in ("fixed", "adaptive"):
+        simulated, throttled, wall = run(kind, df, args.quota, args.latency)
+        print(f"{kind:<9} time-to-ingest {simulated / 60:8.1f} min  "
+              f"({batches / simulated:5.2f} batches/s, {throttled} throttled, {wall:.1f}s wall)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Memory footprint and load time: CSV + normalize/dedup versus the Parquet snapshot.
+
+    python benchmarks/bench_snapshot.py --rows 250000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import script
+import synthetic
+
+
+def mb(df):
+    return df.memory_usage(deep=True).sum() / (1 << 20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=250000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = synthetic.write_csv(os.path.join(tmp, "medicine_dataset.csv"), args.rows)
+        snapshot = os.path.join(tmp, "medicine_dataset.parquet")
+
+        start = time.perf_counter()
+        df = script.load_and_prepare(csv_path)
+        csv_seconds = time.perf_counter() - start
+
+        script.write_snapshot(df, snapshot)
+
+        start = time.perf_counter()
+        loaded = script.load_and_prepare(snapshot)
+        snapshot_seconds = time.perf_counter() - start
+
+        same = script.build_texts(loaded).tolist() == script.build_texts(df).tolist()
+        categorical = sum(str(dtype) == "category" for dtype in loaded.dtypes)
+
+        print(f"{len(df)} records, {len(df.columns)} columns ({categorical} categorical in snapshot)")
+        print(f"csv:      load {csv_seconds:7.2f}s  memory {mb(df):8.1f} MB  file {os.path.getsize(csv_path) / (1 << 20):6.1f} MB")
+        print(f"snapshot: load {snapshot_seconds:7.2f}s  memory {mb(loaded):8.1f} MB  file {os.path.getsize(snapshot) / (1 << 20):6.1f} MB")
+        print(f"embedding_text identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
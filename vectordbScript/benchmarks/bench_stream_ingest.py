@@ -0,0 +1,107 @@
+"""Peak memory / throughput of the whole-frame ingest, --stream and --workers modes.
+
+Each (mode, size) case runs in a fresh interpreter so peak RSS is not
+polluted by earlier cases. Upserts go to a no-op index with the sleep
+disabled, so the numbers cover load + dedup + text building only.
+
+    python benchmarks/bench_stream_ingest.py --rows 20000 80000 --workers 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+
+class NullIndex:
+    def __init__(self):
+        self.records = 0
+
+    def upsert_records(self, namespace, records):
+        self.records += len(records)
+
+
+class _NoProgress:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, n):
+        pass
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(mode, csv_path):
+    import script
+
+    script.SLEEP_INTERVAL = 0
+    script.RATE_CONTROL = "fixed"
+    script.tqdm = lambda *a, **kw: _NoProgress()
+    index = NullIndex()
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "stream":
+        script.ingest_stream(index, csv_path)
+    elif mode.startswith("workers="):
+        frames = script.iter_normalized_chunks(csv_path)
+        script.ingest_parallel(index, frames, int(mode.split("=")[1]))
+    else:
+        script.ingest(index, csv_path)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "records": index.records,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(index.records / elapsed, 1),
+        "peak_rss_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 80000])
+    parser.add_argument("--workers", type=int, nargs="*", default=[],
+                        help="Also run --stream --workers N for each N")
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_case(*args.run)))
+        return
+
+    import synthetic
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            csv_path = synthetic.write_csv(os.path.join(tmp, f"medicine_{rows}.csv"), rows)
+            for mode in ["frame", "stream"] + [f"workers={n}" for n in args.workers]:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--run", mode, csv_path],
+                    check=True, capture_output=True, text=True
+                )
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                result["rows"] = rows
+                results.append(result)
+                print(f"{rows:>8} rows  {mode:<10}  {result['seconds']:>8.2f}s  "
+                      f"{result['rows_per_sec']:>9.0f} rows/s  peak +{result['peak_rss_mb']:.1f} MB")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
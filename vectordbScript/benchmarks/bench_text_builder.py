@@ -0,0 +1,43 @@
+"""Time `df.apply(create_text, axis=1)` against the column-wise `build_texts`.
+
+    python benchmarks/bench_text_builder.py --rows 250000
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import script
+import synthetic
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=250000)
+    args = parser.parse_args()
+
+    df = synthetic.make_frame(args.rows)
+    print(f"{len(df)} rows x {len(df.columns)} columns")
+
+    expected, row_wise = timed(lambda: df.apply(script.create_text, axis=1))
+    actual, column_wise = timed(script.build_texts, df)
+
+    assert actual.tolist() == expected.tolist(), "build_texts output differs from create_text"
+
+    print(f"apply(create_text): {row_wise:8.2f}s  {len(df) / row_wise:>10.0f} rows/s")
+    print(f"build_texts:        {column_wise:8.2f}s  {len(df) / column_wise:>10.0f} rows/s")
+    print(f"speedup:            {row_wise / column_wise:8.1f}x (outputs identical)")
+
+
+if __name__ == "__main__":
+    main()
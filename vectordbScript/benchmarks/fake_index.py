@@ -0,0 +1,63 @@
+from collections import deque
+
+
+class VirtualClock:
+    """Shared fake time source so quota tests run without real sleeping."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+class ThrottledError(Exception):
+    def __init__(self, status, message="Too Many Requests"):
+        super().__init__(f"({status}) {message}")
+        self.status = status
+
+
+class QuotaIndex:
+    """Pinecone-like index that allows `quota` requests per `window` seconds.
+
+    Requests over the quota fail with a 429. Each accepted request takes
+    `latency` seconds, and latency doubles while the index is above
+    `slow_fraction` of its quota, the way a loaded service degrades
+    before it starts rejecting.
+    """
+
+    def __init__(self, clock, quota=10, window=1.0, latency=0.05, slow_fraction=0.8):
+        self.clock = clock
+        self.quota = quota
+        self.window = window
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.accepted = deque()
+        self.records = {}
+        self.throttled = 0
+
+    def _admit(self):
+        now = self.clock()
+        while self.accepted and self.accepted[0] <= now - self.window:
+            self.accepted.popleft()
+        if len(self.accepted) >= self.quota:
+            self.throttled += 1
+            raise ThrottledError(429)
+        self.accepted.append(now)
+        latency = self.latency
+        if len(self.accepted) > self.quota * self.slow_fraction:
+            latency *= 2
+        self.clock.sleep(latency)
+
+    def upsert_records(self, namespace, records):
+        self._admit()
+        for record in records:
+            self.records[record["id"]] = record
+
+    def upsert(self, vectors, namespace):
+        self._admit()
+        for vector in vectors:
+            self.records[vector["id"]] = vector
@@ -0,0 +1,97 @@
+"""Local stand-in for the `/predict` embedding server.
+
+Each request costs `request_latency` seconds (handshake, framework and
+model dispatch overhead) plus `per_text_latency` per text in the batch.
+Vectors are derived from a hash of the text, so they are stable across
+calls. Accepts both `{"text": ...}` and `{"texts": [...]}` bodies.
+
+    python benchmarks/stub_embedder.py --port 8000
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def fake_vector(text, dimension):
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+
+class StubEmbedder:
+    def __init__(self, port=0, dimension=8, request_latency=0.01, per_text_latency=0.0005,
+                 fail_on=None):
+        self.dimension = dimension
+        self.request_latency = request_latency
+        self.per_text_latency = per_text_latency
+        self.fail_on = fail_on
+        self.requests = 0
+        self.connections = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                stub.requests += 1
+                stub.connections.add(self.client_address)
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                texts = body["texts"] if "texts" in body else [body["text"]]
+                time.sleep(stub.request_latency + stub.per_text_latency * len(texts))
+
+                if stub.fail_on and any(stub.fail_on in text for text in texts):
+                    self._send(500, {"error": "model failure"})
+                elif "texts" in body:
+                    self._send(200, {"embeddings": [fake_vector(t, stub.dimension) for t in texts]})
+                else:
+                    self._send(200, {"embedding": fake_vector(texts[0], stub.dimension)})
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/predict"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--dimension", type=int, default=768)
+    args = parser.parse_args()
+
+    stub = StubEmbedder(args.port, args.dimension)
+    print(f"Serving fake embeddings on {stub.url}")
+    stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
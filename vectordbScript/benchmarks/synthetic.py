@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+# Vocabularies shaped like the Kaggle 250k medicines dataset. Values never
+# contain commas or quotes because the CSV is read with QUOTE_NONE.
+NAMES = ["Augmentin", "Azithral", "Ascoril", "Allegra", "Avil", "Dolo", "Crocin", "Pan", "Zifi", "Montair"]
+STRENGTHS = ["25mg", "50mg", "100mg", "250mg", "500mg", "625 Duo", "650", "LS Syrup", "D Tablet"]
+INGREDIENTS = ["Amoxycillin (500mg)", "Clavulanic Acid (125mg)", "Azithromycin (500mg)", "Paracetamol (650mg)",
+               "Pantoprazole (40mg)", "Cefixime (200mg)", "Montelukast (10mg)", "Levocetirizine (5mg)"]
+USES = ["Treatment of Bacterial infections", "Treatment of Fever", "Pain relief", "Treatment of Allergic conditions",
+        "Treatment of Gastroesophageal reflux disease", "Treatment of Cough with mucus"]
+SIDE_EFFECTS = ["Vomiting", "Nausea", "Diarrhea", "Headache", "Dizziness", "Sleepiness", "Rash", "Abdominal pain",
+                "Dryness in mouth", "Allergic reaction", "Flatulence", "Constipation"]
+MANUFACTURERS = ["Cipla Ltd", "Sun Pharmaceutical Industries Ltd", "Alkem Laboratories Ltd", "Micro Labs Ltd",
+                 "Glenmark Pharmaceuticals Ltd", "Mankind Pharma Ltd"]
+TYPES = ["allopathy", "ayurveda", "homeopathy"]
+CHEMICAL_CLASSES = ["Penicillins", "Macrolides", "Anilides", "Benzimidazole Derivative", "Cephalosporins"]
+THERAPEUTIC_CLASSES = ["ANTI INFECTIVES", "PAIN ANALGESICS", "RESPIRATORY", "GASTRO INTESTINAL"]
+ACTION_CLASSES = ["Penicillins", "Macrolides", "Analgesic", "Proton Pump Inhibitor", "Leukotriene antagonist"]
+HABIT_FORMING = ["No", "Yes"]
+
+N_SUBSTITUTES = 5
+N_SIDE_EFFECTS = 42
+N_USES = 5
+
+
+def _pick(rng, values, n, missing=0.0):
+    column = pd.Series(np.asarray(values, dtype=object)[rng.integers(0, len(values), n)])
+    if missing:
+        column[rng.random(n) < missing] = np.nan
+    return column
+
+
+def make_frame(n_rows, seed=0, duplicate_ratio=0.05):
+    """Build a synthetic frame with the dataset's columns and realistic sparsity.
+
+    Roughly `duplicate_ratio` of the rows repeat an earlier id (with different
+    casing/whitespace) so dedup has something to do.
+    """
+    rng = np.random.default_rng(seed)
+
+    ids = pd.Series(np.arange(1, n_rows + 1)).astype(str)
+    dup = rng.random(n_rows) < duplicate_ratio
+    dup[0] = False
+    positions = np.flatnonzero(dup)
+    ids[positions] = " " + ids[(positions * rng.random(len(positions))).astype(int)] + " "
+
+    names = _pick(rng, NAMES, n_rows) + " " + _pick(rng, STRENGTHS, n_rows)
+
+    columns = {
+        "id": ids,
+        "name": names.str.upper().where(rng.random(n_rows) < 0.5, names),
+    }
+    for i in range(N_SUBSTITUTES):
+        columns[f"substitute{i}"] = _pick(rng, NAMES, n_rows, missing=0.2 + 0.15 * i)
+    for i in range(N_SIDE_EFFECTS):
+        columns[f"sideEffect{i}"] = _pick(rng, SIDE_EFFECTS, n_rows, missing=min(0.1 + 0.08 * i, 0.97))
+    for i in range(N_USES):
+        columns[f"use{i}"] = _pick(rng, USES, n_rows, missing=0.3 * i)
+
+    columns.update({
+        "Chemical Class": _pick(rng, CHEMICAL_CLASSES, n_rows, missing=0.4),
+        "Habit Forming": _pick(rng, HABIT_FORMING, n_rows),
+        "Therapeutic Class": _pick(rng, THERAPEUTIC_CLASSES, n_rows),
+        "Action Class": _pick(rng, ACTION_CLASSES, n_rows, missing=0.3),
+        "price(₹)": pd.Series(rng.integers(10, 900, n_rows)).astype(str).where(rng.random(n_rows) > 0.1),
+        "type": _pick(rng, TYPES, n_rows),
+        "pack_size_label": "strip of " + pd.Series(rng.integers(1, 30, n_rows)).astype(str) + " tablets",
+        "manufacturer_name": _pick(rng, MANUFACTURERS, n_rows),
+        "short_composition1": _pick(rng, INGREDIENTS, n_rows),
+        "short_composition2": _pick(rng, INGREDIENTS, n_rows, missing=0.6),
+    })
+
+    return pd.DataFrame(columns)
+
+
+def write_csv(path, n_rows, seed=0):
+    make_frame(n_rows, seed).to_csv(path, index=False, encoding="latin1", errors="replace")
+    return path
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import sqlite3
+
+import numpy as np
+
+
+KEY_BYTES = 16
+
+
+def cache_key(model, dimension, text):
+    data = f"{model}\0{dimension}\0{text}".encode("utf-8")
+    return hashlib.blake2b(data, digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache backed by a memory-mapped float32 file.
+
+    Vectors for one (model, dimension) live in `vectors.f32`, a fixed-size
+    array of `capacity` slots that is mapped rather than loaded, so the cache
+    can be much larger than RAM. `index.sqlite` maps each key to its slot
+    and a last-used tick. When the cache is full, the least recently used
+    `evict_fraction` of slots are recycled.
+
+    Writers are serialized by the SQLite write lock, so several ingestion
+    processes can share one cache. Each slot also stores its key in
+    `keys.u8`, and lookups check it after copying the vector, so a slot
+    recycled mid-read counts as a miss rather than returning the wrong
+    vector.
+    """
+
+    def __init__(self, root, model, dimension, max_bytes=2 << 30, evict_fraction=0.1):
+        self.model = model
+        self.dimension = dimension
+        self.capacity = max(1, max_bytes // (dimension * 4 + KEY_BYTES))
+        self.evict_count = max(1, int(self.capacity * evict_fraction))
+
+        self.path = os.path.join(root, f"{model}-{dimension}")
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors = self._map("vectors.f32", np.float32, (self.capacity, dimension))
+        self.keys = self._map("keys.u8", np.uint8, (self.capacity, KEY_BYTES))
+
+        self.conn = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY,
+                slot INTEGER NOT NULL UNIQUE,
+                last_used INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS free (slot INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta VALUES ('tick', 0), ('next_slot', 0);
+        """)
+        self.hits = 0
+        self.misses = 0
+
+    def _map(self, name, dtype, shape):
+        path = os.path.join(self.path, name)
+        mode = "r+" if os.path.exists(path) else "w+"
+        array = np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+        if array.shape != shape:
+            raise ValueError(f"{path} does not match capacity {shape[0]}; use a new cache directory")
+        return array
+
+    def close(self):
+        self.vectors.flush()
+        self.keys.flush()
+        self.conn.close()
+
+    def __len__(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return count
+
+    def _meta(self, name):
+        (value,) = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return value
+
+    def _tick(self):
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'tick'")
+        return self._meta("tick")
+
+    def get(self, text):
+        """Zero-copy view of the cached vector for `text`, or None.
+
+        The view stays valid until the slot is evicted; copy it if it has
+        to outlive further writes to the cache. Unlike `lookup()`, this does
+        not refresh the entry's LRU position.
+        """
+        key = cache_key(self.model, self.dimension, text)
+        row = self.conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.vectors[row[0]]
+
+    def lookup(self, texts):
+        """Return (vectors, found) for `texts`; rows where `found` is False are zero."""
+        keys = [cache_key(self.model, self.dimension, text) for text in texts]
+        slots = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            slots.update(self.conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", chunk
+            ))
+
+        found = np.array([key in slots for key in keys], dtype=bool)
+        out = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        positions = np.flatnonzero(found)
+        if len(positions):
+            hit_slots = np.array([slots[keys[i]] for i in positions])
+            out[positions] = self.vectors[hit_slots]
+            expected = np.frombuffer(b"".join(keys[i] for i in positions), dtype=np.uint8).reshape(-1, KEY_BYTES)
+            intact = (self.keys[hit_slots] == expected).all(axis=1)
+            found[positions[~intact]] = False
+            out[positions[~intact]] = 0
+
+            with self.conn:
+                tick = self._tick()
+                self.conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE slot = ?",
+                    ((tick, int(slot)) for slot in hit_slots[intact])
+                )
+
+        self.hits += int(found.sum())
+        self.misses += len(texts) - int(found.sum())
+        return out, found
+
+    def _allocate(self, n):
+        """Take `n` slots: freed ones first, then never-used ones, then LRU victims."""
+        slots = [slot for (slot,) in self.conn.execute("SELECT slot FROM free LIMIT ?", (n,))]
+        self.conn.executemany("DELETE FROM free WHERE slot = ?", ((slot,) for slot in slots))
+
+        next_slot = self._meta("next_slot")
+        take = min(self.capacity - next_slot, n - len(slots))
+        if take > 0:
+            slots.extend(range(next_slot, next_slot + take))
+            self.conn.execute("UPDATE meta SET value = ? WHERE name = 'next_slot'", (next_slot + take,))
+
+        if len(slots) < n:
+            victims = [slot for (slot,) in self.conn.execute(
+                "SELECT slot FROM entries ORDER BY last_used LIMIT ?",
+                (max(self.evict_count, n - len(slots)),)
+            )]
+            self.conn.executemany("DELETE FROM entries WHERE slot = ?", ((slot,) for slot in victims))
+            self.keys[victims] = 0
+            needed = n - len(slots)
+            slots.extend(victims[:needed])
+            self.conn.executemany("INSERT INTO free (slot) VALUES (?)", ((slot,) for slot in victims[needed:]))
+
+        return slots
+
+    def put(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got shape {vectors.shape}")
+
+        # Last write wins for repeated texts, and only the newest `capacity` fit.
+        unique = {}
+        for text, vector in zip(texts, vectors):
+            unique[cache_key(self.model, self.dimension, text)] = vector
+        items = list(unique.items())[-self.capacity:]
+        if not items:
+            return
+
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            keys = [key for key, _ in items]
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                replaced = self.conn.execute(
+                    f"DELETE FROM entries WHERE key IN ({placeholders}) RETURNING slot", chunk
+                ).fetchall()
+                self.conn.executemany("INSERT INTO free (slot) VALUES (?)", replaced)
+            slots = self._allocate(len(items))
+            tick = self._tick()
+
+            self.keys[slots] = 0
+            self.vectors[slots] = np.stack([vector for _, vector in items])
+            self.keys[slots] = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, KEY_BYTES)
+            self.conn.executemany(
+                "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                ((key, int(slot), tick) for key, slot in zip(keys, slots))
+            )
+
+    def get_or_embed(self, texts, embed):
+        """Embed only the texts missing from the cache and return vectors for all of them."""
+        texts = list(texts)
+        vectors, found = self.lookup(texts)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            fresh = embed([texts[i] for i in missing])
+            vectors[missing] = fresh
+            self.put([texts[i] for i in missing], fresh)
+        return vectors
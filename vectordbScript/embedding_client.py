@@ -0,0 +1,81 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class EmbeddingError(Exception):
+    pass
+
+
+class EmbeddingClient:
+    """Batched client for the local `/predict` embedding endpoint.
+
+    Texts are sent `batch_size` at a time as `{"texts": [...]}`, and the
+    endpoint answers with `{"embeddings": [[...], ...]}`. With `batch_size=1`
+    the original `{"text": ...}` / `{"embedding": [...]}` shape is used, for
+    servers that only understand single texts. Up to `concurrency` batches
+    are in flight at once, over a keep-alive connection pool of the same size.
+    """
+
+    def __init__(self, url, batch_size=32, concurrency=4, timeout=60):
+        self.url = url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _post(self, texts):
+        if self.batch_size == 1:
+            payload, key = {"text": texts[0]}, "embedding"
+        else:
+            payload, key = {"texts": texts}, "embeddings"
+
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        vectors = response.json().get(key)
+        if not vectors:
+            raise EmbeddingError(f"No {key} found in the response")
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.batch_size == 1:
+            vectors = vectors.reshape(1, -1)
+        if len(vectors) != len(texts):
+            raise EmbeddingError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+        return vectors
+
+    def embed(self, texts):
+        """Embed `texts` and return a contiguous (len(texts), dim) float32 array."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        try:
+            results = list(self.executor.map(self._post, batches))
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Embedding request failed: {e}")
+            raise EmbeddingError(str(e)) from e
+
+        out = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for i, vectors in enumerate(results):
+            out[i * self.batch_size:i * self.batch_size + len(vectors)] = vectors
+        return out
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _kmeans(data, k, iterations=10, seed=0):
+    """Spherical k-means (cosine) on unit vectors; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        empty = ~sums.any(axis=1)
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class _Namespace:
+    """Vectors of one namespace: a growable unit-vector matrix plus tombstones."""
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.ids = []
+        self.metadata = []
+        self.rows = {}
+        self.live = np.zeros(0, dtype=bool)
+        self.count = 0
+        self.centroids = None
+        self.assign = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _reserve(self, n):
+        needed = self.count + n
+        if needed <= len(self.vectors) and self.vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self.vectors), 1024)
+        vectors = np.empty((capacity, self.dimension), dtype=np.float32)
+        vectors[:self.count] = self.vectors[:self.count]
+        live = np.zeros(capacity, dtype=bool)
+        live[:self.count] = self.live[:self.count]
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[:self.count] = self.assign[:self.count]
+        self.vectors, self.live, self.assign = vectors, live, assign
+
+    def upsert(self, ids, vectors, metadata):
+        vectors = _normalize(vectors)
+        self._reserve(len(ids))
+
+        rows = []
+        for doc_id, meta in zip(ids, metadata):
+            row = self.rows.get(doc_id)
+            if row is None:
+                row = self.count
+                self.count += 1
+                self.rows[doc_id] = row
+                self.ids.append(doc_id)
+                self.metadata.append(meta)
+            else:
+                self.metadata[row] = meta
+            rows.append(row)
+
+        rows = np.asarray(rows)
+        self.vectors[rows] = vectors
+        self.live[rows] = True
+        if self.centroids is not None:
+            self.assign[rows] = np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            row = self.rows.pop(doc_id, None)
+            if row is not None:
+                self.live[row] = False
+                self.metadata[row] = None
+
+    def train(self, nlist):
+        data = self.vectors[:self.count][self.live[:self.count]]
+        sample = data
+        if len(data) > nlist * 64:
+            sample = data[np.random.default_rng(0).choice(len(data), nlist * 64, replace=False)]
+        self.centroids = _kmeans(sample, min(nlist, len(sample)))
+        for start in range(0, self.count, 65536):
+            block = self.vectors[start:min(self.count, start + 65536)]
+            self.assign[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        self.trained_size = len(self)
+
+    def search(self, query, top_k, nprobe=None):
+        if nprobe is None or self.centroids is None:
+            candidates = np.flatnonzero(self.live[:self.count])
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            candidates = np.flatnonzero(np.isin(self.assign[:self.count], probe) & self.live[:self.count])
+
+        if len(candidates) == 0:
+            return []
+        scores = self.vectors[candidates] @ query
+        k = min(top_k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(candidates[i], float(scores[i])) for i in best]
+
+
+class LocalIndex:
+    """Offline stand-in for a Pinecone index with the same call shapes.
+
+    Supports `upsert`, `upsert_records` (via `embed`, which maps a list of
+    texts to vectors), `delete`, `query` and `describe_index_stats`, per
+    namespace, with cosine similarity. `mode="exact"` scores every vector;
+    `mode="ivf"` clusters each namespace into `nlist` lists with k-means and
+    scores only the `nprobe` lists closest to the query. The default
+    `"auto"` switches to IVF once a namespace holds `ivf_min_size` vectors,
+    and retrains when it has doubled since the last training.
+
+    With a `path`, `save()` writes one `.npy`/`.json` pair per namespace
+    and `open()` memory-maps the vectors back, so loading is instant.
+    """
+
+    def __init__(self, path=None, mode="auto", nlist=None, nprobe=16, ivf_min_size=20000, embed=None):
+        if mode not in ("auto", "exact", "ivf"):
+            raise ValueError(f"Unknown index mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_min_size = ivf_min_size
+        self.embed = embed
+        self.namespaces = {}
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        index = cls(path, **kwargs)
+        if not os.path.isdir(path):
+            return index
+
+        for name in os.listdir(path):
+            if not name.endswith(".json"):
+                continue
+            stem = name[:-len(".json")]
+            with open(os.path.join(path, name), encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(os.path.join(path, f"{stem}.npy"), mmap_mode="r")
+
+            ns = _Namespace(vectors.shape[1])
+            ns.vectors = vectors
+            ns.count = len(vectors)
+            ns.ids = meta["ids"]
+            ns.metadata = meta["metadata"]
+            ns.rows = {doc_id: row for row, doc_id in enumerate(ns.ids)}
+            ns.live = np.ones(ns.count, dtype=bool)
+            ns.assign = np.zeros(ns.count, dtype=np.int32)
+            centroids = os.path.join(path, f"{stem}.centroids.npy")
+            if os.path.exists(centroids):
+                ns.centroids = np.load(centroids)
+                ns.assign = np.asarray(meta["assign"], dtype=np.int32)
+                ns.trained_size = ns.count
+            index.namespaces[meta["namespace"]] = ns
+        return index
+
+    def save(self):
+        """Write each namespace atomically (temp file + rename) under `path`."""
+        if self.path is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+
+        for namespace, ns in self.namespaces.items():
+            stem = os.path.join(self.path, hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:16])
+            live = np.flatnonzero(ns.live[:ns.count])
+            meta = {
+                "namespace": namespace,
+                "ids": [ns.ids[row] for row in live],
+                "metadata": [ns.metadata[row] for row in live],
+            }
+            if ns.centroids is not None:
+                np.save(f"{stem}.centroids.npy", ns.centroids)
+                meta["assign"] = ns.assign[live].tolist()
+
+            with open(f"{stem}.npy.tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(ns.vectors[live]))
+            with open(f"{stem}.json.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(f"{stem}.npy.tmp", f"{stem}.npy")
+            os.replace(f"{stem}.json.tmp", f"{stem}.json")
+
+    def _namespace(self, namespace, dimension=None):
+        ns = self.namespaces.get(namespace)
+        if ns is None and dimension is not None:
+            ns = self.namespaces[namespace] = _Namespace(dimension)
+        return ns
+
+    def upsert(self, vectors, namespace=""):
+        if not vectors:
+            return {"upserted_count": 0}
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        ns = self._namespace(namespace, values.shape[1])
+        if values.shape[1] != ns.dimension:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match namespace dimension {ns.dimension}")
+        ns.upsert([v["id"] for v in vectors], values, [v.get("metadata") or {} for v in vectors])
+        return {"upserted_count": len(vectors)}
+
+    def upsert_records(self, namespace, records):
+        """Pinecone integrated-embedding shape: each record's `text` is embedded with `embed`."""
+        if self.embed is None:
+            raise ValueError("upsert_records needs an embed function for a local index")
+        values = self.embed([record["text"] for record in records])
+        return self.upsert([
+            {"id": record["id"], "values": vector, "metadata": {k: v for k, v in record.items() if k != "id"}}
+            for record, vector in zip(records, values)
+        ], namespace)
+
+    def delete(self, ids, namespace=""):
+        ns = self._namespace(namespace)
+        if ns is not None:
+            ns.delete(ids)
+        return {}
+
+    def _nprobe(self, ns):
+        if self.mode == "exact" or (self.mode == "auto" and len(ns) < self.ivf_min_size):
+            return None
+        if ns.centroids is None or len(ns) > 2 * ns.trained_size:
+            ns.train(self.nlist or max(1, int(4 * np.sqrt(len(ns)))))
+        return self.nprobe
+
+    def query(self, vector=None, top_k=10, namespace="", include_metadata=True, text=None, **kwargs):
+        """Top-k cosine matches for `vector` (or for `text`, embedded with `embed`)."""
+        ns = self._namespace(namespace)
+        if ns is None or len(ns) == 0:
+            return {"matches": [], "namespace": namespace}
+        if vector is None:
+            if text is None or self.embed is None:
+                raise ValueError("query needs a vector, or text and an embed function")
+            vector = self.embed([text])[0]
+
+        query = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        matches = []
+        for row, score in ns.search(query, top_k, self._nprobe(ns)):
+            match = {"id": ns.ids[row], "score": score}
+            if include_metadata:
+                match["metadata"] = ns.metadata[row]
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def describe_index_stats(self):
+        namespaces = {name: {"vector_count": len(ns)} for name, ns in self.namespaces.items()}
+        return {
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+        }
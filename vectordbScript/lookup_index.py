@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import zlib
+
+import numpy as np
+
+
+# On-disk layout, read by the agent-service without NumPy via mmap. All
+# integers are little-endian; entry i of every table is the i-th name in
+# sorted (UTF-8 byte) order.
+#
+#   meta.json       {"format", "version", "count", "trigrams"}
+#   names.bin       concatenated UTF-8 names       names.off    uint64[count + 1]
+#   records.bin     concatenated UTF-8 JSON        records.off  uint64[count + 1]
+#   trigrams.keys   sorted uint32 trigram hashes   trigrams.off uint64[trigrams + 1]
+#   trigrams.post   uint32 name ids, ascending within each trigram
+FORMAT = "aushadx-medicine-lookup"
+VERSION = 1
+
+
+def normalize_name(name):
+    return " ".join(str(name).lower().split())
+
+
+def trigram_keys(name):
+    """CRC32 of each distinct trigram of the name padded as "  name "."""
+    padded = f"  {name} "
+    return {zlib.crc32(padded[i:i + 3].encode("utf-8")) for i in range(len(padded) - 2)}
+
+
+def write_blob(path, stem, items):
+    offsets = np.zeros(len(items) + 1, dtype="<u8")
+    with open(os.path.join(path, f"{stem}.bin"), "wb") as f:
+        for i, item in enumerate(items):
+            f.write(item)
+            offsets[i + 1] = offsets[i] + len(item)
+    offsets.tofile(os.path.join(path, f"{stem}.off"))
+
+
+def write_lookup_index(path, records):
+    """Write `records` (dicts with a "name") as a lookup index directory at `path`.
+
+    Names are normalized (lowercase, single spaces) and the first record of
+    each name wins. The index is built next to `path` and swapped in, so
+    readers never see a half-written one.
+    """
+    by_name = {}
+    for record in records:
+        name = normalize_name(record.get("name") or "")
+        if name and name not in by_name:
+            by_name[name] = {**record, "name": name}
+
+    encoded = sorted((name.encode("utf-8"), record) for name, record in by_name.items())
+    names = [name for name, _ in encoded]
+
+    keys, ids = [], []
+    for i, name in enumerate(names):
+        grams = trigram_keys(name.decode("utf-8"))
+        keys.extend(grams)
+        ids.extend([i] * len(grams))
+    keys = np.asarray(keys, dtype="<u4")
+    ids = np.asarray(ids, dtype="<u4")
+    order = np.lexsort((ids, keys))
+    keys, ids = keys[order], ids[order]
+    unique_keys, starts = np.unique(keys, return_index=True)
+    key_offsets = np.append(starts, len(keys)).astype("<u8")
+
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    write_blob(tmp, "names", names)
+    write_blob(tmp, "records", [json.dumps(record, ensure_ascii=False).encode("utf-8") for _, record in encoded])
+    unique_keys.astype("<u4").tofile(os.path.join(tmp, "trigrams.keys"))
+    key_offsets.tofile(os.path.join(tmp, "trigrams.off"))
+    ids.tofile(os.path.join(tmp, "trigrams.post"))
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT, "version": VERSION, "count": len(names), "trigrams": len(unique_keys)}, f)
+
+    replace_dir(tmp, path)
+    return len(names)
+
+
+def replace_dir(tmp, path):
+    """Move the finished directory `tmp` to `path`, replacing any earlier one."""
+    if os.path.exists(path):
+        old = f"{path}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, path)
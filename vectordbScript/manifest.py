@@ -0,0 +1,99 @@
+import hashlib
+import sqlite3
+
+import numpy as np
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def changed(ids, hashes, known):
+    """Mask of the records whose hash differs from the one in `known`, or that are not in it."""
+    return np.array([known.get(doc_id) != h for doc_id, h in zip(ids, hashes)], dtype=bool)
+
+
+class Manifest:
+    """SQLite record of what has been upserted into each namespace.
+
+    Every record is stored with a hash of its `embedding_text`, and a batch's
+    rows are written once the batch has been upserted. A re-run therefore
+    only upserts new or changed records, and a crashed run resumes by
+    skipping every record an earlier run committed.
+    """
+
+    def __init__(self, path, namespace):
+        self.path = path
+        self.namespace = namespace
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS records (
+                namespace TEXT NOT NULL,
+                id TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                PRIMARY KEY (namespace, id)
+            ) WITHOUT ROWID;
+            DROP TABLE IF EXISTS batches;
+            CREATE TEMP TABLE seen (id TEXT PRIMARY KEY) WITHOUT ROWID;
+        """)
+
+    def __len__(self):
+        (count,) = self.conn.execute(
+            "SELECT COUNT(*) FROM records WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return count
+
+    def close(self):
+        self.conn.close()
+
+    def see(self, ids):
+        """Remember `ids` as present in the source, for `missing_ids()`."""
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO seen (id) VALUES (?)", ((i,) for i in ids))
+
+    def known(self, ids):
+        """{id: text hash} of the records among `ids` that have been upserted."""
+        known = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            known.update(self.conn.execute(
+                f"SELECT id, text_hash FROM records WHERE namespace = ? AND id IN ({placeholders})",
+                [self.namespace, *chunk]
+            ))
+        return known
+
+    def pending(self, df):
+        """Mask of rows in `df` that are new or whose text changed, and their text hashes.
+
+        All ids in `df` are also remembered as present in the source, for
+        `missing_ids()`.
+        """
+        ids = df["id"].tolist()
+        hashes = [text_hash(text) for text in df["embedding_text"].tolist()]
+        self.see(ids)
+        return changed(ids, hashes, self.known(ids)), hashes
+
+    def commit(self, ids, hashes):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO records (namespace, id, text_hash) VALUES (?, ?, ?)",
+                ((self.namespace, doc_id, h) for doc_id, h in zip(ids, hashes))
+            )
+
+    def missing_ids(self):
+        """Ids in the manifest that `pending()` has not seen during this run."""
+        rows = self.conn.execute(
+            "SELECT id FROM records WHERE namespace = ? AND id NOT IN (SELECT id FROM seen)",
+            (self.namespace,)
+        )
+        return [doc_id for (doc_id,) in rows]
+
+    def forget(self, ids):
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM records WHERE namespace = ? AND id = ?",
+                ((self.namespace, doc_id) for doc_id in ids)
+            )
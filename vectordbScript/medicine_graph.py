@@ -0,0 +1,149 @@
+import functools
+import json
+import math
+import os
+import re
+import shutil
+
+import numpy as np
+
+from lookup_index import normalize_name, replace_dir, write_blob
+
+
+# On-disk layout, read by the agent-service without NumPy via mmap. All
+# integers are little-endian. Each vocabulary is a sorted (UTF-8 byte) blob
+# of normalized strings, and its ids are positions in that order:
+#
+#   meta.json                    {"format", "version", "medicines", "ingredients", "classes", "compositions"}
+#   medicines.bin/.off           medicine names
+#   ingredients.bin/.off         ingredient names without strength ("paracetamol")
+#   classes.bin/.off             therapeutic and action class names
+#   compositions.bin/.off        full compositions ("amoxycillin (500mg) + clavulanic acid (125mg)")
+#   medicine_prices.f4           float32[medicines], NaN when unknown
+#   medicine_classes.u4          uint32[medicines * 2]: therapeutic, action class id (NONE if missing)
+#   medicine_composition.u4      uint32[medicines]: composition id (NONE if missing)
+#
+# and adjacency lists, each an offset table `{stem}.off` (uint64[rows + 1])
+# into a flat uint32 id table `{stem}.ids`:
+#
+#   medicine_ingredients         medicine -> ingredients
+#   ingredient_medicines         ingredient -> medicines
+#   class_medicines              class -> medicines of that therapeutic or action class
+#   composition_medicines        composition -> medicines, cheapest first
+#   medicine_substitutes         medicine -> listed substitutes found in the dataset, cheapest first
+FORMAT = "aushadx-medicine-graph"
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+
+# Compositions repeat across thousands of brands, so parse each distinct one once.
+@functools.lru_cache(maxsize=None)
+def ingredient_name(composition):
+    """"Amoxycillin  (500mg)" -> "amoxycillin"."""
+    return normalize_name(re.sub(r"\([^)]*\)", " ", composition))
+
+
+def composition_key(compositions):
+    return " + ".join(sorted({normalize_name(c) for c in compositions}))
+
+
+def parse_price(value):
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return price if price >= 0 else math.nan
+
+
+def write_csr(path, stem, rows):
+    offsets = np.zeros(len(rows) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(row) for row in rows])
+    offsets.tofile(os.path.join(path, f"{stem}.off"))
+    np.fromiter((i for row in rows for i in row), dtype="<u4", count=int(offsets[-1])).tofile(
+        os.path.join(path, f"{stem}.ids")
+    )
+
+
+def vocabulary(values):
+    """Sorted distinct values and their ids."""
+    ordered = sorted({value.encode("utf-8") for value in values if value})
+    return ordered, {value.decode("utf-8"): i for i, value in enumerate(ordered)}
+
+
+def write_medicine_graph(path, records):
+    """Write the composition/substitute graph of `records` as a directory at `path`.
+
+    Records are lookup records (see script.build_lookup_records): "name",
+    "price", "compositions", "substitutes", "therapeutic_class" and
+    "action_class" are used. The first record of each normalized name wins,
+    and the graph is swapped in whole like the lookup index.
+    """
+    by_name = {}
+    for record in records:
+        name = normalize_name(record.get("name") or "")
+        if name and name not in by_name:
+            by_name[name] = record
+
+    names, medicine_ids = vocabulary(by_name)
+    records = [by_name[name.decode("utf-8")] for name in names]
+    count = len(names)
+
+    compositions = [record.get("compositions") or [] for record in records]
+    row_ingredients = [{ingredient_name(c) for c in row} - {""} for row in compositions]
+    ingredients, ingredient_ids = vocabulary(name for row in row_ingredients for name in row)
+    classes, class_ids = vocabulary(
+        normalize_name(record.get(key) or "") for record in records for key in ("therapeutic_class", "action_class")
+    )
+    keys = [composition_key(row) if row else "" for row in compositions]
+    composition_names, composition_ids = vocabulary(keys)
+
+    prices = np.array([parse_price(record.get("price")) for record in records], dtype="<f4")
+
+    def by_price(i):
+        return math.isnan(prices[i]), prices[i], i
+
+    medicine_classes = np.full(count * 2, NONE, dtype="<u4")
+    medicine_composition = np.full(count, NONE, dtype="<u4")
+    medicine_ingredients, substitutes = [], []
+    ingredient_medicines = [[] for _ in ingredients]
+    class_medicines = [[] for _ in classes]
+    composition_medicines = [[] for _ in composition_names]
+    for i, record in enumerate(records):
+        for slot, key in enumerate(("therapeutic_class", "action_class")):
+            class_id = class_ids.get(normalize_name(record.get(key) or ""))
+            if class_id is not None:
+                medicine_classes[i * 2 + slot] = class_id
+                if i not in class_medicines[class_id][-1:]:
+                    class_medicines[class_id].append(i)
+        if keys[i]:
+            medicine_composition[i] = composition_ids[keys[i]]
+            composition_medicines[composition_ids[keys[i]]].append(i)
+        row = sorted(ingredient_ids[name] for name in row_ingredients[i])
+        medicine_ingredients.append(row)
+        for ingredient_id in row:
+            ingredient_medicines[ingredient_id].append(i)
+        listed = {medicine_ids.get(normalize_name(name)) for name in record.get("substitutes") or []}
+        substitutes.append(sorted(listed - {None, i}, key=by_price))
+
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for stem, items in (("medicines", names), ("ingredients", ingredients), ("classes", classes),
+                        ("compositions", composition_names)):
+        write_blob(tmp, stem, items)
+    prices.tofile(os.path.join(tmp, "medicine_prices.f4"))
+    medicine_classes.tofile(os.path.join(tmp, "medicine_classes.u4"))
+    medicine_composition.tofile(os.path.join(tmp, "medicine_composition.u4"))
+    write_csr(tmp, "medicine_ingredients", medicine_ingredients)
+    write_csr(tmp, "ingredient_medicines", ingredient_medicines)
+    write_csr(tmp, "class_medicines", class_medicines)
+    write_csr(tmp, "composition_medicines", [sorted(row, key=by_price) for row in composition_medicines])
+    write_csr(tmp, "medicine_substitutes", substitutes)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": FORMAT, "version": VERSION, "medicines": count, "ingredients": len(ingredients),
+            "classes": len(classes), "compositions": len(composition_names),
+        }, f)
+
+    replace_dir(tmp, path)
+    return count
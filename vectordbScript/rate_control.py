@@ -0,0 +1,191 @@
+import logging
+import random
+import time
+
+import requests
+import urllib3
+
+
+# =========================================================
+# ERROR CLASSIFICATION
+# =========================================================
+
+RETRYABLE_STATUS = {408, 429}
+
+# Transport-level failures with no HTTP status. requests and urllib3 have
+# their own hierarchies that do not derive from the builtin ConnectionError.
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.HTTPError,
+)
+
+
+def error_status(exc):
+    """HTTP status carried by a Pinecone/requests-style exception, if any."""
+    for attr in ("status", "status_code"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc):
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+# =========================================================
+# CONTROLLERS
+# =========================================================
+
+class TokenBucket:
+    """Classic token bucket; `acquire()` blocks until a token is available."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        self._refill()
+        if self.tokens < 1:
+            # Sleep until the next token is due and take it, rather than
+            # looping on refills that float rounding can leave just short of 1.
+            self.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+            self.tokens = max(self.tokens, 1)
+        self.tokens -= 1
+
+
+class FixedIntervalController:
+    """The original behaviour: sleep a fixed interval after every batch."""
+
+    def __init__(self, interval, clock=time.monotonic, sleep=time.sleep):
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+
+    def acquire(self):
+        pass
+
+    def on_success(self, latency):
+        if self.interval:
+            self.sleep(self.interval)
+
+    def on_throttle(self):
+        pass
+
+
+class AdaptiveRateController:
+    """Token bucket whose rate follows AIMD on observed latency and throttling.
+
+    Each fast success adds `increase` requests/sec; a throttle, a 5xx or a
+    slow call multiplies the rate by `decrease`. A call is slow when it takes
+    longer than `target_latency` if one is given, otherwise longer than
+    `slow_factor` times an EWMA of the latencies seen so far, so a backend
+    that is uniformly slow is not mistaken for an overloaded one.
+    Decreases are applied at most once per `cooldown` seconds so a burst of
+    rejections from one overload only halves the rate once.
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=0.05, max_rate=100.0, increase=0.2,
+                 decrease=0.5, target_latency=None, slow_factor=1.5, ewma_alpha=0.1,
+                 cooldown=1.0, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.slow_factor = slow_factor
+        self.ewma_alpha = ewma_alpha
+        self.baseline_latency = None
+        self.cooldown = cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = TokenBucket(initial_rate, burst, clock, sleep)
+        self.last_decrease = None
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def acquire(self):
+        self.bucket.acquire()
+
+    def _is_slow(self, latency):
+        if self.target_latency is not None:
+            return latency > self.target_latency
+
+        baseline = self.baseline_latency
+        if baseline is None:
+            self.baseline_latency = latency
+            return False
+        self.baseline_latency = baseline + self.ewma_alpha * (latency - baseline)
+        return latency > self.slow_factor * baseline
+
+    def on_success(self, latency):
+        if self._is_slow(latency):
+            self._back_off()
+        else:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase)
+
+    def on_throttle(self):
+        self._back_off()
+
+    def _back_off(self):
+        now = self.clock()
+        if self.last_decrease is not None and now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.bucket.rate = max(self.min_rate, self.bucket.rate * self.decrease)
+
+
+def make_controller(kind, interval=5, **kwargs):
+    if kind == "fixed":
+        return FixedIntervalController(interval, **kwargs)
+    if kind == "adaptive":
+        return AdaptiveRateController(**kwargs)
+    raise ValueError(f"Unknown rate controller: {kind}")
+
+
+# =========================================================
+# RETRIES
+# =========================================================
+
+def call_with_retries(fn, controller, retries=5, base_delay=1.0, max_delay=30.0, jitter=random.random):
+    """Run `fn()` under `controller`, retrying transient failures.
+
+    Retries use exponential backoff with full jitter, timed with the
+    controller's clock. Non-retryable errors, and the last retryable one,
+    are re-raised.
+    """
+    for attempt in range(retries + 1):
+        controller.acquire()
+        start = controller.clock()
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt == retries:
+                raise
+            controller.on_throttle()
+            delay = jitter() * min(max_delay, base_delay * 2 ** attempt)
+            logging.warning(f"Retryable error (attempt {attempt + 1}/{retries}): {e}; retrying in {delay:.2f}s")
+            controller.sleep(delay)
+        else:
+            controller.on_success(controller.clock() - start)
+            return result
@@ -1,6 +1,7 @@
 import os
 import time
 import logging
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 from tqdm import tqdm
@@ -9,6 +10,13 @@ from kagglehub import KaggleDatasetAdapter
 from pinecone import Pinecone, ServerlessSpec
 from google import genai
 from google.genai import types
+from rate_control import make_controller, call_with_retries
+from manifest import Manifest, changed, text_hash
+from embedding_client import EmbeddingClient, EmbeddingError
+from embedding_cache import EmbeddingCache
+from local_index import LocalIndex
+from lookup_index import write_lookup_index
+from medicine_graph import write_medicine_graph
 
 
 # =========================================================
@@ -21,17 +29,26 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX") or "medicine-knowledgebase"
 NAMESPACE = os.getenv("PINECONE_NAMESPACE") or "medicine_kb_v1"
-
-if not GOOGLE_API_KEY or not PINECONE_API_KEY:
-    raise ValueError("Missing API keys in .env file")
-
-client = genai.Client(api_key=GOOGLE_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
+INDEX_BACKEND = os.getenv("INDEX_BACKEND") or "pinecone"
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH") or "local_index"
 
 EMBEDDING_MODEL = "text-embedding-004"
 OUTPUT_DIMENSION = 768 
 BATCH_SIZE = 96
+CHUNK_SIZE = BATCH_SIZE * 100
+SHARD_SIZE = BATCH_SIZE * 10
 SLEEP_INTERVAL = 5
+RATE_CONTROL = os.getenv("RATE_CONTROL") or "adaptive"
+MAX_RETRIES = 5
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST") or "ingest_manifest.sqlite"
+EMBEDDING_URL = os.getenv("EMBEDDING_URL") or "http://127.0.0.1:8000/predict"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE") or 32)
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY") or 4)
+EMBEDDING_CACHE_MB = int(os.getenv("EMBEDDING_CACHE_MB") or 2048)
+SNAPSHOT_PATH = os.getenv("DATASET_SNAPSHOT") or "medicine_dataset.parquet"
+LOOKUP_INDEX_PATH = os.getenv("MEDICINE_INDEX_PATH") or "medicine_index"
+MEDICINE_GRAPH_PATH = os.getenv("MEDICINE_GRAPH_PATH") or "medicine_graph"
+CATEGORY_MAX_RATIO = 0.5
 
 logging.basicConfig(level=logging.INFO)
 
@@ -40,33 +57,29 @@ logging.basicConfig(level=logging.INFO)
 # DATA LOADING
 # =========================================================
 
-def load_dataset():
-    import kagglehub
-    import os
-    import pandas as pd
-    import csv
-
+def dataset_path():
     path_usage = kagglehub.dataset_download(
         "shudhanshusingh/250k-medicines-usage-side-effects-and-substitutes"
     )
 
+    return os.path.join(path_usage, "medicine_dataset.csv")
 
-    usage_file = os.path.join(path_usage, "medicine_dataset.csv")
 
+def read_dataset(usage_file=None, chunksize=None):
+    import csv
 
-    df_usage = pd.read_csv(
-        usage_file,
+    return pd.read_csv(
+        usage_file or dataset_path(),
         encoding="latin1",
         engine="python",
         on_bad_lines="skip",
-        quoting=csv.QUOTE_NONE
+        quoting=csv.QUOTE_NONE,
+        chunksize=chunksize
     )
 
 
-
-    return df_usage
-
-
+def load_dataset(usage_file=None):
+    return read_dataset(usage_file)
 
 
 def normalize(df):
@@ -76,10 +89,19 @@ def normalize(df):
     return df
 
 
-def load_and_prepare():
+def is_snapshot(path):
+    return bool(path) and str(path).endswith(".parquet")
+
+
+def load_and_prepare(usage_file=None):
     logging.info("Loading datasets...")
 
-    df = load_dataset()
+    if is_snapshot(usage_file):
+        df = load_snapshot(usage_file)
+        logging.info(f"Loaded {len(df)} prepared records from snapshot {usage_file}")
+        return df
+
+    df = load_dataset(usage_file)
     df = normalize(df)  # Only use the 250k usage dataset
 
     print(f"Records before deduplication: {len(df)}")
@@ -93,6 +115,145 @@ def load_and_prepare():
     return df
 
 
+# =========================================================
+# COLUMNAR SNAPSHOT
+# =========================================================
+
+def compact(df):
+    """Convert a prepared frame to compact dtypes.
+
+    Columns whose distinct values are at most CATEGORY_MAX_RATIO of the rows
+    (manufacturer, type, classes, and the repeated use*/sideEffect* values)
+    become categoricals; every other column becomes an Arrow-backed string.
+    `build_texts` produces the same text from either representation.
+    """
+    import pyarrow as pa
+
+    out = {}
+    for col in df.columns:
+        values = df[col].astype(object).where(df[col].notna(), None)
+        if col not in ("id", "name") and values.nunique() <= CATEGORY_MAX_RATIO * max(len(df), 1):
+            out[col] = values.astype("category")
+        else:
+            out[col] = values.astype(pd.ArrowDtype(pa.string()))
+    return pd.DataFrame(out, index=df.index)
+
+
+def file_digest(path):
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_snapshot(df, path=SNAPSHOT_PATH, source=None):
+    """Write `df` compacted to a Parquet snapshot, recording the digest of the `source` CSV it came from."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = compact(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if source is not None:
+        table = table.replace_schema_metadata({**table.schema.metadata, b"source_digest": file_digest(source).encode()})
+    pq.write_table(table, path, compression="zstd")
+    logging.info(f"Wrote {len(df)} records to snapshot {path}")
+    return df
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    return pd.read_parquet(path)
+
+
+def snapshot_digest(path=SNAPSHOT_PATH):
+    import pyarrow.parquet as pq
+
+    digest = (pq.read_schema(path).metadata or {}).get(b"source_digest")
+    return digest.decode() if digest else None
+
+
+def fresh_snapshot(path=SNAPSHOT_PATH):
+    """`path`, rebuilt first if the Kaggle CSV has changed since it was prepared.
+
+    The weekly refresh downloads a new CSV, and a snapshot prepared from the
+    old one would otherwise keep being ingested. Without access to Kaggle the
+    snapshot is used as is, with a warning.
+    """
+    try:
+        csv_path = dataset_path()
+    except Exception as e:
+        logging.warning(f"Could not check the Kaggle dataset for updates ({e}); using snapshot {path} as is")
+        return path
+    if snapshot_digest(path) != file_digest(csv_path):
+        logging.warning(f"Snapshot {path} was not prepared from the current {csv_path}; rebuilding it")
+        write_snapshot(load_and_prepare(csv_path), path, source=csv_path)
+    return path
+
+
+def iter_snapshot_chunks(path=SNAPSHOT_PATH, chunksize=CHUNK_SIZE):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+# =========================================================
+# STREAMING INGESTION
+# =========================================================
+
+class SeenIds:
+    """Set of 64-bit id hashes used to dedup rows across chunks."""
+
+    def __init__(self):
+        self._hashes = set()
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def filter_new(self, ids):
+        """Return a mask of ids not seen before (first occurrence wins) and remember them."""
+        hashes = pd.util.hash_pandas_object(ids, index=False).to_numpy()
+        mask = []
+        for h in hashes.tolist():
+            if h in self._hashes:
+                mask.append(False)
+            else:
+                self._hashes.add(h)
+                mask.append(True)
+        return pd.Series(mask, index=ids.index)
+
+
+def iter_normalized_chunks(usage_file=None, chunksize=CHUNK_SIZE):
+    """Yield normalized chunks with ids already seen in earlier rows dropped."""
+    if is_snapshot(usage_file):
+        # Snapshots are written already normalized and deduplicated.
+        yield from iter_snapshot_chunks(usage_file, chunksize)
+        return
+
+    seen = SeenIds()
+    total = 0
+
+    for chunk in read_dataset(usage_file, chunksize=chunksize):
+        chunk = normalize(chunk)
+        chunk = chunk[seen.filter_new(chunk["id"]).to_numpy()]
+        if chunk.empty:
+            continue
+
+        total += len(chunk)
+        yield chunk.reset_index(drop=True)
+
+    logging.info(f"Streamed {total} unique records")
+
+
+def iter_prepared_chunks(usage_file=None, chunksize=CHUNK_SIZE):
+    """Yield normalized, deduplicated chunks with `embedding_text` attached."""
+    for chunk in iter_normalized_chunks(usage_file, chunksize):
+        chunk["embedding_text"] = build_texts(chunk)
+        yield chunk
+
+
 # =========================================================
 # TEXT CLEANING + REPRESENTATION
 # =========================================================
@@ -106,24 +267,34 @@ def clean(value):
     return value
 
 
+# Shared by create_text (row-wise) and build_texts (column-wise) so both
+# emit segments in the same order with the same labels.
+FIELD_LABELS = {
+    "name": "Medicine Name",
+    "type": "Type",
+    "price(₹)": "Price",
+    "pack_size_label": "Pack Size",
+    "manufacturer_name": "Manufacturer",
+    "Chemical Class": "Chemical Class",
+    "Therapeutic Class": "Therapeutic Class",
+    "Action Class": "Action Class",
+    "Habit Forming": "Habit Forming",
+}
+
+COMPOSITION_COLUMNS = ["short_composition1", "short_composition2"]
+
+PREFIX_LABELS = {
+    "use": "Uses",
+    "substitute": "Substitutes",
+    "sideEffect": "Known Side Effects"
+}
+
+
 def create_text(row):
     parts = []
 
-    # Fields with custom labels
-    field_map = {
-        "name": "Medicine Name",
-        "type": "Type",
-        "price(₹)": "Price",
-        "pack_size_label": "Pack Size",
-        "manufacturer_name": "Manufacturer",
-        "Chemical Class": "Chemical Class",
-        "Therapeutic Class": "Therapeutic Class",
-        "Action Class": "Action Class",
-        "Habit Forming": "Habit Forming",
-    }
-
     # Add simple mapped fields
-    for col, label in field_map.items():
+    for col, label in FIELD_LABELS.items():
         value = clean(row.get(col))
         if value:
             if col == "price(₹)":
@@ -131,22 +302,13 @@ def create_text(row):
             parts.append(f"{label}: {value}")
 
     # Active ingredients (explicit list)
-    compositions = [
-        clean(row.get("short_composition1")),
-        clean(row.get("short_composition2"))
-    ]
+    compositions = [clean(row.get(col)) for col in COMPOSITION_COLUMNS]
     compositions = [c for c in compositions if c]
     if compositions:
         parts.append("Active Ingredients: " + ", ".join(compositions))
 
     # Dynamic grouped columns
-    prefix_groups = {
-        "use": "Uses",
-        "substitute": "Substitutes",
-        "sideEffect": "Known Side Effects"
-    }
-
-    for prefix, label in prefix_groups.items():
+    for prefix, label in PREFIX_LABELS.items():
         values = []
         for col in row.index:
             if col.startswith(prefix):
@@ -160,24 +322,210 @@ def create_text(row):
     return "\n".join(parts)
 
 
+def clean_column(series):
+    """Column-wise `clean()`: stripped strings, NaN where the value is missing."""
+    mask = series.notna()
+    values = series[mask].astype(str).astype(object).str.strip()
+    values = values[(values != "") & (values.str.lower() != "none")]
+    return values.reindex(series.index)
+
+
+def join_columns(columns, sep):
+    """Join the non-missing values of each row across `columns` with `sep`.
+
+    Works on object arrays rather than Series to skip index alignment; rows
+    where every column is missing stay NaN.
+    """
+    joined = None
+    for column in columns:
+        values = column.to_numpy(dtype=object)
+        if joined is None:
+            joined = values.copy()
+            continue
+        has_joined = pd.notna(joined)
+        has_value = pd.notna(values)
+        both = has_joined & has_value
+        joined = np.where(has_joined, joined, values)
+        joined[both] = joined[both] + sep + values[both]
+    return pd.Series(joined, index=columns[0].index, dtype=object)
+
+
+def build_texts(df):
+    """Vectorized equivalent of `df.apply(create_text, axis=1)`."""
+    missing = pd.Series(float("nan"), index=df.index, dtype=object)
+
+    def cleaned(col):
+        return clean_column(df[col]) if col in df.columns else missing
+
+    segments = []
+
+    for col, label in FIELD_LABELS.items():
+        values = cleaned(col)
+        if col == "price(₹)":
+            values = "₹" + values
+        segments.append(f"{label}: " + values)
+
+    compositions = join_columns([cleaned(col) for col in COMPOSITION_COLUMNS], ", ")
+    segments.append("Active Ingredients: " + compositions)
+
+    for prefix, label in PREFIX_LABELS.items():
+        group = [col for col in df.columns if col.startswith(prefix)]
+        if group:
+            values = join_columns([cleaned(col) for col in group], ", ")
+            segments.append(f"{label}: " + values)
+
+    return join_columns(segments, "\n").fillna("").astype(object)
+
 
 # =========================================================
-# PINECONE SETUP
+# LOOKUP INDEX
 # =========================================================
 
+# Record fields for the agent's local medicine lookup, by source column.
+LOOKUP_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "type": "type",
+    "price(₹)": "price",
+    "pack_size_label": "pack_size",
+    "manufacturer_name": "manufacturer",
+    "Chemical Class": "chemical_class",
+    "Therapeutic Class": "therapeutic_class",
+    "Action Class": "action_class",
+    "Habit Forming": "habit_forming",
+}
+
+LOOKUP_LISTS = {
+    "compositions": COMPOSITION_COLUMNS,
+    "uses": "use",
+    "substitutes": "substitute",
+    "side_effects": "sideEffect",
+}
+
+
+def _lookup_values(column):
+    # Missing values become None once per column, so the row loop can test with `is not None`.
+    column = clean_column(column).astype(object)
+    return column.where(column.notna(), None).to_numpy()
+
+
+def _lookup_column(df, col):
+    # The CSV is read as latin1, which has no "₹", so the price header arrives
+    # as "price(" plus whatever its bytes decode to.
+    if col not in df.columns and col.startswith("price("):
+        return next((c for c in df.columns if c.startswith("price(")), col)
+    return col
+
+
+def build_lookup_records(df):
+    """One dict per row with the non-missing fields the agent answers from."""
+    columns = {_lookup_column(df, col): key for col, key in LOOKUP_FIELDS.items()}
+    fields = {key: _lookup_values(df[col]) for col, key in columns.items() if col in df.columns}
+    lists = {}
+    for key, source in LOOKUP_LISTS.items():
+        columns = source if isinstance(source, list) else [c for c in df.columns if c.startswith(source)]
+        lists[key] = [_lookup_values(df[col]) for col in columns if col in df.columns]
+
+    for i in range(len(df)):
+        record = {key: values[i] for key, values in fields.items() if values[i] is not None}
+        for key, columns in lists.items():
+            items = [values[i] for values in columns if values[i] is not None]
+            if items:
+                record[key] = list(dict.fromkeys(items))
+        yield record
+
+
+def first_per_name(df):
+    # The lookup index and the graph keep the first record per name, so skip building the rest.
+    return df[~df["name"].str.lower().str.split().str.join(" ").duplicated()]
+
+
+def build_lookup_index(df, path=LOOKUP_INDEX_PATH):
+    count = write_lookup_index(path, build_lookup_records(first_per_name(df)))
+    logging.info(f"Wrote lookup index of {count} medicine names to {path}")
+    return count
+
+
+def build_medicine_graph(df, path=MEDICINE_GRAPH_PATH):
+    count = write_medicine_graph(path, build_lookup_records(first_per_name(df)))
+    logging.info(f"Wrote composition and substitute graph of {count} medicines to {path}")
+    return count
+
+
+# =========================================================
+# INDEX BACKENDS
+# =========================================================
+
+_clients = {}
+
+
+def pinecone_client():
+    # Built on first use so the module imports (and the local backend runs)
+    # without API keys.
+    if "pinecone" not in _clients:
+        if not PINECONE_API_KEY:
+            raise ValueError("Missing PINECONE_API_KEY in .env file")
+        _clients["pinecone"] = Pinecone(api_key=PINECONE_API_KEY)
+    return _clients["pinecone"]
+
+
+def genai_client():
+    if "genai" not in _clients:
+        if not GOOGLE_API_KEY:
+            raise ValueError("Missing GOOGLE_API_KEY in .env file")
+        _clients["genai"] = genai.Client(api_key=GOOGLE_API_KEY)
+    return _clients["genai"]
+
+
 def setup_index():
+    pc = pinecone_client()
     while not pc.describe_index(INDEX_NAME).status["ready"]:
         time.sleep(0.1)
 
     return pc.Index(INDEX_NAME)
 
 
+def open_index(backend=None):
+    """Index selected by `backend` (or INDEX_BACKEND): "pinecone" or "local".
+
+    The local index embeds `upsert_records` texts itself via `embed_texts`
+    and has to be `save()`d to persist.
+    """
+    backend = backend or INDEX_BACKEND
+    if backend == "pinecone":
+        return pinecone_client().Index(INDEX_NAME)
+    if backend == "local":
+        return LocalIndex.open(LOCAL_INDEX_PATH, embed=embed_texts)
+    raise ValueError(f"Unknown index backend: {backend}")
+
+
 # =========================================================
 # EMBEDDING
 # =========================================================
 
-def generate_embeddings(text):
-    # result = client.models.embed_content(
+_embedding_client = None
+_embedding_cache = None
+
+
+def embedding_client():
+    """Per-process EmbeddingClient, created on first use (also inside pool workers)."""
+    global _embedding_client
+    if _embedding_client is None:
+        _embedding_client = EmbeddingClient(EMBEDDING_URL, EMBED_BATCH_SIZE, EMBED_CONCURRENCY)
+    return _embedding_client
+
+
+def embedding_cache():
+    """Per-process EmbeddingCache, or None when EMBEDDING_CACHE_DIR is set to ""."""
+    global _embedding_cache
+    root = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+    if _embedding_cache is None and root:
+        _embedding_cache = EmbeddingCache(root, EMBEDDING_MODEL, OUTPUT_DIMENSION, EMBEDDING_CACHE_MB << 20)
+    return _embedding_cache
+
+
+def embed_texts(texts):
+    # result = genai_client().models.embed_content(
     #     model="text-embedding-004",   # or gemini-embedding-001
     #     contents=texts,
     #     config=types.EmbedContentConfig(
@@ -185,63 +533,340 @@ def generate_embeddings(text):
     #         output_dimensionality=OUTPUT_DIMENSION
     #     )
     # )
-    headers = {"Content-Type": "application/json"}
-    url = "http://127.0.0.1:8000/predict"
+    cache = embedding_cache()
+    if cache is None:
+        return embedding_client().embed(texts)
+    return cache.get_or_embed(texts, embedding_client().embed)
+
+
+def generate_embeddings(text):
     try:
-        response = requests.post(url, headers=headers, data=json.dumps({"text":text}))
-        response.raise_for_status() # raise an exception for http errors (4xx or 5xx)
-        embedding_output = response.json().get("embedding")
-        if not embedding_output:
-            raise ValueError("No embedding found in the response")
-    except Exception as e:
+        return embed_texts([text])[0].tolist()
+    except EmbeddingError as e:
         logging.error(f"Embedding generation failed: {e}")
         return None
-    
-    return embedding_output
 
 
 # =========================================================
 # MAIN PIPELINE
 # =========================================================
 
-def main():
-    df = load_and_prepare()
+def build_records(ids, names, texts):
+    return [
+        {
+            "id": doc_id,
+            "name": name,
+            "text": text  # IMPORTANT: this is what Pinecone embeds
+        }
+        for doc_id, name, text
+        in zip(ids, names, texts)
+    ]
 
-    logging.info("Generating text representation...")
-    df["embedding_text"] = df.apply(create_text, axis=1)
 
-    index = pc.Index(INDEX_NAME)
+def build_vectors(ids, names, texts, values):
+    return [
+        {
+            "id": doc_id,
+            "values": vector.tolist(),
+            "metadata": {"name": name, "text": text}
+        }
+        for doc_id, name, text, vector
+        in zip(ids, names, texts, values)
+    ]
+
+
+def rate_controller(kind=None):
+    return make_controller(kind or RATE_CONTROL, interval=SLEEP_INTERVAL)
+
+
+def upsert_frame(index, df, offset=0, progress=None, values=None, controller=None, manifest=None):
+    """Upsert `df` in BATCH_SIZE batches, paced and retried by `controller`.
+
+    With `values` (one float32 row per record) the vectors are upserted
+    directly; otherwise Pinecone embeds the `text` field itself. With a
+    `manifest`, unchanged records are skipped and each batch's records are
+    recorded once it has been upserted.
+    """
+    controller = controller or rate_controller()
+
+    if manifest is not None:
+        mask, hashes = manifest.pending(df)
+        if progress is not None:
+            progress.update(int((~mask).sum()))
+        df = df[mask]
+        hashes = [h for h, keep in zip(hashes, mask) if keep]
+        if values is not None:
+            values = values[mask]
 
     ids = df["id"].tolist()
     texts = df["embedding_text"].tolist()
     names = df["name"].tolist()
 
+    for i in range(0, len(ids), BATCH_SIZE):
+        try:
+            if values is None:
+                vectors = build_records(
+                    ids[i:i + BATCH_SIZE],
+                    names[i:i + BATCH_SIZE],
+                    texts[i:i + BATCH_SIZE]
+                )
+                call_with_retries(
+                    lambda: index.upsert_records(namespace=NAMESPACE, records=vectors),
+                    controller, MAX_RETRIES
+                )
+            else:
+                vectors = build_vectors(
+                    ids[i:i + BATCH_SIZE],
+                    names[i:i + BATCH_SIZE],
+                    texts[i:i + BATCH_SIZE],
+                    values[i:i + BATCH_SIZE]
+                )
+                call_with_retries(
+                    lambda: index.upsert(vectors=vectors, namespace=NAMESPACE),
+                    controller, MAX_RETRIES
+                )
+
+        except Exception as e:
+            logging.error(f"Batch {offset + i} failed: {e}")
+            raise e
+
+        if manifest is not None:
+            manifest.commit(ids[i:i + BATCH_SIZE], hashes[i:i + BATCH_SIZE])
+
+        if progress is not None:
+            progress.update(len(vectors))
+
+
+def delete_missing(index, manifest, controller=None):
+    """Delete ids that are in the manifest but were not in this run's source."""
+    controller = controller or rate_controller()
+    missing = manifest.missing_ids()
+    logging.info(f"Deleting {len(missing)} records no longer in the dataset...")
+
+    for i in range(0, len(missing), BATCH_SIZE):
+        batch = missing[i:i + BATCH_SIZE]
+        call_with_retries(lambda: index.delete(ids=batch, namespace=NAMESPACE), controller, MAX_RETRIES)
+        manifest.forget(batch)
+
+
+def ingest(index, usage_file=None, controller=None, manifest=None):
+    df = load_and_prepare(usage_file)
+
+    logging.info("Generating text representation...")
+    df["embedding_text"] = build_texts(df)
+
     logging.info("Starting direct upsert (Pinecone handles embeddings)...")
 
-    for i in tqdm(range(0, len(ids), BATCH_SIZE)):
-        batch_ids = ids[i:i + BATCH_SIZE]
-        batch_texts = texts[i:i + BATCH_SIZE]
-        batch_names = names[i:i + BATCH_SIZE]
+    with tqdm(total=len(df), unit="rows") as progress:
+        upsert_frame(index, df, progress=progress, controller=controller or rate_controller(), manifest=manifest)
 
-        try:
-            vectors = [
-                {
-                    "id": doc_id,
-                    "name": name,
-                    "text": text  # IMPORTANT: this is what Pinecone embeds
-                }
-                for doc_id, name, text
-                in zip(batch_ids, batch_names, batch_texts)
-            ]
-
-            index.upsert_records(namespace=NAMESPACE, records=vectors)
-            time.sleep(SLEEP_INTERVAL)
 
+def ingest_stream(index, usage_file=None, chunksize=CHUNK_SIZE, controller=None, manifest=None):
+    logging.info(f"Streaming dataset in chunks of {chunksize} rows...")
+
+    controller = controller or rate_controller()
+    offset = 0
+    with tqdm(unit="rows") as progress:
+        for chunk in iter_prepared_chunks(usage_file, chunksize):
+            upsert_frame(index, chunk, offset, progress, controller=controller, manifest=manifest)
+            offset += len(chunk)
+
+
+# =========================================================
+# PARALLEL PIPELINE
+# =========================================================
+
+class ShardError(Exception):
+    pass
+
+
+def process_shard(shard, embed=None, known=None):
+    """Worker entry point: build text for one shard and optionally embed it.
+
+    `embed` maps a list of texts to a float32 array with one row per text
+    and raises if any of them cannot be embedded. It is pickled into the
+    workers, so it must be a module-level callable. With `known`, the
+    manifest's {id: text hash} for the shard, rows whose text is unchanged
+    are dropped before anything is embedded.
+    """
+    shard = shard[["id", "name"]].assign(embedding_text=build_texts(shard))
+    if known is not None:
+        hashes = [text_hash(text) for text in shard["embedding_text"].tolist()]
+        shard = shard[changed(shard["id"].tolist(), hashes, known)]
+    if embed is None or shard.empty:
+        return shard, None
+
+    try:
+        values = embed(shard["embedding_text"].tolist())
+    except Exception as e:
+        raise ShardError(f"embedding {len(shard)} records failed (first ids: {shard['id'].tolist()[:5]}): {e}")
+
+    return shard, values
+
+
+def iter_shards(frames, shard_size=SHARD_SIZE):
+    for frame in frames:
+        for i in range(0, len(frame), shard_size):
+            yield frame.iloc[i:i + shard_size]
+
+
+def ingest_parallel(index, frames, workers, embed=None, shard_size=SHARD_SIZE, controller=None,
+                    manifest=None):
+    """Build text (and embeddings) for `frames` on a process pool.
+
+    At most `2 * workers` shards are in flight. Results are drained oldest
+    first, so a single writer upserts them in input order. A failed shard is
+    logged with its row range and the run continues; ShardError is raised at
+    the end if any rows were not ingested. With a `manifest`, each worker
+    gets the shard's known text hashes and drops unchanged rows before
+    embedding them.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    controller = controller or rate_controller()
+    pending = deque()
+    failures = []
+
+    def write_oldest(progress):
+        shard_no, start, n_rows, future = pending.popleft()
+        try:
+            shard, values = future.result()
         except Exception as e:
-            logging.error(f"Batch {i} failed: {e}")
-            raise e 
+            logging.error(f"Shard {shard_no} (rows {start}-{start + n_rows - 1}) failed: {e}")
+            failures.append((shard_no, n_rows))
+            return
+        # Rows the worker dropped as unchanged
+        progress.update(n_rows - len(shard))
+        upsert_frame(index, shard, start, progress, values, controller, manifest)
+
+    logging.info(f"Processing shards of {shard_size} rows on {workers} workers...")
+
+    offset = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(unit="rows") as progress:
+        for shard_no, shard in enumerate(iter_shards(frames, shard_size)):
+            if len(pending) >= 2 * workers:
+                write_oldest(progress)
+            known = None
+            if manifest is not None:
+                # Unchanged rows are still in the source, though the worker drops them
+                ids = shard["id"].tolist()
+                manifest.see(ids)
+                known = manifest.known(ids)
+            pending.append((shard_no, offset, len(shard), pool.submit(process_shard, shard, embed, known)))
+            offset += len(shard)
+
+        while pending:
+            write_oldest(progress)
+
+    if failures:
+        dropped = sum(n_rows for _, n_rows in failures)
+        raise ShardError(
+            f"{len(failures)} shard(s) failed, {dropped} of {offset} rows not ingested: "
+            f"shards {[shard_no for shard_no, _ in failures]}"
+        )
+
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest the medicine dataset into Pinecone.")
+    parser.add_argument("--csv", help="Path to medicine_dataset.csv (downloaded from Kaggle if omitted)")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH,
+                        help="Parquet snapshot loaded instead of the CSV when it exists and --csv is not given; "
+                             "rebuilt first if the Kaggle CSV has changed since it was prepared")
+    parser.add_argument("--prepare", action="store_true",
+                        help="Normalize and dedup the CSV, write the --snapshot and exit")
+    parser.add_argument("--lookup-index", nargs="?", const=LOOKUP_INDEX_PATH, metavar="PATH",
+                        help="Build the agent-service medicine lookup index at PATH and exit")
+    parser.add_argument("--medicine-graph", nargs="?", const=MEDICINE_GRAPH_PATH, metavar="PATH",
+                        help="Build the agent-service composition and substitute graph at PATH and exit")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read, dedup and upsert the CSV chunk by chunk with flat memory use")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Rows per chunk in --stream mode")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Build text (and embeddings) on N worker processes")
+    parser.add_argument("--embed", action="store_true",
+                        help="Embed via the local /predict endpoint instead of Pinecone (needs --workers)")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="Always call the embedder instead of reusing cached vectors")
+    parser.add_argument("--backend", choices=["pinecone", "local"], default=INDEX_BACKEND,
+                        help="Write to Pinecone or to the on-disk LocalIndex at LOCAL_INDEX_PATH")
+    parser.add_argument("--rate-control", choices=["adaptive", "fixed"], default=RATE_CONTROL,
+                        help="Pace upserts with an AIMD token bucket or the fixed SLEEP_INTERVAL")
+    parser.add_argument("--manifest", default=MANIFEST_PATH,
+                        help="SQLite manifest used to skip unchanged records and resume failed runs")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help="Upsert every record and do not record progress")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="After a successful run, delete ids that are no longer in the dataset")
+    args = parser.parse_args(argv)
+
+    if args.delete_missing and args.no_manifest:
+        parser.error("--delete-missing needs the manifest")
+    if args.embed and not args.workers:
+        parser.error("--embed requires --workers")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.prepare:
+        csv_path = args.csv or dataset_path()
+        write_snapshot(load_and_prepare(csv_path), args.snapshot, source=csv_path)
+        return
+
+    source = args.csv
+    if source is None and os.path.exists(args.snapshot):
+        source = fresh_snapshot(args.snapshot)
+
+    if args.lookup_index or args.medicine_graph:
+        df = load_and_prepare(source)
+        if args.lookup_index:
+            build_lookup_index(df, args.lookup_index)
+        if args.medicine_graph:
+            build_medicine_graph(df, args.medicine_graph)
+        return
+
+    index = open_index(args.backend)
+    if args.backend == "local":
+        # Nothing to throttle when writing to process memory.
+        controller = make_controller("fixed", interval=0)
+    else:
+        controller = rate_controller(args.rate_control)
+
+    if args.no_embedding_cache:
+        # Read by embedding_cache() in each worker process.
+        os.environ["EMBEDDING_CACHE_DIR"] = ""
+
+    manifest = None
+    if not args.no_manifest:
+        manifest_namespace = NAMESPACE if args.backend == "pinecone" else f"{args.backend}/{NAMESPACE}"
+        manifest = Manifest(args.manifest, manifest_namespace)
+        logging.info(f"Manifest {args.manifest} has {len(manifest)} committed records in {manifest_namespace}")
+
+    try:
+        if args.workers:
+            if args.stream:
+                frames = iter_normalized_chunks(source, args.chunk_size)
+            else:
+                frames = [load_and_prepare(source)]
+            embed = embed_texts if args.embed else None
+            ingest_parallel(index, frames, args.workers, embed, controller=controller, manifest=manifest)
+        elif args.stream:
+            ingest_stream(index, source, args.chunk_size, controller, manifest)
+        else:
+            ingest(index, source, controller, manifest)
+
+        if args.delete_missing:
+            delete_missing(index, manifest, controller)
+    finally:
+        if isinstance(index, LocalIndex):
+            index.save()
 
     logging.info("Ingestion completed successfully.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+
+def vectors(n, dimension=4, start=0):
+    return np.arange(start, start + n * dimension, dtype=np.float32).reshape(n, dimension)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "test-model", 4, max_bytes=10 * (4 * 4 + 16))
+    yield cache
+    cache.close()
+
+
+def test_lookup_returns_cached_vectors_and_misses(cache):
+    cache.put(["a", "b"], vectors(2))
+
+    out, found = cache.lookup(["b", "zzz", "a"])
+
+    assert found.tolist() == [True, False, True]
+    np.testing.assert_array_equal(out[0], vectors(2)[1])
+    np.testing.assert_array_equal(out[2], vectors(2)[0])
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_get_is_a_view_into_the_mapped_file(cache):
+    cache.put(["a"], vectors(1))
+
+    view = cache.get("a")
+
+    assert isinstance(view, np.memmap) or isinstance(view.base, np.memmap)
+    assert cache.get("missing") is None
+
+
+def test_cache_persists_and_is_keyed_by_model(cache, tmp_path):
+    cache.put(["a"], vectors(1, start=7))
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path), "test-model", 4, max_bytes=10 * (4 * 4 + 16))
+    other = EmbeddingCache(str(tmp_path), "other-model", 4, max_bytes=10 * (4 * 4 + 16))
+
+    np.testing.assert_array_equal(reopened.get("a"), vectors(1, start=7)[0])
+    assert other.get("a") is None
+
+
+def test_eviction_keeps_recently_used_entries(cache):
+    cache.put([f"t{i}" for i in range(10)], vectors(10))
+    cache.lookup(["t0"])
+
+    cache.put(["new"], vectors(1, start=100))
+
+    assert cache.capacity == 10
+    assert len(cache) == 10
+    assert cache.lookup(["t0", "new"])[1].all()
+    assert cache.lookup([f"t{i}" for i in range(1, 10)])[1].sum() == 8
+
+
+def test_get_or_embed_only_embeds_misses(cache):
+    cache.put(["a"], vectors(1))
+    calls = []
+
+    def embed(texts):
+        calls.append(texts)
+        return vectors(len(texts), start=50)
+
+    out = cache.get_or_embed(["a", "b", "c"], embed)
+
+    assert calls == [["b", "c"]]
+    np.testing.assert_array_equal(out[1:], vectors(2, start=50))
+    assert len(cache) == 3
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from embedding_client import EmbeddingClient, EmbeddingError
+from stub_embedder import StubEmbedder, fake_vector
+
+
+@pytest.fixture
+def stub():
+    with StubEmbedder(request_latency=0, per_text_latency=0) as server:
+        yield server
+
+
+def test_embed_batches_and_preserves_order(stub):
+    texts = [f"text {i}" for i in range(70)]
+
+    with EmbeddingClient(stub.url, batch_size=16, concurrency=3) as client:
+        vectors = client.embed(texts)
+
+    assert vectors.dtype == np.float32 and vectors.flags["C_CONTIGUOUS"]
+    assert vectors.shape == (70, stub.dimension)
+    np.testing.assert_allclose(vectors[42], fake_vector("text 42", stub.dimension), rtol=1e-6)
+    assert stub.requests == 5
+    assert len(stub.connections) <= 3
+
+
+def test_single_text_mode_uses_legacy_payload(stub):
+    with EmbeddingClient(stub.url, batch_size=1, concurrency=1) as client:
+        vectors = client.embed(["a", "b"])
+
+    assert vectors.shape == (2, stub.dimension)
+    assert stub.requests == 2
+    assert len(stub.connections) == 1
+
+
+def test_server_error_raises(stub):
+    stub.fail_on = "bad"
+
+    with EmbeddingClient(stub.url, batch_size=4) as client:
+        with pytest.raises(EmbeddingError):
+            client.embed(["ok", "bad", "ok", "ok", "ok"])
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+import script
+from local_index import LocalIndex
+from rate_control import FixedIntervalController
+
+
+def unit_vectors(n, dimension=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def upsert(index, vectors, namespace="ns", start=0):
+    index.upsert([
+        {"id": str(start + i), "values": vector, "metadata": {"n": start + i}}
+        for i, vector in enumerate(vectors)
+    ], namespace)
+
+
+def test_exact_query_delete_and_namespaces():
+    index = LocalIndex(mode="exact")
+    vectors = unit_vectors(50)
+    upsert(index, vectors)
+    upsert(index, vectors[:5], namespace="other")
+
+    result = index.query(vector=vectors[7], top_k=3, namespace="ns")
+    assert result["matches"][0]["id"] == "7"
+    assert result["matches"][0]["metadata"] == {"n": 7}
+    assert abs(result["matches"][0]["score"] - 1.0) < 1e-5
+
+    index.delete(["7"], namespace="ns")
+    assert "7" not in [m["id"] for m in index.query(vector=vectors[7], top_k=3, namespace="ns")["matches"]]
+    assert index.describe_index_stats()["namespaces"] == {"ns": {"vector_count": 49}, "other": {"vector_count": 5}}
+
+
+def test_ivf_recall_against_exact():
+    centers = unit_vectors(40, seed=1)
+    rng = np.random.default_rng(2)
+    data = centers[rng.integers(0, 40, 5000)] + 0.3 * unit_vectors(5000, seed=3)
+    queries = data[rng.integers(0, 5000, 50)] + 0.05 * unit_vectors(50, seed=4)
+
+    exact, ivf = LocalIndex(mode="exact"), LocalIndex(mode="ivf", nlist=40, nprobe=8)
+    upsert(exact, data)
+    upsert(ivf, data)
+
+    recall = np.mean([
+        len({m["id"] for m in exact.query(vector=q, top_k=10, namespace="ns")["matches"]}
+            & {m["id"] for m in ivf.query(vector=q, top_k=10, namespace="ns")["matches"]}) / 10
+        for q in queries
+    ])
+    assert recall >= 0.9
+
+
+def test_save_and_open_round_trip(tmp_path):
+    path = str(tmp_path / "index")
+    index = LocalIndex(path, mode="ivf", nlist=4, nprobe=4)
+    vectors = unit_vectors(100)
+    upsert(index, vectors)
+    index.query(vector=vectors[0], namespace="ns")
+    index.delete(["3"], namespace="ns")
+    index.save()
+
+    reopened = LocalIndex.open(path, mode="ivf", nlist=4, nprobe=4)
+    assert reopened.describe_index_stats()["total_vector_count"] == 99
+    assert reopened.query(vector=vectors[42], top_k=1, namespace="ns")["matches"][0]["id"] == "42"
+
+    upsert(reopened, unit_vectors(1, seed=9), start=42)
+    assert reopened.query(vector=unit_vectors(1, seed=9)[0], top_k=1, namespace="ns")["matches"][0]["id"] == "42"
+
+
+def test_ingest_into_local_backend():
+    index = LocalIndex(embed=lambda texts: unit_vectors(len(texts), seed=len(texts)))
+    df = pd.DataFrame({"id": ["a", "b"], "name": ["dolo 650", "crocin"], "embedding_text": ["t1", "t2"]})
+
+    script.upsert_frame(index, df, controller=FixedIntervalController(0))
+
+    match = index.query(text="t1", top_k=1, namespace=script.NAMESPACE)["matches"][0]
+    assert match["metadata"] == {"name": "dolo 650", "text": "t1"}
+
+
+def test_script_imports_without_api_keys(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k not in ("GOOGLE_API_KEY", "PINECONE_API_KEY")}
+    # Run from an empty directory so no .env file is picked up.
+    result = subprocess.run(
+        [sys.executable, "-c", "import script; print(script.INDEX_BACKEND)"],
+        cwd=tmp_path, env={**env, "PYTHONPATH": os.path.dirname(script.__file__)},
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
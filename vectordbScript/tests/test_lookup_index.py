@@ -0,0 +1,80 @@
+import json
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import script
+import synthetic
+from lookup_index import trigram_keys, write_lookup_index
+
+
+def read_table(path, name, dtype):
+    return np.fromfile(os.path.join(path, name), dtype=dtype)
+
+
+def read_blob(path, stem):
+    offsets = read_table(path, f"{stem}.off", "<u8")
+    with open(os.path.join(path, f"{stem}.bin"), "rb") as f:
+        data = f.read()
+    assert offsets[0] == 0 and offsets[-1] == len(data)
+    return [data[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def test_write_normalizes_dedups_and_sorts(tmp_path):
+    path = str(tmp_path / "index")
+    count = write_lookup_index(path, [
+        {"name": "Dolo  650 Tablet", "price": 30.0},
+        {"name": "dolo 650 tablet", "price": 99.0},
+        {"name": "Azithral 500 Tablet"},
+        {"name": None},
+    ])
+
+    assert count == 2
+    names = [name.decode() for name in read_blob(path, "names")]
+    assert names == ["azithral 500 tablet", "dolo 650 tablet"]
+    records = [json.loads(record) for record in read_blob(path, "records")]
+    assert records[1] == {"name": "dolo 650 tablet", "price": 30.0}
+    with open(os.path.join(path, "meta.json")) as f:
+        assert json.load(f)["count"] == 2
+
+
+def test_trigram_postings_point_back_to_names(tmp_path):
+    path = str(tmp_path / "index")
+    write_lookup_index(path, [{"name": name} for name in ["Dolo 650", "Dolo 500", "Crocin"]])
+    names = [name.decode() for name in read_blob(path, "names")]
+    keys = read_table(path, "trigrams.keys", "<u4")
+    offsets = read_table(path, "trigrams.off", "<u8")
+    postings = read_table(path, "trigrams.post", "<u4")
+
+    assert np.all(np.diff(keys.astype(np.int64)) > 0)
+    assert offsets[-1] == len(postings)
+    position = {key: i for i, key in enumerate(keys)}
+    for i, name in enumerate(names):
+        for key in trigram_keys(name):
+            ids = postings[offsets[position[key]]:offsets[position[key] + 1]]
+            assert i in ids
+            assert np.all(np.diff(ids.astype(np.int64)) > 0)
+    assert sorted(postings[offsets[position[zlib.crc32(b"dol")]]:offsets[position[zlib.crc32(b"dol")] + 1]]) == [1, 2]
+
+
+def test_build_lookup_index_from_dataset(tmp_path):
+    df = script.load_and_prepare(synthetic.write_csv(tmp_path / "medicine_dataset.csv", 300, seed=3))
+    path = str(tmp_path / "index")
+    count = script.build_lookup_index(df, path)
+
+    assert count == df["name"].str.lower().str.split().str.join(" ").nunique()
+    records = [json.loads(record) for record in read_blob(path, "records")]
+    first = df.iloc[0]
+    record = next(r for r in records if r["name"] == " ".join(first["name"].lower().split()))
+    assert record["id"] == first["id"]
+    assert all(isinstance(record.get(key, []), list) for key in script.LOOKUP_LISTS)
+
+
+def test_rebuild_replaces_index(tmp_path):
+    path = str(tmp_path / "index")
+    write_lookup_index(path, [{"name": "Old Medicine"}])
+    write_lookup_index(path, [{"name": "New Medicine"}])
+    assert [name.decode() for name in read_blob(path, "names")] == ["new medicine"]
+    assert sorted(os.listdir(tmp_path)) == ["index"]
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+import script
+from manifest import Manifest
+from rate_control import FixedIntervalController
+
+
+class RecordingIndex:
+    def __init__(self, fail_on_call=None):
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+        self.upserted = []
+        self.deleted = []
+
+    def upsert_records(self, namespace, records):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise ValueError("index rejected batch")
+        self.upserted.extend(record["id"] for record in records)
+
+    def delete(self, ids, namespace):
+        self.deleted.extend(ids)
+
+
+def frame(n_rows, version="v1"):
+    ids = [str(i) for i in range(n_rows)]
+    return pd.DataFrame({"id": ids, "name": ids, "embedding_text": [f"{i} {version}" for i in ids]})
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    return str(tmp_path / "manifest.sqlite")
+
+
+def ingest(index, df, manifest_path):
+    manifest = Manifest(manifest_path, "ns")
+    try:
+        script.upsert_frame(index, df, controller=FixedIntervalController(0), manifest=manifest)
+    finally:
+        manifest.close()
+
+
+def test_rerun_only_upserts_changed_records(manifest_path):
+    df = frame(300)
+    ingest(RecordingIndex(), df, manifest_path)
+
+    df.loc[[5, 250], "embedding_text"] = "changed"
+    df = pd.concat([df, frame(301).tail(1)], ignore_index=True)
+    index = RecordingIndex()
+    ingest(index, df, manifest_path)
+
+    assert index.upserted == ["5", "250", "300"]
+
+
+def test_failed_run_resumes_after_last_committed_batch(manifest_path):
+    df = frame(script.BATCH_SIZE * 4)
+
+    with pytest.raises(ValueError):
+        ingest(RecordingIndex(fail_on_call=3), df, manifest_path)
+
+    index = RecordingIndex()
+    ingest(index, df, manifest_path)
+    assert index.upserted == df["id"].tolist()[script.BATCH_SIZE * 2:]
+
+
+def test_delete_missing_removes_vanished_ids(manifest_path):
+    ingest(RecordingIndex(), frame(200), manifest_path)
+
+    index = RecordingIndex()
+    manifest = Manifest(manifest_path, "ns")
+    script.upsert_frame(index, frame(150), controller=FixedIntervalController(0), manifest=manifest)
+    script.delete_missing(index, manifest, FixedIntervalController(0))
+
+    assert index.upserted == []
+    assert sorted(index.deleted, key=int) == [str(i) for i in range(150, 200)]
+    assert len(manifest) == 150
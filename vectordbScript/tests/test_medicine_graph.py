@@ -0,0 +1,87 @@
+import json
+import math
+import os
+
+import numpy as np
+
+import script
+import synthetic
+from medicine_graph import NONE, ingredient_name, write_medicine_graph
+
+
+def read_vocab(path, stem):
+    offsets = np.fromfile(os.path.join(path, f"{stem}.off"), dtype="<u8")
+    with open(os.path.join(path, f"{stem}.bin"), "rb") as f:
+        data = f.read()
+    return [data[start:end].decode() for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def read_csr(path, stem):
+    offsets = np.fromfile(os.path.join(path, f"{stem}.off"), dtype="<u8")
+    ids = np.fromfile(os.path.join(path, f"{stem}.ids"), dtype="<u4")
+    assert offsets[-1] == len(ids)
+    return [ids[start:end].tolist() for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+MEDICINES = [
+    {"name": "Dolo 650 Tablet", "price": "30.9", "compositions": ["Paracetamol (650mg)"],
+     "substitutes": ["Pacimol 650mg Tablet", "Unknown 650"], "therapeutic_class": "PAIN ANALGESICS", "action_class": "Analgesic"},
+    {"name": "Pacimol 650mg Tablet", "price": "15", "compositions": ["Paracetamol  (650mg)"],
+     "therapeutic_class": "PAIN ANALGESICS"},
+    {"name": "Calpol 650 Tablet", "compositions": ["Paracetamol (650mg)"]},
+    {"name": "Augmentin 625 Duo Tablet", "price": "223", "compositions": ["Clavulanic Acid (125mg)", "Amoxycillin (500mg)"],
+     "therapeutic_class": "ANTI INFECTIVES", "action_class": "Penicillins"},
+    {"name": "dolo 650 tablet", "price": "99"},
+]
+
+
+def test_ingredient_name_drops_strength():
+    assert ingredient_name("Amoxycillin  (500mg)") == "amoxycillin"
+    assert ingredient_name("Clavulanic Acid (125mg)") == "clavulanic acid"
+
+
+def test_write_links_ingredients_classes_compositions_and_substitutes(tmp_path):
+    path = str(tmp_path / "graph")
+    assert write_medicine_graph(path, MEDICINES) == 4
+
+    names = read_vocab(path, "medicines")
+    assert names == ["augmentin 625 duo tablet", "calpol 650 tablet", "dolo 650 tablet", "pacimol 650mg tablet"]
+    augmentin, calpol, dolo, pacimol = range(4)
+    ingredients = read_vocab(path, "ingredients")
+    assert ingredients == ["amoxycillin", "clavulanic acid", "paracetamol"]
+    assert read_vocab(path, "classes") == ["analgesic", "anti infectives", "pain analgesics", "penicillins"]
+    assert read_vocab(path, "compositions") == ["amoxycillin (500mg) + clavulanic acid (125mg)", "paracetamol (650mg)"]
+
+    prices = np.fromfile(os.path.join(path, "medicine_prices.f4"), dtype="<f4")
+    assert prices[dolo] == np.float32(30.9) and math.isnan(prices[calpol])
+    classes = np.fromfile(os.path.join(path, "medicine_classes.u4"), dtype="<u4").reshape(-1, 2)
+    assert classes[dolo].tolist() == [2, 0] and classes[pacimol].tolist() == [2, NONE] and classes[calpol].tolist() == [NONE, NONE]
+    composition = np.fromfile(os.path.join(path, "medicine_composition.u4"), dtype="<u4")
+    assert composition.tolist() == [0, 1, 1, 1]
+
+    assert read_csr(path, "medicine_ingredients") == [[0, 1], [2], [2], [2]]
+    assert read_csr(path, "ingredient_medicines") == [[augmentin], [augmentin], [calpol, dolo, pacimol]]
+    assert read_csr(path, "class_medicines") == [[dolo], [augmentin], [dolo, pacimol], [augmentin]]
+    # Cheapest first, unknown prices last
+    assert read_csr(path, "composition_medicines") == [[augmentin], [pacimol, dolo, calpol]]
+    # Substitutes missing from the dataset are dropped
+    assert read_csr(path, "medicine_substitutes") == [[], [], [pacimol], []]
+    with open(os.path.join(path, "meta.json")) as f:
+        assert json.load(f)["compositions"] == 2
+
+
+def test_build_medicine_graph_from_dataset(tmp_path):
+    df = script.load_and_prepare(synthetic.write_csv(tmp_path / "medicine_dataset.csv", 300, seed=5))
+    path = str(tmp_path / "graph")
+    count = script.build_medicine_graph(df, path)
+
+    names = read_vocab(path, "medicines")
+    assert len(names) == count == df["name"].str.lower().str.split().str.join(" ").nunique()
+    ingredients = read_vocab(path, "ingredients")
+    assert set(ingredients) == {ingredient_name(c) for c in synthetic.INGREDIENTS}
+    by_ingredient = read_csr(path, "ingredient_medicines")
+    for i, row in enumerate(read_csr(path, "medicine_ingredients")):
+        assert row and all(i in by_ingredient[j] for j in row)
+    # The price header is "price(₹)" in the file but not after a latin1 read
+    prices = np.fromfile(os.path.join(path, "medicine_prices.f4"), dtype="<f4")
+    assert np.isnan(prices).mean() < 0.5
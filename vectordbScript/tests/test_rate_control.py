@@ -0,0 +1,96 @@
+import pandas as pd
+import requests
+import urllib3
+import pytest
+
+import rate_control
+import script
+from fake_index import QuotaIndex, ThrottledError, VirtualClock
+
+
+def frame(n_rows):
+    ids = [str(i) for i in range(n_rows)]
+    return pd.DataFrame({"id": ids, "name": ids, "embedding_text": ids})
+
+
+def test_is_retryable():
+    assert rate_control.is_retryable(ThrottledError(429))
+    assert rate_control.is_retryable(ThrottledError(503))
+    assert rate_control.is_retryable(ConnectionError())
+    assert not rate_control.is_retryable(ThrottledError(400))
+    assert not rate_control.is_retryable(ValueError())
+
+
+def test_adaptive_controller_settles_near_quota():
+    clock = VirtualClock()
+    index = QuotaIndex(clock, quota=10)
+    controller = rate_control.AdaptiveRateController(clock=clock, sleep=clock.sleep)
+
+    script.upsert_frame(index, frame(96 * 600), controller=controller)
+
+    assert len(index.records) == 96 * 600
+    assert 4 <= controller.rate <= 15
+    assert clock.now < 600 * 5 / 20
+    assert index.throttled < 60
+
+
+def test_non_retryable_error_is_raised_immediately():
+    clock = VirtualClock()
+    controller = rate_control.AdaptiveRateController(clock=clock, sleep=clock.sleep)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ThrottledError(400, "Bad Request")
+
+    with pytest.raises(ThrottledError):
+        rate_control.call_with_retries(fail, controller, retries=3)
+    assert len(calls) == 1
+
+
+def test_retries_until_success():
+    clock = VirtualClock()
+    controller = rate_control.AdaptiveRateController(initial_rate=4, clock=clock, sleep=clock.sleep)
+    outcomes = [ThrottledError(429), ThrottledError(500), "ok"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert rate_control.call_with_retries(flaky, controller, retries=3) == "ok"
+    assert controller.rate < 4
+
+
+@pytest.mark.parametrize("exc", [
+    requests.exceptions.ConnectionError(),
+    requests.exceptions.ReadTimeout(),
+    urllib3.exceptions.MaxRetryError(None, "/upsert"),
+    urllib3.exceptions.ProtocolError("Connection aborted."),
+])
+def test_transport_errors_are_retryable(exc):
+    assert rate_control.is_retryable(exc)
+
+
+def test_steady_high_latency_does_not_collapse_rate():
+    clock = VirtualClock()
+    controller = rate_control.AdaptiveRateController(clock=clock, sleep=clock.sleep)
+
+    for _ in range(50):
+        controller.acquire()
+        clock.sleep(5.0)
+        controller.on_success(5.0)
+
+    assert controller.rate > 1.0
+
+
+def test_configured_target_latency_backs_off():
+    clock = VirtualClock()
+    controller = rate_control.AdaptiveRateController(initial_rate=4, target_latency=2.0,
+                                                     clock=clock, sleep=clock.sleep)
+    controller.acquire()
+    clock.sleep(3.0)
+    controller.on_success(3.0)
+
+    assert controller.rate == 2
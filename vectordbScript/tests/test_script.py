@@ -0,0 +1,156 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import script
+import synthetic
+
+
+class FakeIndex:
+    def __init__(self):
+        self.ids = []
+        self.vectors = []
+
+    def upsert_records(self, namespace, records):
+        self.ids.extend(record["id"] for record in records)
+
+    def upsert(self, vectors, namespace):
+        self.ids.extend(vector["id"] for vector in vectors)
+        self.vectors.extend(vector["values"] for vector in vectors)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(script, "SLEEP_INTERVAL", 0)
+    monkeypatch.setattr(script, "RATE_CONTROL", "fixed")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    return synthetic.write_csv(tmp_path / "medicine_dataset.csv", 1500, seed=7)
+
+
+def test_seen_ids_keeps_first_occurrence():
+    seen = script.SeenIds()
+    first = seen.filter_new(pd.Series(["a", "b", "a"]))
+    second = seen.filter_new(pd.Series(["b", "c"]))
+    assert first.tolist() == [True, True, False]
+    assert second.tolist() == [False, True]
+    assert len(seen) == 3
+
+
+def test_stream_matches_whole_frame(csv_path):
+    df = script.load_and_prepare(csv_path)
+    df["embedding_text"] = df.apply(script.create_text, axis=1)
+
+    streamed = pd.concat(script.iter_prepared_chunks(csv_path, chunksize=200), ignore_index=True)
+
+    assert len(streamed) < 1500
+    pd.testing.assert_frame_equal(streamed, df, check_dtype=False)
+
+
+def test_build_texts_matches_create_text():
+    df = synthetic.make_frame(3000, seed=3)
+    df.loc[0, "name"] = "  None "
+    df.loc[1, "Habit Forming"] = ""
+    df.loc[2, "use0"] = "\xa0Pain relief\t"
+    df.loc[3, ["substitute0", "sideEffect0", "use1"]] = "none"
+    df["price(₹)"] = df["price(₹)"].astype(float)
+    df.loc[4] = float("nan")
+
+    expected = df.apply(script.create_text, axis=1)
+    actual = script.build_texts(df)
+
+    assert actual.tolist() == expected.tolist()
+    assert actual[4] == ""
+
+
+def test_build_texts_handles_missing_columns():
+    df = pd.DataFrame({"id": ["1", "2"], "name": ["dolo 650", None], "use0": [None, "Fever"]})
+
+    assert script.build_texts(df).tolist() == df.apply(script.create_text, axis=1).tolist()
+
+
+def test_parallel_ingest_preserves_order():
+    df = script.normalize(synthetic.make_frame(2000, seed=5, duplicate_ratio=0))
+    index = FakeIndex()
+
+    script.ingest_parallel(index, [df.iloc[:1100], df.iloc[1100:]], workers=3, shard_size=150)
+
+    assert index.ids == df["id"].tolist()
+
+
+def fake_embeddings(texts):
+    if any("Medicine Name: broken" in text for text in texts):
+        raise ValueError("embedder rejected batch")
+    return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_parallel_ingest_reports_failed_shards():
+    df = script.normalize(synthetic.make_frame(600, seed=5, duplicate_ratio=0))
+    df.loc[250, "name"] = "broken"
+    index = FakeIndex()
+
+    with pytest.raises(script.ShardError, match="1 shard\\(s\\) failed, 100 of 600 rows"):
+        script.ingest_parallel(index, [df], workers=2, embed=fake_embeddings, shard_size=100)
+
+    assert index.ids == df["id"].tolist()[:200] + df["id"].tolist()[300:]
+    assert all(len(vector) == 2 for vector in index.vectors)
+
+
+def test_stale_snapshot_is_rebuilt_from_a_newer_csv(csv_path, tmp_path, monkeypatch):
+    snapshot = str(tmp_path / "medicine_dataset.parquet")
+    monkeypatch.setattr(script, "dataset_path", lambda: str(csv_path))
+    script.main(["--prepare", "--snapshot", snapshot])
+    assert script.snapshot_digest(snapshot) == script.file_digest(csv_path)
+    prepared = os.path.getmtime(snapshot)
+    assert script.fresh_snapshot(snapshot) == snapshot
+    assert os.path.getmtime(snapshot) == prepared
+
+    # The weekly download brings a CSV with one row fewer
+    lines = open(csv_path, encoding="latin1").readlines()
+    with open(csv_path, "w", encoding="latin1") as f:
+        f.writelines(lines[:-1])
+    script.fresh_snapshot(snapshot)
+    assert script.snapshot_digest(snapshot) == script.file_digest(csv_path)
+    assert len(script.load_snapshot(snapshot)) == len(script.load_and_prepare(str(csv_path)))
+
+
+def test_snapshot_round_trip_keeps_texts(csv_path, tmp_path):
+    df = script.load_and_prepare(csv_path)
+    snapshot = str(tmp_path / "medicine_dataset.parquet")
+
+    compacted = script.write_snapshot(df, snapshot)
+    loaded = script.load_and_prepare(snapshot)
+
+    assert isinstance(loaded["manufacturer_name"].dtype, pd.CategoricalDtype)
+    assert isinstance(loaded["sideEffect0"].dtype, pd.CategoricalDtype)
+    assert not isinstance(loaded["id"].dtype, pd.CategoricalDtype)
+    assert compacted.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+    assert script.build_texts(loaded).tolist() == script.build_texts(df).tolist()
+
+    streamed = pd.concat(script.iter_prepared_chunks(snapshot, chunksize=300), ignore_index=True)
+    assert streamed["embedding_text"].tolist() == script.build_texts(df).tolist()
+
+
+def embed_renamed_only(texts):
+    if not all("Medicine Name: renamed" in text for text in texts):
+        raise ValueError("unchanged rows were embedded again")
+    return fake_embeddings(texts)
+
+
+def test_parallel_ingest_embeds_only_rows_the_manifest_lacks(tmp_path):
+    from manifest import Manifest
+    df = script.normalize(synthetic.make_frame(300, seed=5, duplicate_ratio=0))
+    manifest = Manifest(str(tmp_path / "manifest.sqlite"), "ns")
+    try:
+        script.ingest_parallel(FakeIndex(), [df], workers=2, embed=fake_embeddings, shard_size=100, manifest=manifest)
+
+        df.loc[150, "name"] = "renamed"
+        index = FakeIndex()
+        script.ingest_parallel(index, [df], workers=2, embed=embed_renamed_only, shard_size=100, manifest=manifest)
+        assert index.ids == [df.loc[150, "id"]]
+        assert manifest.missing_ids() == []
+    finally:
+        manifest.close()